@@ -0,0 +1,126 @@
+import time
+from dataclasses import asdict, dataclass
+
+from django.conf import settings
+
+from utils.generations import Generation
+
+
+# Seconds a session-cached EmployeeAccess is trusted even without a
+# generation bump; None keeps it for the whole session
+DEFAULT_SESSION_CACHE_TTL = 300
+
+SESSION_KEY = '_emp_access'
+
+
+@dataclass(frozen=True)
+class EmployeeAccess:
+    """
+    What the current user may do, resolved once per request by
+    EmployeeAccessMiddleware and exposed as request.employee_access.
+
+    Holds plain values only (no model instances), so it can also be stored
+    in the session for views marked with @session_cached_access.
+    """
+
+    user_id: int = None
+    profile_id: str = None
+    role: str = None
+    department_id: int = None
+    is_superuser: bool = False
+    is_active: bool = False
+
+    # A class attribute, not a dataclass field (no annotation)
+    GENERATION = Generation('employee-access')
+
+    @classmethod
+    def anonymous(cls):
+        return cls()
+
+    @classmethod
+    def for_profile(cls, user, profile):
+        if profile is None:
+            return cls(user_id=user.pk, is_superuser=user.is_superuser)
+        return cls(
+            user_id=user.pk,
+            profile_id=str(profile.pk),
+            role=profile.role,
+            department_id=profile.department_id,
+            is_superuser=user.is_superuser,
+            is_active=profile.is_active,
+        )
+
+    @property
+    def has_profile(self):
+        return self.profile_id is not None
+
+    @property
+    def is_superadmin(self):
+        return self.role == 'admin' and self.is_superuser
+
+    @property
+    def is_manager(self):
+        return self.role == 'manager'
+
+    @property
+    def is_employee(self):
+        return self.role == 'employee'
+
+    @property
+    def is_department_manager(self):
+        return self.role == 'manager' and self.department_id is not None
+
+    def manages_department(self, department_id):
+        return self.is_department_manager and self.department_id == department_id
+
+    def can_edit_employee(self, employee):
+        """Same rules as CustomUser.can_edit_employee, without loading anything"""
+        if self.is_superadmin:
+            return True
+        if self.is_department_manager:
+            return employee.department_id == self.department_id and employee.role != 'admin'
+        return self.profile_id == str(employee.pk)
+
+    # -- session cache -----------------------------------------------------
+
+    @classmethod
+    def _generation(cls):
+        return cls.GENERATION.get()
+
+    @classmethod
+    def invalidate(cls):
+        """Expire every session-cached EmployeeAccess (roles, departments or
+        active flags changed); the generation is shared by the worker
+        processes through CACHE_GENERATIONS, so this reaches all of them"""
+        cls.GENERATION.bump()
+
+    @classmethod
+    def from_session(cls, session, user_id):
+        entry = session.get(SESSION_KEY)
+        if not entry or entry.get('user_id') != user_id:
+            return None
+        if entry.get('generation') != cls._generation():
+            return None
+        ttl = getattr(settings, 'EMP_ACCESS_SESSION_CACHE_TTL', DEFAULT_SESSION_CACHE_TTL)
+        if ttl is not None and time.time() - entry.get('stored_at', 0) > ttl:
+            return None
+        values = {name: entry.get(name) for name in cls.__dataclass_fields__}
+        return cls(**values)
+
+    def to_session(self, session):
+        session[SESSION_KEY] = {
+            **asdict(self),
+            'generation': self._generation(),
+            'stored_at': time.time(),
+        }
+
+
+def session_cached_access(view_func):
+    """
+    Let EmployeeAccessMiddleware answer request.employee_access for this
+    view from the session instead of the database. Meant for hot AJAX
+    endpoints that only need the permission checks; reading
+    request.user.custom_user_profile in such a view still costs a query.
+    """
+    view_func.employee_access_session_cache = True
+    return view_func
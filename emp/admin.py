@@ -6,10 +6,20 @@ from .models import (
     Attendance, LeaveRequest, AttendanceSettings
 )
 from django.utils.html import format_html
-from django.urls import reverse
+from django.urls import path, reverse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.contrib import messages
 from django.utils import timezone
 from datetime import datetime, timedelta
 from django.db import models
+from django.db.models.functions import Coalesce
+from utils.logging_utils import ModelAuditor
+from utils.db_routing import ReplicaChangelistMixin
+from .access import EmployeeAccess
+from .statistics import EmployeeStatistics
+from .forms import EmployeeImportForm
+from .importer import IMPORT_COLUMNS, EmployeeImporter, read_rows
 
 # Inline admin for CustomUser in User admin
 class CustomUserInline(admin.StackedInline):
@@ -25,6 +35,7 @@ class UserAdmin(BaseUserAdmin):
     inlines = (CustomUserInline,)
     list_display = ('username', 'email', 'first_name', 'last_name', 'get_department', 'get_role', 'is_staff', 'is_active')
     list_filter = ('custom_user_profile__department', 'custom_user_profile__role', 'is_staff', 'is_active')
+    list_select_related = ('custom_user_profile__department',)
     search_fields = ('username', 'email', 'first_name', 'last_name', 'custom_user_profile__phone_number')
     
     def get_department(self, obj):
@@ -43,12 +54,13 @@ class UserAdmin(BaseUserAdmin):
 
 # Department Admin
 @admin.register(Department)
-class DepartmentAdmin(admin.ModelAdmin):
-    list_display = ('name', 'code', 'manager_name', 'employee_count', 'is_active', 'created_at')
+class DepartmentAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
+    list_display = ('name', 'code', 'manager_name', 'employee_count', 'active_employee_count', 'is_active', 'created_at')
+    list_select_related = ('manager__user',)
     list_filter = ('is_active', 'created_at')
     search_fields = ('name', 'code', 'description', 'manager__user__username')
     list_editable = ('is_active',)
-    readonly_fields = ('created_at', 'updated_at', 'employee_count')
+    readonly_fields = ('created_at', 'updated_at', 'employee_count', 'active_employee_count')
     fieldsets = (
         ('Basic Information', {
             'fields': ('name', 'code', 'description', 'is_active')
@@ -67,14 +79,10 @@ class DepartmentAdmin(admin.ModelAdmin):
             return obj.manager.user.get_full_name() or obj.manager.user.username
         return "No Manager"
     manager_name.short_description = 'Manager'
-    
-    def employee_count(self, obj):
-        return obj.employees.count()
-    employee_count.short_description = 'Employees'
 
 # Attendance Admin
 @admin.register(Attendance)
-class AttendanceAdmin(admin.ModelAdmin):
+class AttendanceAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ('employee_name', 'department', 'date', 'status_badge', 'check_in', 'check_out', 
                     'total_hours', 'late_status', 'marked_by_name', 'marked_at')
     list_filter = ('status', 'date', 'department', ('check_in', admin.EmptyFieldListFilter))
@@ -175,10 +183,11 @@ class AttendanceAdmin(admin.ModelAdmin):
 
 # Leave Request Admin
 @admin.register(LeaveRequest)
-class LeaveRequestAdmin(admin.ModelAdmin):
+class LeaveRequestAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ('employee_name', 'leave_type_badge', 'date_range', 'total_days', 
                     'status_badge', 'reviewed_by_name', 'created_at')
     list_filter = ('status', 'leave_type', 'start_date', 'created_at')
+    list_select_related = ('employee__user', 'reviewed_by')
     search_fields = ('employee__user__username', 'employee__user__first_name', 
                      'employee__user__last_name', 'reason', 'response_notes')
     date_hierarchy = 'start_date'
@@ -344,10 +353,11 @@ class AttendanceSettingsAdmin(admin.ModelAdmin):
 
 # CustomUser Admin (standalone)
 @admin.register(CustomUser)
-class CustomUserAdmin(admin.ModelAdmin):
+class CustomUserAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ('user_name', 'phone_number', 'department_name', 'role_badge', 
                     'is_active_badge', 'created_at', 'attendance_summary')
     list_filter = ('role', 'is_active', 'department', 'created_at')
+    list_select_related = ('user', 'department')
     search_fields = ('user__username', 'user__email', 'user__first_name', 
                      'user__last_name', 'phone_number', 'address')
     readonly_fields = ('created_at', 'updated_at', 'attendance_stats')
@@ -412,17 +422,41 @@ class CustomUserAdmin(admin.ModelAdmin):
         )
     is_active_badge.short_description = 'Status'
     
+    def get_queryset(self, request):
+        # Days present this month, counted for the whole page in the list
+        # query instead of once per row
+        today = timezone.now().date()
+        present = (
+            Attendance.objects.filter(
+                employee=models.OuterRef('pk'),
+                date__gte=today.replace(day=1),
+                date__lte=today,
+                status='present',
+            )
+            .order_by()
+            .values('employee')
+            .annotate(total=models.Count('id'))
+            .values('total')
+        )
+        return super().get_queryset(request).annotate(
+            present_this_month=Coalesce(
+                models.Subquery(present, output_field=models.IntegerField()), 0
+            )
+        )
+    
     def attendance_summary(self, obj):
         # Calculate attendance stats for the current month
         today = timezone.now().date()
         start_of_month = today.replace(day=1)
         
-        present_count = Attendance.objects.filter(
-            employee=obj,
-            date__gte=start_of_month,
-            date__lte=today,
-            status='present'
-        ).count()
+        present_count = getattr(obj, 'present_this_month', None)
+        if present_count is None:
+            present_count = Attendance.objects.filter(
+                employee=obj,
+                date__gte=start_of_month,
+                date__lte=today,
+                status='present'
+            ).count()
         
         total_days = (today - start_of_month).days + 1
         attendance_rate = round((present_count / total_days) * 100) if total_days > 0 else 0
@@ -458,26 +492,75 @@ class CustomUserAdmin(admin.ModelAdmin):
         return format_html(html)
     attendance_stats.short_description = 'Attendance Statistics'
     
+    # Bulk import
+    change_list_template = 'admin/emp/customuser/change_list.html'
+
+    def get_urls(self):
+        custom_urls = [
+            path('import/', self.admin_site.admin_view(self.import_view), name='emp_customuser_import'),
+        ]
+        return custom_urls + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            return redirect('admin:emp_customuser_changelist')
+
+        result = None
+        form = EmployeeImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            importer = EmployeeImporter(
+                default_password=form.cleaned_data['default_password'] or None,
+                user=request.user,
+                request=request,
+            )
+            result = importer.run(read_rows(form.cleaned_data['file'], form.cleaned_data['format']))
+            level = messages.SUCCESS if not result.errors else messages.WARNING
+            self.message_user(
+                request,
+                f'{result.created} employees imported, {len(result.errors)} rows rejected.',
+                level,
+            )
+            if not result.errors:
+                return redirect('admin:emp_customuser_changelist')
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Import employees',
+            'form': form,
+            'columns': IMPORT_COLUMNS,
+            'result': result,
+        }
+        return TemplateResponse(request, 'admin/emp/customuser/import.html', context)
+
     # Custom actions
     actions = ['activate_users', 'deactivate_users', 'make_manager', 'make_employee']
     
     def activate_users(self, request, queryset):
-        updated = queryset.update(is_active=True)
+        updated = ModelAuditor.audited_update(queryset, request=request, is_active=True)
+        EmployeeAccess.invalidate()
+        EmployeeStatistics.invalidate()
         self.message_user(request, f'{updated} employees activated.')
     activate_users.short_description = "Activate selected employees"
     
     def deactivate_users(self, request, queryset):
-        updated = queryset.update(is_active=False)
+        updated = ModelAuditor.audited_update(queryset, request=request, is_active=False)
+        EmployeeAccess.invalidate()
+        EmployeeStatistics.invalidate()
         self.message_user(request, f'{updated} employees deactivated.')
     deactivate_users.short_description = "Deactivate selected employees"
     
     def make_manager(self, request, queryset):
-        updated = queryset.update(role='manager')
+        updated = ModelAuditor.audited_update(queryset, request=request, role='manager')
+        EmployeeAccess.invalidate()
+        EmployeeStatistics.invalidate()
         self.message_user(request, f'{updated} employees promoted to Manager.')
     make_manager.short_description = "Promote to Manager"
     
     def make_employee(self, request, queryset):
-        updated = queryset.update(role='employee')
+        updated = ModelAuditor.audited_update(queryset, request=request, role='employee')
+        EmployeeAccess.invalidate()
+        EmployeeStatistics.invalidate()
         self.message_user(request, f'{updated} managers demoted to Employee.')
     make_employee.short_description = "Demote to Employee"
 
@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class EmpConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'emp'
+
+    # Saves and deletes of these write an AuditLog entry with the changed fields
+    AUDITED_MODELS = ('CustomUser', 'Department', 'LeaveRequest', 'AttendanceSettings')
+
+    def ready(self):
+        import emp.signals
+
+        from utils.logging_utils import ModelAuditor
+        for model_name in self.AUDITED_MODELS:
+            ModelAuditor.track_model(self.get_model(model_name))
@@ -0,0 +1,319 @@
+import uuid
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from utils import log_context
+from utils.db_writer import single_writer
+from utils.logging_utils import Logger
+
+from .models import Attendance, CustomUser, JobCursor, LeaveRequest
+from .working_calendar import WorkingCalendar
+
+
+# Per-employee outcomes reported by bulk_mark_attendance
+CREATED = 'created'
+UPDATED = 'updated'
+NOT_FOUND = 'not_found'
+OTHER_DEPARTMENT = 'other_department'
+
+
+def _parse_ids(employee_ids):
+    """Map each submitted id string to a UUID, or None if it isn't one"""
+    parsed = {}
+    for raw in employee_ids:
+        try:
+            parsed[raw] = uuid.UUID(str(raw))
+        except ValueError:
+            parsed[raw] = None
+    return parsed
+
+
+def upsert_attendance(rows, update_fields):
+    """
+    Insert or update Attendance rows in one statement, keyed on
+    (employee, date). Attendance.save() is bypassed, so callers fill in
+    department and total_hours themselves.
+    """
+    if not rows:
+        return []
+    rows = Attendance.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['employee', 'date'],
+        update_fields=update_fields,
+    )
+    context = log_context.get_current()
+    if context is not None and log_context.is_logged_model(Attendance):
+        for row in rows:
+            context.add_model_change('upserted', row)
+    return rows
+
+
+def bulk_mark_attendance(manager, attendance_date, status, employee_ids, marked_by=None):
+    """
+    Mark one status for many employees on one day on behalf of a manager.
+
+    The submitted ids are resolved and checked against the manager's
+    department in one query, existing rows for the day are looked up in a
+    second, and everything is written with a single upsert inside one
+    transaction. Returns {submitted id: outcome}.
+    """
+    parsed = _parse_ids(employee_ids)
+    wanted = {value for value in parsed.values() if value is not None}
+
+    with single_writer(), transaction.atomic():
+        departments = dict(
+            CustomUser.objects.filter(id__in=wanted).values_list('id', 'department_id')
+        )
+        allowed = {
+            employee_id for employee_id, department_id in departments.items()
+            if department_id is not None and department_id == manager.department_id
+        }
+        existing = set(
+            Attendance.objects.filter(date=attendance_date, employee_id__in=allowed)
+            .values_list('employee_id', flat=True)
+        )
+        upsert_attendance(
+            [
+                Attendance(
+                    employee_id=employee_id,
+                    department_id=departments[employee_id],
+                    date=attendance_date,
+                    status=status,
+                    marked_by=marked_by,
+                )
+                for employee_id in allowed
+            ],
+            update_fields=['status', 'department', 'marked_by'],
+        )
+
+    results = {}
+    for raw, employee_id in parsed.items():
+        if employee_id is None or employee_id not in departments:
+            results[raw] = NOT_FOUND
+        elif employee_id not in allowed:
+            results[raw] = OTHER_DEPARTMENT
+        elif employee_id in existing:
+            results[raw] = UPDATED
+        else:
+            results[raw] = CREATED
+    return results
+
+
+def stale_department_rows(since=None):
+    """Attendance rows whose department no longer matches their employee's"""
+    mismatch = (
+        Q(department__isnull=True, employee__department__isnull=False)
+        | Q(department__isnull=False, employee__department__isnull=True)
+        | (
+            Q(department__isnull=False, employee__department__isnull=False)
+            & ~Q(department=F('employee__department'))
+        )
+    )
+    rows = Attendance.objects.filter(mismatch)
+    if since is not None:
+        rows = rows.filter(date__gte=since)
+    return rows
+
+
+def reconcile_departments(since=None, batch_size=5000):
+    """
+    Copy each employee's current department onto their attendance rows
+    (all of them, or those dated since `since`), one batch of ids per
+    UPDATE ... SET department_id = (SELECT ...). Returns the rows fixed.
+    """
+    current_department = Subquery(
+        CustomUser.objects.filter(pk=OuterRef('employee_id')).values('department_id')[:1]
+    )
+    fixed = 0
+    while True:
+        ids = list(stale_department_rows(since).order_by().values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return fixed
+        with transaction.atomic():
+            fixed += Attendance.objects.filter(pk__in=ids).update(department=current_department)
+
+
+def review_leave_requests(leave_requests, action, reviewer, notes='', request=None):
+    """
+    Approve or reject several leave requests at once.
+
+    Approval builds every leave's working dates in memory and writes all of
+    them as 'leave' attendance with one upsert; the leave requests are then
+    updated with one UPDATE, all inside one transaction. Each leave gets a
+    single AuditLog entry covering its status change and the attendance
+    written for it. Returns {leave request: number of days marked}.
+    """
+    leave_requests = list(leave_requests)
+    if not leave_requests:
+        return {}
+    new_status = 'approved' if action == 'approve' else 'rejected'
+    reviewed_at = timezone.now()
+
+    marked = {leave: [] for leave in leave_requests}
+    if new_status == 'approved':
+        calendars = WorkingCalendar.for_departments(
+            {leave.employee.department_id for leave in leave_requests}
+        )
+        # Keyed on (employee, date) so overlapping leaves don't hit the same
+        # row twice in one statement
+        rows = {}
+        for leave in leave_requests:
+            employee = leave.employee
+            dates = calendars[employee.department_id].working_dates(leave.start_date, leave.end_date)
+            marked[leave] = dates
+            for day in dates:
+                rows[(employee.id, day)] = Attendance(
+                    employee_id=employee.id,
+                    department_id=employee.department_id,
+                    date=day,
+                    status='leave',
+                    notes=f'Approved {leave.get_leave_type_display()}',
+                    marked_by=reviewer,
+                )
+
+    with transaction.atomic():
+        if new_status == 'approved':
+            upsert_attendance(
+                list(rows.values()),
+                update_fields=['status', 'notes', 'department', 'marked_by'],
+            )
+        LeaveRequest.objects.filter(pk__in=[leave.pk for leave in leave_requests]).update(
+            status=new_status,
+            reviewed_by=reviewer,
+            reviewed_at=reviewed_at,
+            response_notes=notes,
+        )
+
+    context = log_context.get_current()
+    for leave in leave_requests:
+        old_values = {
+            'status': leave.status,
+            'reviewed_by': leave.reviewed_by_id,
+            'response_notes': leave.response_notes,
+        }
+        leave.status = new_status
+        leave.reviewed_by = reviewer
+        leave.reviewed_at = reviewed_at
+        leave.response_notes = notes
+        if context is not None and log_context.is_logged_model(LeaveRequest):
+            context.add_model_change('updated', leave)
+
+        new_values = {
+            'status': new_status,
+            'reviewed_by': leave.reviewed_by_id,
+            'response_notes': notes,
+        }
+        changes = {
+            name: {
+                'old': str(old_values[name]) if old_values[name] is not None else None,
+                'new': str(value) if value is not None else None,
+            }
+            for name, value in new_values.items() if old_values[name] != value
+        }
+        dates = marked[leave]
+        if dates:
+            changes['attendance'] = {
+                'status': 'leave',
+                'days_marked': len(dates),
+                'days_skipped': (leave.end_date - leave.start_date).days + 1 - len(dates),
+                'first_day': str(dates[0]),
+                'last_day': str(dates[-1]),
+            }
+        Logger.log_audit(
+            user=reviewer,
+            action='UPDATE',
+            model_name='LeaveRequest',
+            object_id=leave.pk,
+            object_repr=f'LeaveRequest object ({leave.pk})',
+            changes=changes,
+            request=request,
+        )
+    return {leave: len(dates) for leave, dates in marked.items()}
+
+
+AUTOFILL_CURSOR = 'autofill_attendance'
+
+
+def autofill_status(calendar, day):
+    """Status of an unmarked day: absent on working days, otherwise holiday/weekend"""
+    if calendar.is_working_day(day):
+        return 'absent'
+    if day in calendar.holiday_set:
+        return 'holiday'
+    return 'weekend'
+
+
+class AttendanceAutofill:
+    """
+    Creates the Attendance rows nobody marked: 'absent' on a department's
+    working days, 'holiday' or 'weekend' on the others, per its
+    WorkingCalendar. Active employees are only filled from the day their
+    profile was created.
+
+    Each day is one transaction: one query for the employees already
+    marked, chunked bulk inserts that ignore conflicts (so re-running a day
+    is harmless) and an update of the JobCursor, so an interrupted run
+    resumes after the last finished day.
+    """
+
+    def __init__(self, department_ids=None, batch_size=2000):
+        self.batch_size = batch_size
+        employees = CustomUser.objects.filter(is_active=True, department__isnull=False)
+        if department_ids:
+            employees = employees.filter(department_id__in=department_ids)
+        # (id, department, first day) for everyone, loaded once per run
+        self.employees = [
+            (employee_id, department_id, timezone.localtime(created_at).date())
+            for employee_id, department_id, created_at in
+            employees.order_by().values_list('id', 'department_id', 'created_at')
+        ]
+        self.calendars = WorkingCalendar.for_departments(
+            {department_id for _, department_id, _ in self.employees}
+        )
+        # Only a full run may move the shared cursor
+        self.cursor_name = AUTOFILL_CURSOR if not department_ids else None
+
+    @classmethod
+    def resume_date(cls):
+        """Day after the last one a full run finished, or None"""
+        cursor = JobCursor.objects.filter(name=AUTOFILL_CURSOR).first()
+        return cursor.position + timedelta(days=1) if cursor else None
+
+    def fill_day(self, day):
+        """Create the missing rows for one day; returns how many were added"""
+        statuses = {
+            department_id: autofill_status(calendar, day)
+            for department_id, calendar in self.calendars.items()
+        }
+        with transaction.atomic():
+            marked = set(Attendance.objects.filter(date=day).values_list('employee_id', flat=True))
+            rows = [
+                Attendance(
+                    employee_id=employee_id,
+                    department_id=department_id,
+                    date=day,
+                    status=statuses[department_id],
+                )
+                for employee_id, department_id, first_day in self.employees
+                if first_day <= day and employee_id not in marked
+            ]
+            for start in range(0, len(rows), self.batch_size):
+                Attendance.objects.bulk_create(
+                    rows[start:start + self.batch_size], ignore_conflicts=True
+                )
+            if self.cursor_name:
+                JobCursor.objects.update_or_create(
+                    name=self.cursor_name, defaults={'position': day}
+                )
+        return len(rows)
+
+    def run(self, start_date, end_date):
+        """Fill every day from start_date to end_date; yields (day, rows added)"""
+        day = start_date
+        while day <= end_date:
+            yield day, self.fill_day(day)
+            day += timedelta(days=1)
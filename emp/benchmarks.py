@@ -0,0 +1,194 @@
+import datetime
+import json
+import statistics
+import time
+import tracemalloc
+from contextlib import ExitStack
+
+from django.contrib.auth.models import User
+from django.db import connections
+from django.db.models import Max
+from django.test import Client
+from django.utils import timezone
+
+from .models import CustomUser
+
+
+# Upper bounds a run must stay within, calibrated on the default generated
+# dataset (10 departments, 500 employees, 30 days). Every page runs a fixed
+# number of queries whatever the dataset, so the query limits sit just above
+# it: a per-row query coming back on any of these pages (each lists at least
+# ten rows) fails the run. The timings and memory are loose since they
+# depend on the machine. Override per scenario with a JSON file of the same
+# shape.
+DEFAULT_THRESHOLDS = {
+    'home_page': {'queries': 10, 'p95_ms': 500, 'peak_memory_kb': 4000},
+    'attendance_dashboard': {'queries': 12, 'p95_ms': 1500, 'peak_memory_kb': 16000},
+    'attendance_report': {'queries': 11, 'p95_ms': 500, 'peak_memory_kb': 4000},
+    'daily_attendance': {'queries': 9, 'p95_ms': 500, 'peak_memory_kb': 4000},
+    'monthly_attendance_summary': {'queries': 9, 'p95_ms': 250, 'peak_memory_kb': 2000},
+    'manage_departments': {'queries': 10, 'p95_ms': 500, 'peak_memory_kb': 4000},
+    'admin_customuser_changelist': {'queries': 11, 'p95_ms': 1500, 'peak_memory_kb': 8000},
+    'admin_attendance_changelist': {'queries': 13, 'p95_ms': 1000, 'peak_memory_kb': 8000},
+    'admin_department_changelist': {'queries': 10, 'p95_ms': 500, 'peak_memory_kb': 4000},
+    'admin_leaverequest_changelist': {'queries': 12, 'p95_ms': 1000, 'peak_memory_kb': 8000},
+    'admin_activitylog_changelist': {'queries': 13, 'p95_ms': 1500, 'peak_memory_kb': 8000},
+    'log_dashboard': {'queries': 15, 'p95_ms': 250, 'peak_memory_kb': 1000},
+}
+
+AJAX = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+
+
+def _scenarios(today):
+    """(name, role, path, extra request headers) of every page benchmarked"""
+    month_start = today.replace(day=1)
+    report = f"start_date={(today - datetime.timedelta(days=30)).isoformat()}&end_date={today.isoformat()}"
+    yesterday = (today - datetime.timedelta(days=1)).isoformat()
+    return [
+        ('home_page', 'admin', '/', {}),
+        ('attendance_dashboard', 'manager', f'/attendance/?date={yesterday}', {}),
+        ('attendance_report', 'manager', f'/attendance/report/?{report}', {}),
+        ('daily_attendance', 'manager', f'/api/attendance/daily/?date={yesterday}', AJAX),
+        (
+            'monthly_attendance_summary', 'manager',
+            f'/api/attendance/monthly-summary/?month={month_start.month}&year={month_start.year}', AJAX,
+        ),
+        ('manage_departments', 'admin', '/manage-departments/', {}),
+        ('admin_customuser_changelist', 'admin', '/admin/emp/customuser/', {}),
+        ('admin_attendance_changelist', 'admin', '/admin/emp/attendance/', {}),
+        ('admin_department_changelist', 'admin', '/admin/emp/department/', {}),
+        ('admin_leaverequest_changelist', 'admin', '/admin/emp/leaverequest/', {}),
+        ('admin_activitylog_changelist', 'admin', '/admin/utils/activitylog/', {}),
+        ('log_dashboard', 'admin', '/admin/logs-dashboard/', {}),
+    ]
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    if len(ordered) == 1:
+        return ordered[0]
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class BenchmarkRunner:
+    """
+    Drive the main pages through the test client as a superadmin and a
+    department manager and record, per page: the number of SQL queries,
+    p50/p95/mean latency over `iterations` requests (after one warm-up),
+    and the peak Python memory allocated while serving one request.
+
+    check() compares the results with the thresholds and returns the
+    violations, so callers can fail a build on regressions.
+    """
+
+    def __init__(self, admin_user, manager_user, iterations=20, thresholds=None, only=None):
+        self.users = {'admin': admin_user, 'manager': manager_user}
+        self.iterations = max(1, iterations)
+        self.thresholds = {name: dict(limits) for name, limits in DEFAULT_THRESHOLDS.items()}
+        for name, limits in (thresholds or {}).items():
+            self.thresholds.setdefault(name, {}).update(limits)
+        self.only = set(only) if only else None
+        self.clients = {}
+
+    def client_for(self, role):
+        if role not in self.clients:
+            client = Client()
+            client.force_login(self.users[role])
+            self.clients[role] = client
+        return self.clients[role]
+
+    def request(self, role, path, headers):
+        return self.client_for(role).get(path, **headers)
+
+    def measure(self, name, role, path, headers):
+        response = self.request(role, path, headers)
+        if response.status_code != 200:
+            return {'status': response.status_code, 'error': f"HTTP {response.status_code}"}
+
+        # The test client resets connection.queries at every request, so
+        # count at the cursor (of the primary and the replica) instead of
+        # using CaptureQueriesContext
+        queries = []
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(
+                    conn.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args))
+                )
+            self.request(role, path, headers)
+
+        timings = []
+        for _ in range(self.iterations):
+            started = time.perf_counter()
+            response = self.request(role, path, headers)
+            if getattr(response, 'streaming', False):
+                b''.join(response.streaming_content)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        tracemalloc.start()
+        try:
+            self.request(role, path, headers)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'status': response.status_code,
+            'queries': len(queries),
+            'p50_ms': round(percentile(timings, 0.5), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'mean_ms': round(statistics.fmean(timings), 2),
+            'peak_memory_kb': round(peak / 1024, 1),
+            'iterations': self.iterations,
+        }
+
+    def run(self, stdout=None):
+        results = {}
+        for name, role, path, headers in _scenarios(timezone.localdate()):
+            if self.only is not None and name not in self.only:
+                continue
+            results[name] = self.measure(name, role, path, headers)
+            if stdout is not None:
+                stdout.write(f"{name}: {json.dumps(results[name])}")
+        return results
+
+    def check(self, results):
+        """[(scenario, metric, value, limit)] for every threshold exceeded"""
+        violations = []
+        for name, result in results.items():
+            if 'error' in result:
+                violations.append((name, 'status', result['status'], 200))
+                continue
+            for metric, limit in self.thresholds.get(name, {}).items():
+                if metric in result and result[metric] > limit:
+                    violations.append((name, metric, result[metric], limit))
+        return violations
+
+
+def default_users():
+    """A superadmin and a department manager to run the benchmarks as"""
+    admin = (
+        CustomUser.objects.filter(role='admin', user__is_superuser=True)
+        .select_related('user').first()
+    )
+    manager = (
+        CustomUser.objects.filter(role='manager', department__isnull=False, is_active=True)
+        .select_related('user').first()
+    )
+    return (admin.user if admin else None), (manager.user if manager else None)
+
+
+def create_benchmark_admin(department):
+    """A superadmin with an admin profile, for generated datasets"""
+    user, created = User.objects.get_or_create(
+        username='benchmark-admin',
+        defaults={'email': 'benchmark-admin@example.com', 'is_staff': True, 'is_superuser': True},
+    )
+    if created:
+        top = CustomUser.objects.aggregate(top=Max('phone_number'))['top'] or 8999999999
+        CustomUser.objects.create(
+            user=user, phone_number=top + 1, address='Benchmark', department=department, role='admin',
+        )
+    return user
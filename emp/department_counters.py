@@ -0,0 +1,101 @@
+from collections import defaultdict
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+
+# Department.employee_count / active_employee_count are maintained from
+# here. Every change to a CustomUser's department or active flag goes
+# through apply() in the same transaction as the change itself:
+#   - CustomUser.save() (create, move, toggle)
+#   - CustomUserQuerySet.update() and bulk_create()
+#   - the post_delete signal (single and cascading deletes)
+# recount() rebuilds them from the employee rows when they have drifted.
+
+
+def change(old, new, deltas=None):
+    """
+    Add the counter movement of one employee going from state old to state
+    new (either may be None for "not counted anywhere") to deltas, a
+    {department_id: [total, active]} dict.
+    """
+    if deltas is None:
+        deltas = defaultdict(lambda: [0, 0])
+    if old == new:
+        return deltas
+    for state, sign in ((old, -1), (new, 1)):
+        if state is None or state[0] is None:
+            continue
+        department_id, is_active = state
+        deltas[department_id][0] += sign
+        deltas[department_id][1] += sign if is_active else 0
+    return deltas
+
+
+def apply(deltas, using=DEFAULT_DB_ALIAS):
+    """Add the deltas to the stored counters with a single UPDATE"""
+    from .models import Department
+
+    deltas = {pk: delta for pk, delta in deltas.items() if delta[0] or delta[1]}
+    if not deltas:
+        return 0
+
+    def shift(field, index):
+        return F(field) + Case(
+            *[When(pk=pk, then=Value(delta[index])) for pk, delta in deltas.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+
+    return Department.objects.using(using).filter(pk__in=deltas).update(
+        employee_count=shift('employee_count', 0),
+        active_employee_count=shift('active_employee_count', 1),
+    )
+
+
+def actual_counts(departments):
+    """Annotate departments with the counts the employee rows say they should have"""
+    from .models import CustomUser
+
+    def count(**filters):
+        employees = (
+            CustomUser.objects.filter(department=OuterRef('pk'), **filters)
+            .order_by()
+            .values('department')
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        return Coalesce(Subquery(employees, output_field=IntegerField()), 0)
+
+    return departments.annotate(actual_total=count(), actual_active=count(is_active=True))
+
+
+def recount(department_ids=None, dry_run=False, using=DEFAULT_DB_ALIAS):
+    """
+    Compare the stored counters with the employee rows and fix the ones
+    that drifted. Returns [(department, (stored total, active), (actual
+    total, active))] for every department that was off.
+    """
+    from .models import Department
+
+    with transaction.atomic(using=using):
+        departments = Department.objects.using(using).select_for_update()
+        if department_ids is not None:
+            departments = departments.filter(pk__in=department_ids)
+        drifted = actual_counts(departments).filter(
+            ~Q(employee_count=F('actual_total')) | ~Q(active_employee_count=F('actual_active'))
+        )
+        report = []
+        for department in drifted:
+            report.append((
+                department,
+                (department.employee_count, department.active_employee_count),
+                (department.actual_total, department.actual_active),
+            ))
+            if not dry_run:
+                Department.objects.using(using).filter(pk=department.pk).update(
+                    employee_count=department.actual_total,
+                    active_employee_count=department.actual_active,
+                )
+    return report
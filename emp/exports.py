@@ -0,0 +1,62 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+# Rows fetched from the database per round trip while streaming
+CHUNK_SIZE = 2000
+
+# Spreadsheet apps run cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class Echo:
+    """File-like object whose write() hands back the line csv.writer produced"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _csv_lines(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_csv_cell(value) for value in row])
+
+
+def _jsonl_lines(columns, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def requested_format(request):
+    """'csv' or 'jsonl' when the request asks for an export, else None"""
+    export_format = request.GET.get('format', '').lower()
+    return export_format if export_format in EXPORT_FORMATS else None
+
+
+def stream_export(export_format, filename, columns, rows):
+    """
+    StreamingHttpResponse writing rows (an iterable of tuples, typically
+    queryset.values_list(...).iterator(chunk_size=CHUNK_SIZE)) as CSV or
+    JSON lines, so only one chunk is ever held in memory.
+    """
+    lines = _csv_lines(columns, rows) if export_format == 'csv' else _jsonl_lines(columns, rows)
+    response = StreamingHttpResponse(lines, content_type=EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
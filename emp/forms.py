@@ -186,4 +186,21 @@ class DepartmentForm(forms.ModelForm):
             qs = qs.exclude(pk=self.instance.pk)
         if qs.exists():
             raise forms.ValidationError('Department name already exists.')
-        return name
\ No newline at end of file
+        return name
+
+class EmployeeImportForm(forms.Form):
+    file = forms.FileField(help_text=_("CSV or JSON lines (.jsonl), one employee per row"))
+    default_password = forms.CharField(
+        required=False,
+        min_length=8,
+        widget=forms.PasswordInput,
+        help_text=_("Used for rows without a password; left empty they get an unusable one"),
+    )
+
+    def clean_file(self):
+        upload = self.cleaned_data['file']
+        extension = upload.name.rsplit('.', 1)[-1].lower()
+        if extension not in ('csv', 'jsonl'):
+            raise forms.ValidationError(_('Upload a .csv or .jsonl file.'))
+        self.cleaned_data['format'] = extension
+        return upload
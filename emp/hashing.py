@@ -0,0 +1,66 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+
+
+# Kept free of model imports: spawned workers import this module before
+# Django is set up.
+
+
+def _init_worker(settings_module):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+class PasswordHasher:
+    """
+    make_password() over many passwords, spread across a pool of worker
+    processes (the hashers are CPU bound and hold the GIL). Use as a context
+    manager so the pool is started once and shut down at the end; with one
+    worker everything is hashed inline.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            from django.conf import settings
+
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE),),
+            )
+        return self._pool
+
+    def hash_all(self, passwords):
+        """Hashes in input order; empty passwords get an unusable hash"""
+        hashed = [make_password(None) for _ in passwords]
+        to_hash = [(index, password) for index, password in enumerate(passwords) if password]
+        if self.workers > 1 and len(to_hash) > 1:
+            chunksize = max(1, len(to_hash) // (self.workers * 4))
+            results = self._get_pool().map(
+                make_password, [password for _, password in to_hash], chunksize=chunksize
+            )
+        else:
+            results = [make_password(password) for _, password in to_hash]
+        for (index, _), value in zip(to_hash, results):
+            hashed[index] = value
+        return hashed
@@ -0,0 +1,286 @@
+import csv
+import io
+import json
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from utils.logging_utils import Logger
+
+from .hashing import PasswordHasher
+from .models import CustomUser, Department
+from .statistics import EmployeeStatistics
+
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+
+IMPORT_COLUMNS = (
+    'username', 'email', 'first_name', 'last_name', 'password',
+    'phone_number', 'department', 'address', 'role', 'is_active',
+)
+
+TRUE_VALUES = ('1', 'true', 'yes', 'y', 'active')
+
+
+def read_rows(fileobj, import_format):
+    """Yield (line number, row dict) from an uploaded or opened CSV/JSONL file"""
+    if isinstance(fileobj.read(0), bytes):
+        fileobj = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    if import_format == 'csv':
+        reader = csv.DictReader(fileobj)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_number, line in enumerate(fileobj, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                row = {'__error__': f"Invalid JSON: {e}"}
+            if not isinstance(row, dict):
+                row = {'__error__': "Each line must be a JSON object"}
+            yield line_number, row
+
+
+class ImportResult:
+    """Outcome of an import: ids created and one error entry per rejected row"""
+
+    def __init__(self):
+        self.created_ids = []
+        self.errors = []
+
+    @property
+    def created(self):
+        return len(self.created_ids)
+
+    def add_error(self, line, username, messages):
+        self.errors.append({'line': line, 'username': username or '', 'errors': list(messages)})
+
+    def write_report(self, fh, report_format='csv'):
+        """Per-row error report as CSV (line, username, errors) or JSON lines"""
+        if report_format == 'jsonl':
+            for error in self.errors:
+                fh.write(json.dumps(error) + '\n')
+            return
+        writer = csv.writer(fh)
+        writer.writerow(['line', 'username', 'errors'])
+        for error in self.errors:
+            writer.writerow([error['line'], error['username'], '; '.join(error['errors'])])
+
+
+class EmployeeImporter:
+    """
+    Bulk employee import from CSV or JSON lines, one row per employee with
+    the IMPORT_COLUMNS (department by code, name or id; password optional,
+    otherwise default_password or an unusable one).
+
+    Rows are handled in chunks: each chunk is validated in memory, checked
+    for taken usernames, emails and phone numbers with one query per column,
+    has its passwords hashed across a process pool, and is inserted with
+    two bulk_creates (User, CustomUser) in its own transaction. Bad rows go
+    to the error report; they never abort the rest of the import.
+    """
+
+    def __init__(self, chunk_size=500, workers=None, default_password=None, user=None, request=None):
+        self.chunk_size = max(1, int(chunk_size))
+        self.workers = workers
+        self.default_password = default_password
+        self.user = user
+        self.request = request
+        self._hasher = None
+        self._departments = None
+        self._seen = {'username': set(), 'email': set(), 'phone_number': set()}
+
+    # -- setup -------------------------------------------------------------
+
+    def _department_lookup(self):
+        if self._departments is None:
+            lookup = {}
+            for department in Department.objects.all():
+                lookup[str(department.pk)] = department.pk
+                lookup[department.code.strip().lower()] = department.pk
+                lookup[department.name.strip().lower()] = department.pk
+            self._departments = lookup
+        return self._departments
+
+    # -- validation --------------------------------------------------------
+
+    def clean_row(self, row):
+        """Return (cleaned values, error messages) for one raw row"""
+        if '__error__' in row:
+            return None, [row['__error__']]
+
+        def value(name):
+            raw = row.get(name)
+            return '' if raw is None else str(raw).strip()
+
+        errors = []
+        cleaned = {
+            'username': value('username'),
+            'email': value('email'),
+            'first_name': value('first_name')[:150],
+            'last_name': value('last_name')[:150],
+            'password': value('password') or self.default_password,
+            'address': value('address'),
+            'role': value('role').lower() or 'employee',
+        }
+
+        if not cleaned['username']:
+            errors.append("username is required")
+        elif len(cleaned['username']) > 150:
+            errors.append("username must be 150 characters or fewer")
+
+        try:
+            validate_email(cleaned['email'])
+        except ValidationError:
+            errors.append("a valid email is required")
+
+        phone = value('phone_number').lstrip('+')
+        if not phone.isdigit() or not 10 <= len(phone) <= 15:
+            errors.append("phone_number must be 10 to 15 digits")
+        else:
+            cleaned['phone_number'] = int(phone)
+
+        if not cleaned['address']:
+            errors.append("address is required")
+        elif len(cleaned['address']) > 100:
+            errors.append("address must be 100 characters or fewer")
+
+        if cleaned['role'] not in dict(CustomUser.ROLE_CHOICES):
+            errors.append(f"unknown role {cleaned['role']!r}")
+
+        department = value('department')
+        cleaned['department_id'] = None
+        if department:
+            cleaned['department_id'] = self._department_lookup().get(department.lower())
+            if cleaned['department_id'] is None:
+                errors.append(f"unknown department {department!r}")
+
+        is_active = value('is_active').lower()
+        cleaned['is_active'] = not is_active or is_active in TRUE_VALUES
+
+        if cleaned['password'] and len(cleaned['password']) < 8:
+            errors.append("password must be at least 8 characters long")
+
+        return cleaned, errors
+
+    def _check_unique(self, batch, result):
+        """Drop rows whose username, email or phone is already taken, in the
+        database (one query per column) or earlier in the file"""
+        taken = {
+            'username': set(User.objects.filter(
+                username__in=[row['username'] for _, row in batch]
+            ).values_list('username', flat=True)),
+            'email': set(User.objects.filter(
+                email__in=[row['email'] for _, row in batch]
+            ).values_list('email', flat=True)),
+            'phone_number': set(CustomUser.objects.filter(
+                phone_number__in=[row['phone_number'] for _, row in batch]
+            ).values_list('phone_number', flat=True)),
+        }
+        unique = []
+        for line, row in batch:
+            errors = []
+            for column, label in (('username', 'username'), ('email', 'email'), ('phone_number', 'phone number')):
+                if row[column] in taken[column]:
+                    errors.append(f"a user with this {label} already exists")
+                elif row[column] in self._seen[column]:
+                    errors.append(f"duplicate {label} in the import file")
+            if errors:
+                result.add_error(line, row['username'], errors)
+                continue
+            for column in self._seen:
+                self._seen[column].add(row[column])
+            unique.append((line, row))
+        return unique
+
+    # -- inserting ---------------------------------------------------------
+
+    def _build(self, row, password):
+        user = User(
+            username=row['username'], email=row['email'], password=password,
+            first_name=row['first_name'], last_name=row['last_name'],
+        )
+        profile = CustomUser(
+            phone_number=row['phone_number'], address=row['address'],
+            department_id=row['department_id'], role=row['role'], is_active=row['is_active'],
+        )
+        return user, profile
+
+    def _insert(self, batch, result):
+        passwords = self._hasher.hash_all([row['password'] for _, row in batch])
+        built = [self._build(row, password) for (_, row), password in zip(batch, passwords)]
+        try:
+            with transaction.atomic():
+                users = User.objects.bulk_create([user for user, _ in built])
+                if any(user.pk is None for user in users):
+                    # Backends that can't return ids from a bulk insert (MySQL)
+                    ids = dict(User.objects.filter(
+                        username__in=[user.username for user in users]
+                    ).values_list('username', 'id'))
+                    for user in users:
+                        user.pk = ids[user.username]
+                for user, profile in built:
+                    profile.user = user
+                CustomUser.objects.bulk_create([profile for _, profile in built])
+            result.created_ids.extend(profile.pk for _, profile in built)
+        except IntegrityError:
+            # Someone else took a value in the meantime; find the culprits
+            for (line, row), (user, profile) in zip(batch, built):
+                try:
+                    with transaction.atomic():
+                        user.pk = None
+                        user.save(force_insert=True)
+                        profile.user = user
+                        profile.save(force_insert=True)
+                    result.created_ids.append(profile.pk)
+                except IntegrityError as e:
+                    result.add_error(line, row['username'], [f"could not be saved: {e}"])
+
+    def _process(self, chunk, result):
+        batch = []
+        for line, raw in chunk:
+            cleaned, errors = self.clean_row(raw)
+            if errors:
+                result.add_error(line, (cleaned or {}).get('username') or raw.get('username'), errors)
+            else:
+                batch.append((line, cleaned))
+        if batch:
+            batch = self._check_unique(batch, result)
+        if batch:
+            self._insert(batch, result)
+
+    def run(self, rows):
+        """Import (line, row dict) pairs, e.g. from read_rows(); returns an ImportResult"""
+        result = ImportResult()
+        chunk = []
+        with PasswordHasher(self.workers) as self._hasher:
+            for line, row in rows:
+                chunk.append((line, row))
+                if len(chunk) >= self.chunk_size:
+                    self._process(chunk, result)
+                    chunk = []
+            if chunk:
+                self._process(chunk, result)
+        result.errors.sort(key=lambda error: error['line'])
+
+        self._after_import(result)
+        return result
+
+    def _after_import(self, result):
+        # bulk_create sends no post_save; CustomUserQuerySet.bulk_create
+        # indexes the new rows, the cached statistics are dropped here
+        if result.created_ids:
+            EmployeeStatistics.invalidate()
+        Logger.log_activity(
+            user=self.user,
+            log_type='import',
+            module='employee',
+            action=f"Imported {result.created} employees ({len(result.errors)} rows rejected)",
+            request=self.request,
+            status='success' if not result.errors else 'warning',
+            additional_data={'created': result.created, 'rejected': len(result.errors)},
+        )
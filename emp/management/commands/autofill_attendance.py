@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from emp.attendance import AttendanceAutofill
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the Attendance rows nobody marked: 'absent' on each department's "
+        "working days and 'holiday'/'weekend' on the rest. Meant to run nightly; "
+        "safe to re-run, and without --start it resumes after the last day a "
+        "previous run finished."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First day to fill (YYYY-MM-DD)")
+        parser.add_argument('--end', help="Last day to fill (YYYY-MM-DD), default yesterday")
+        parser.add_argument(
+            '--days', type=int, default=1,
+            help="With no --start and no saved cursor, fill this many days up to --end (default 1)",
+        )
+        parser.add_argument(
+            '--department', type=int, action='append', dest='departments',
+            help="Only this department id (repeatable); does not move the saved cursor",
+        )
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def parse_day(self, value):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f"Invalid date {value!r}, expected YYYY-MM-DD")
+
+    def handle(self, *args, **options):
+        end_day = (
+            self.parse_day(options['end']) if options['end']
+            else timezone.localdate() - timedelta(days=1)
+        )
+        if options['start']:
+            start_day = self.parse_day(options['start'])
+        else:
+            start_day = AttendanceAutofill.resume_date() or end_day - timedelta(days=options['days'] - 1)
+        if start_day > end_day:
+            self.stdout.write("Nothing to fill, already up to date.")
+            return
+
+        autofill = AttendanceAutofill(
+            department_ids=options['departments'], batch_size=options['batch_size']
+        )
+        total = 0
+        for day, added in autofill.run(start_day, end_day):
+            total += added
+            self.stdout.write(f"{day}: {added} row(s) added")
+        self.stdout.write(self.style.SUCCESS(
+            f"Filled {start_day}..{end_day}: {total} attendance row(s) created"
+        ))
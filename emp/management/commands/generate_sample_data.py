@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from emp.sample_data import SAMPLE_PASSWORD, SampleDataGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with synthetic departments, employees, attendance, "
+        "leave requests and logs using bulk inserts (for benchmarks and local "
+        "development; do not run against production)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--departments', type=int, default=10)
+        parser.add_argument('--employees', type=int, default=500)
+        parser.add_argument('--days', type=int, default=30, help="Days of attendance and logs, ending yesterday")
+        parser.add_argument('--logs-per-day', type=int, default=200, help="Activity log rows per day")
+        parser.add_argument('--prefix', default='sample', help="Username and department code prefix")
+        parser.add_argument('--seed', type=int, help="Random seed, for reproducible datasets")
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if options['departments'] < 1 or options['employees'] < options['departments']:
+            raise CommandError("Need at least one department and one employee per department")
+        generator = SampleDataGenerator(
+            departments=options['departments'],
+            employees=options['employees'],
+            days=options['days'],
+            logs_per_day=options['logs_per_day'],
+            prefix=options['prefix'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            stdout=self.stdout,
+        )
+        generator.run()
+        self.stdout.write(self.style.SUCCESS(
+            f"Sample data created; generated users log in with the password {SAMPLE_PASSWORD!r}"
+        ))
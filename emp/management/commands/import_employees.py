@@ -0,0 +1,53 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from emp.importer import IMPORT_COLUMNS, IMPORT_FORMATS, EmployeeImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Import employees from a CSV or JSON lines file with the columns "
+        f"{', '.join(IMPORT_COLUMNS)}. Invalid rows are reported and skipped; "
+        "the rest are created in chunked bulk inserts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help="Path to the .csv or .jsonl file")
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help="Default: from the file extension")
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, help="Password hashing processes, default one per CPU")
+        parser.add_argument('--default-password', help="Password for rows that have none")
+        parser.add_argument('--report', help="Write the per-row error report here (.csv or .jsonl)")
+
+    def handle(self, *args, **options):
+        path = options['file']
+        import_format = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if import_format not in IMPORT_FORMATS:
+            raise CommandError(f"Cannot tell the format of {path!r}, pass --format")
+        if options['default_password'] and len(options['default_password']) < 8:
+            raise CommandError("--default-password must be at least 8 characters long")
+
+        importer = EmployeeImporter(
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            default_password=options['default_password'],
+        )
+        try:
+            with open(path, 'rb') as fh:
+                result = importer.run(read_rows(fh, import_format))
+        except OSError as e:
+            raise CommandError(str(e))
+
+        if options['report']:
+            report_format = 'jsonl' if options['report'].endswith('.jsonl') else 'csv'
+            with open(options['report'], 'w', newline='', encoding='utf-8') as fh:
+                result.write_report(fh, report_format)
+        else:
+            for error in result.errors[:20]:
+                self.stderr.write(f"line {error['line']} ({error['username']}): {'; '.join(error['errors'])}")
+            if len(result.errors) > 20:
+                self.stderr.write(f"... {len(result.errors) - 20} more, use --report for the full list")
+
+        style = self.style.SUCCESS if not result.errors else self.style.WARNING
+        self.stdout.write(style(f"{result.created} employee(s) imported, {len(result.errors)} row(s) rejected"))
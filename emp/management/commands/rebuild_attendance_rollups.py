@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from emp import rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the daily department attendance rollups behind the attendance "
+        "dashboard and monthly summary from the Attendance table, for every day "
+        "or a date range."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First day to rebuild (YYYY-MM-DD)")
+        parser.add_argument('--end', help="Last day to rebuild (YYYY-MM-DD)")
+        parser.add_argument(
+            '--department', type=int, action='append', dest='departments',
+            help="Only this department id (repeatable)",
+        )
+
+    def parse_day(self, value):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f"Invalid date {value!r}, expected YYYY-MM-DD")
+
+    def handle(self, *args, **options):
+        start_day = self.parse_day(options['start']) if options['start'] else None
+        end_day = self.parse_day(options['end']) if options['end'] else None
+        if start_day and end_day and start_day > end_day:
+            raise CommandError("--start must not be after --end")
+
+        created = rollups.rebuild(start_day, end_day, department_ids=options['departments'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {created} daily department attendance row(s)"
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from emp.search import EmployeeSearchIndex
+
+
+class Command(BaseCommand):
+    help = "Create (if needed) and fully rebuild the employee directory full-text index."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        if EmployeeSearchIndex.create(using=options['database']):
+            self.stdout.write(self.style.SUCCESS("Employee search index rebuilt."))
+        else:
+            self.stdout.write(self.style.WARNING(
+                "This database does not support the FTS5 trigram index; "
+                "the employee directory keeps using icontains filters."
+            ))
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from emp.attendance import reconcile_departments, stale_department_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfill Attendance.department from each row's employee, and fix rows "
+        "left pointing at an old department after employees moved."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help="Only fix rows dated on or after this day (YYYY-MM-DD), so older "
+                 "attendance stays with the department it was recorded under",
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Only report how many rows are out of date",
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError(f"Invalid date {options['since']!r}, expected YYYY-MM-DD")
+
+        if options['dry_run']:
+            stale = stale_department_rows(since).count()
+            self.stdout.write(f"{stale} attendance row(s) have an out of date department")
+            return
+
+        fixed = reconcile_departments(since=since, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Updated the department of {fixed} attendance row(s)"))
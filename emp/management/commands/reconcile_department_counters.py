@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from emp.department_counters import recount
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount Department.employee_count and active_employee_count from the "
+        "employee rows and fix any department whose stored counters drifted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--department', type=int, action='append', dest='departments',
+            help="Only this department id (repeatable)",
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Only report the departments that are off",
+        )
+
+    def handle(self, *args, **options):
+        drifted = recount(department_ids=options['departments'], dry_run=options['dry_run'])
+        for department, stored, actual in drifted:
+            self.stdout.write(
+                f"{department}: stored {stored[0]} total / {stored[1]} active, "
+                f"actual {actual[0]} / {actual[1]}"
+            )
+        if options['dry_run']:
+            self.stdout.write(f"{len(drifted)} department(s) have drifted counters")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Fixed the counters of {len(drifted)} department(s)"))
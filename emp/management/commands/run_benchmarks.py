@@ -0,0 +1,144 @@
+import json
+import os
+import platform
+import tempfile
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from emp.benchmarks import BenchmarkRunner, create_benchmark_admin, default_users
+from emp.models import Department
+from emp.sample_data import SampleDataGenerator
+from utils.log_writer import reset_writer
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the main pages through the test client: SQL query count, "
+        "p50/p95 latency and peak memory per page, written as JSON. Exits with "
+        "an error when a threshold is exceeded. By default a throwaway test "
+        "database is created and filled with generated data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--departments', type=int, default=10)
+        parser.add_argument('--employees', type=int, default=500)
+        parser.add_argument('--days', type=int, default=30)
+        parser.add_argument('--logs-per-day', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--iterations', type=int, default=20, help="Timed requests per page")
+        parser.add_argument('--only', action='append', help="Only this scenario (repeatable)")
+        parser.add_argument(
+            '--use-existing-db', action='store_true',
+            help="Run against the configured database and its data instead of a generated test database",
+        )
+        parser.add_argument('--admin', help="Username of the superadmin to run as (existing database)")
+        parser.add_argument('--manager', help="Username of the department manager to run as (existing database)")
+        parser.add_argument('--thresholds', help="JSON file of {scenario: {metric: limit}} overriding the defaults")
+        parser.add_argument('--output', help="Write the JSON results here instead of stdout")
+        parser.add_argument('--no-fail', action='store_true', help="Report threshold violations without failing")
+
+    def handle(self, *args, **options):
+        thresholds = None
+        if options['thresholds']:
+            with open(options['thresholds'], encoding='utf-8') as fh:
+                thresholds = json.load(fh)
+
+        setup_test_environment()
+        test_runner = old_config = scratch = None
+        try:
+            if options['use_existing_db']:
+                dataset = {'database': 'existing'}
+            else:
+                scratch = self.use_file_test_database()
+                test_runner = DiscoverRunner(interactive=False, verbosity=0)
+                old_config = test_runner.setup_databases()
+                dataset = self.generate(options)
+            results, violations, runner = self.run_benchmarks(options, thresholds)
+        finally:
+            if test_runner is not None:
+                # Write out the buffered request logs while the tables exist
+                reset_writer()
+                test_runner.teardown_databases(old_config)
+            if scratch is not None and os.path.exists(scratch):
+                os.remove(scratch)
+            teardown_test_environment()
+
+        report = {
+            'generated_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'dataset': dataset,
+            'iterations': options['iterations'],
+            'results': results,
+            'thresholds': runner.thresholds,
+            'violations': [
+                {'scenario': name, 'metric': metric, 'value': value, 'limit': limit}
+                for name, metric, value, limit in violations
+            ],
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                fh.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+        if violations:
+            summary = ', '.join(f"{name} {metric} {value} > {limit}" for name, metric, value, limit in violations)
+            if options['no_fail']:
+                self.stderr.write(f"Thresholds exceeded: {summary}")
+            else:
+                raise CommandError(f"Thresholds exceeded: {summary}")
+
+    def use_file_test_database(self):
+        """
+        SQLite test databases are in-memory with a shared cache, where the
+        log writer thread's inserts table-lock the requests' session saves;
+        a file database locks (and performs) like the real one.
+        """
+        settings_dict = connections['default'].settings_dict
+        if settings_dict['ENGINE'] != 'django.db.backends.sqlite3':
+            return None
+        handle, path = tempfile.mkstemp(prefix='emp-benchmark-', suffix='.sqlite3')
+        os.close(handle)
+        os.remove(path)
+        settings_dict.setdefault('TEST', {})['NAME'] = path
+        return path
+
+    def generate(self, options):
+        if options['departments'] < 1 or options['employees'] < options['departments']:
+            raise CommandError("Need at least one department and one employee per department")
+        generator = SampleDataGenerator(
+            departments=options['departments'],
+            employees=options['employees'],
+            days=options['days'],
+            logs_per_day=options['logs_per_day'],
+            seed=options['seed'],
+            stdout=self.stderr,
+        )
+        dataset = generator.run()
+        create_benchmark_admin(Department.objects.get(pk=dataset['departments'][0]))
+        dataset['departments'] = len(dataset['departments'])
+        dataset['days'] = options['days']
+        return dataset
+
+    def run_benchmarks(self, options, thresholds):
+        admin, manager = default_users()
+        if options['admin']:
+            admin = User.objects.filter(username=options['admin']).first()
+        if options['manager']:
+            manager = User.objects.filter(username=options['manager']).first()
+        if admin is None or manager is None:
+            raise CommandError("Need a superadmin and a department manager to run as, see --admin/--manager")
+
+        runner = BenchmarkRunner(
+            admin, manager, iterations=options['iterations'], thresholds=thresholds, only=options['only'],
+        )
+        results = runner.run(stdout=self.stderr)
+        return results, runner.check(results), runner
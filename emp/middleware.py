@@ -0,0 +1,68 @@
+from django.contrib.auth.models import User
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+
+from utils import metrics
+
+from .access import EmployeeAccess
+from .models import CustomUser
+
+
+def load_profile(user):
+    """
+    The user's CustomUser with its department, in one query, and cached on
+    user.custom_user_profile so later reads in the request are free. A user
+    without a profile caches None, so the attribute keeps raising
+    RelatedObjectDoesNotExist without going back to the database.
+    """
+    descriptor = User.custom_user_profile
+    if descriptor.is_cached(user):
+        return descriptor.related.get_cached_value(user)
+    profile = CustomUser.objects.select_related('department').filter(user=user).first()
+    if profile is None:
+        descriptor.related.set_cached_value(user, None)
+    else:
+        user.custom_user_profile = profile
+    return profile
+
+
+def get_employee_access(request, use_session=False):
+    user = request.user
+    if not user.is_authenticated:
+        return EmployeeAccess.anonymous()
+    if use_session:
+        access = EmployeeAccess.from_session(request.session, user.pk)
+        metrics.CACHE_REQUESTS.inc('employee_access_session', 'miss' if access is None else 'hit')
+        if access is not None:
+            return access
+    access = EmployeeAccess.for_profile(user, load_profile(user))
+    if use_session:
+        access.to_session(request.session)
+    return access
+
+
+class EmployeeAccessMiddleware(MiddlewareMixin):
+    """
+    Resolve the current user's employee profile, department and role once
+    per request and expose them as request.employee_access (see
+    emp.access.EmployeeAccess). Goes after AuthenticationMiddleware.
+
+    Views marked with @session_cached_access take the access object from the
+    session and skip the profile query; everywhere else the profile is
+    loaded with its department up front, so request.user.custom_user_profile
+    and .department no longer cost a query each.
+    Views marked no_employee_access (the metrics endpoint) are left alone,
+    so neither the session nor the user is loaded for them.
+    """
+
+    def process_request(self, request):
+        request.employee_access = SimpleLazyObject(lambda: get_employee_access(request))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(view_func, 'no_employee_access', False):
+            return None
+        if not request.user.is_authenticated:
+            return None
+        use_session = getattr(view_func, 'employee_access_session_cache', False)
+        request.employee_access = get_employee_access(request, use_session=use_session)
+        return None
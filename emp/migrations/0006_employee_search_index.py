@@ -0,0 +1,58 @@
+# FTS5 full-text index over the employee directory (emp.search). The SQL is
+# copied here as it was when the index was introduced, so later changes to
+# emp.search do not change what this migration does.
+
+from django.db import OperationalError, migrations
+
+
+CREATE_INDEX = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS emp_customuser_search USING fts5("
+    "employee_id UNINDEXED, name, username, phone, department, address, "
+    "tokenize='trigram')"
+)
+
+FILL_INDEX = """
+    INSERT INTO emp_customuser_search
+    SELECT e.id,
+           TRIM(COALESCE(u.first_name, '') || ' ' || COALESCE(u.last_name, '')),
+           u.username,
+           CAST(e.phone_number AS TEXT),
+           COALESCE(d.name, ''),
+           COALESCE(e.address, '')
+    FROM emp_customuser e
+    INNER JOIN auth_user u ON u.id = e.user_id
+    LEFT OUTER JOIN emp_department d ON d.id = e.department_id
+"""
+
+
+def create_search_index(apps, schema_editor):
+    # Only SQLite with FTS5 and the trigram tokenizer (3.34+) gets the index;
+    # elsewhere the view keeps icontains
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(CREATE_INDEX)
+    except OperationalError:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM emp_customuser_search")
+        cursor.execute(FILL_INDEX)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS emp_customuser_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emp', '0005_attendancesettings_leaverequest_attendance'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,22 @@
+# Indexes matching the orderings the keyset paginator seeks on
+# (emp.pagination)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emp', '0006_employee_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['-date', 'id'], name='emp_attendance_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['-created_at', 'id'], name='emp_custuser_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Index for the department reports, which filter attendance on its own
+# department column instead of joining the employee
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emp', '0007_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['department', 'date', 'status'], name='emp_attendance_dept_date_idx'),
+        ),
+    ]
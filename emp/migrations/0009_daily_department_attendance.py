@@ -0,0 +1,38 @@
+# Daily per-department attendance rollup behind the attendance dashboard
+# and monthly summary (emp.rollups)
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emp', '0008_attendance_department_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyDepartmentAttendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('present_count', models.PositiveIntegerField(default=0)),
+                ('absent_count', models.PositiveIntegerField(default=0)),
+                ('half_day_count', models.PositiveIntegerField(default=0)),
+                ('leave_count', models.PositiveIntegerField(default=0)),
+                ('holiday_count', models.PositiveIntegerField(default=0)),
+                ('weekend_count', models.PositiveIntegerField(default=0)),
+                ('late_count', models.PositiveIntegerField(default=0)),
+                ('record_count', models.PositiveIntegerField(default=0)),
+                ('hours_count', models.PositiveIntegerField(default=0)),
+                ('total_hours', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_attendance', to='emp.department')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('department', 'date'), name='emp_daily_dept_attendance_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Resume point of batch jobs such as autofill_attendance
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emp', '0009_daily_department_attendance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('position', models.DateField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Stored employee counters on Department (emp.department_counters), filled
+# from the employee rows already in the database
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def fill_counters(apps, schema_editor):
+    Department = apps.get_model('emp', 'Department')
+    CustomUser = apps.get_model('emp', 'CustomUser')
+    using = schema_editor.connection.alias
+    counts = (
+        CustomUser.objects.using(using)
+        .filter(department__isnull=False)
+        .order_by()
+        .values('department_id')
+        .annotate(total=Count('pk'), active=Count('pk', filter=Q(is_active=True)))
+    )
+    for row in counts:
+        Department.objects.using(using).filter(pk=row['department_id']).update(
+            employee_count=row['total'], active_employee_count=row['active']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emp', '0010_job_cursor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='department',
+            name='active_employee_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Active Employees'),
+        ),
+        migrations.AddField(
+            model_name='department',
+            name='employee_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Employees'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
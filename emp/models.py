@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, router, transaction
 import uuid
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -6,6 +6,8 @@ from django.utils.translation import gettext_lazy as _
 from django.utils import timezone 
 import datetime
 
+from .working_calendar import DEFAULT_WEEKDAYS, WorkingCalendar
+
 class Department(models.Model):
     name = models.CharField(
         _("Department Name"),
@@ -51,6 +53,20 @@ class Department(models.Model):
         _("Updated At"),
         auto_now=True
     )
+    
+    # Maintained by emp.department_counters whenever employees are added,
+    # removed, moved or (de)activated
+    employee_count = models.PositiveIntegerField(
+        _("Employees"),
+        default=0,
+        editable=False
+    )
+    
+    active_employee_count = models.PositiveIntegerField(
+        _("Active Employees"),
+        default=0,
+        editable=False
+    )
 
     class Meta:
         verbose_name = _("Department")
@@ -59,17 +75,69 @@ class Department(models.Model):
 
     def __str__(self):
         return f"{self.name} ({self.code})"
-    @property
-    def employee_count(self):
-        return self.employees.count() 
     
-    @property
-    def active_employee_count(self):
-        return self.employees.filter(is_active=True).count()
+    COUNTER_FIELDS = ('employee_count', 'active_employee_count')
+    
+    def save(self, *args, **kwargs):
+        """ Never write the counters back from a possibly stale instance; they only move through emp.department_counters """
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
     
     def get_active_employees(self):
         return self.employees.filter(is_active=True)
     
+class CustomUserQuerySet(models.QuerySet):
+    """
+    bulk_create() and update() send no signals, so they keep the department
+    employee counters and the directory search index in step themselves.
+    """
+    
+    COUNTED_FIELDS = {'department', 'department_id', 'is_active'}
+    INDEXED_FIELDS = {'user', 'user_id', 'phone_number', 'department', 'department_id', 'address'}
+    
+    def bulk_create(self, objs, *args, **kwargs):
+        from . import department_counters
+        from .search import EmployeeSearchIndex
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            deltas = None
+            for obj in objs:
+                deltas = department_counters.change(None, (obj.department_id, bool(obj.is_active)), deltas)
+            department_counters.apply(deltas or {}, using=self.db)
+            EmployeeSearchIndex.index_employees([obj.pk for obj in objs], using=self.db)
+        return objs
+    
+    def update(self, **kwargs):
+        from . import department_counters
+        from .search import EmployeeSearchIndex
+        counted = self.COUNTED_FIELDS & set(kwargs)
+        indexed = self.INDEXED_FIELDS & set(kwargs)
+        if not counted and not indexed:
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            before = {
+                pk: (department_id, is_active)
+                for pk, department_id, is_active
+                in self.order_by().values_list('pk', 'department_id', 'is_active')
+            }
+            updated = super().update(**kwargs)
+            if counted:
+                deltas = None
+                after = CustomUser.objects.using(self.db).filter(pk__in=before).values_list(
+                    'pk', 'department_id', 'is_active'
+                )
+                for pk, department_id, is_active in after:
+                    deltas = department_counters.change(before[pk], (department_id, is_active), deltas)
+                department_counters.apply(deltas or {}, using=self.db)
+            if indexed:
+                EmployeeSearchIndex.index_employees(before, using=self.db)
+        return updated
+
+
 class CustomUser(models.Model):
     id = models.UUIDField(
         primary_key=True,
@@ -145,10 +213,48 @@ class CustomUser(models.Model):
         verbose_name = _("Custom User")
         verbose_name_plural = _("Custom Users")
         ordering = ['-created_at']
+        indexes = [
+            # Seek key for keyset pagination of the employee list
+            models.Index(fields=['-created_at', 'id'], name='emp_custuser_created_id_idx'),
+        ]
+
+    objects = CustomUserQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.user.get_full_name() or self.user.username} - {self.department.name if self.department else 'No Department'}"
     
+    def _stored_counted_state(self, using):
+        """ (department_id, is_active) as currently stored, locked for the rest of the transaction """
+        return CustomUser.objects.using(using).select_for_update().filter(pk=self.pk).values_list(
+            'department_id', 'is_active'
+        ).first()
+    
+    def save(self, *args, **kwargs):
+        """ Save, and move the employee between department counters in the same transaction """
+        from . import department_counters
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        update_fields = kwargs.get('update_fields')
+        with transaction.atomic(using=using):
+            old = None if self._state.adding else self._stored_counted_state(using)
+            super().save(*args, **kwargs)
+            new = (self.department_id, bool(self.is_active))
+            if update_fields is not None and old is not None:
+                # Fields left out of update_fields kept their stored values
+                update_fields = set(update_fields)
+                if not {'department', 'department_id'} & update_fields:
+                    new = (old[0], new[1])
+                if 'is_active' not in update_fields:
+                    new = (new[0], old[1])
+            department_counters.apply(department_counters.change(old, new), using=using)
+    
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            # The post_delete handler uncounts what is stored, not this
+            # possibly stale copy
+            self._counted_state = self._stored_counted_state(using)
+            return super().delete(*args, **kwargs)
+    
     @property
     def full_name(self):
         return self.user.get_full_name()
@@ -177,7 +283,7 @@ class CustomUser(models.Model):
     @property
     def is_department_manager(self):
         """ check if user is a manager """
-        return self.role =='manager' and hasattr(self, 'department') and self.department is not None
+        return self.role =='manager' and self.department_id is not None
     
     def can_edit_employee(self, employee):
         """ Check if the user can edit the given employee """
@@ -185,13 +291,45 @@ class CustomUser(models.Model):
             return True
         if self.is_department_manager:
             return (
-                employee.department == self.department and
-                employee !='admin'
+                employee.department_id == self.department_id and
+                employee.role !='admin'
             )
         return self.id == employee.id
     
     
 
+class AttendanceQuerySet(models.QuerySet):
+    
+    def for_department(self, department):
+        """ Filter on the denormalized department column instead of joining employee """
+        return self.filter(department=department)
+    
+    def between(self, start_date, end_date):
+        return self.filter(date__gte=start_date, date__lte=end_date)
+    
+    def bulk_create(self, objs, *args, **kwargs):
+        from .rollups import schedule_refresh
+        objs = super().bulk_create(objs, *args, **kwargs)
+        schedule_refresh({(obj.department_id, obj.date) for obj in objs}, using=self.db)
+        return objs
+    
+    def update(self, **kwargs):
+        """ queryset.update() that also refreshes the daily department rollups it touches """
+        from .rollups import schedule_refresh
+        before = list(self.order_by().values_list('pk', 'department_id', 'date'))
+        updated = super().update(**kwargs)
+        keys = {(department_id, day) for _, department_id, day in before}
+        if {'department', 'department_id', 'date'} & set(kwargs):
+            # Rows may have moved to another department or day
+            keys |= set(
+                Attendance.objects.using(self.db)
+                .filter(pk__in=[pk for pk, _, _ in before])
+                .values_list('department_id', 'date')
+            )
+        schedule_refresh(keys, using=self.db)
+        return updated
+
+
 class Attendance(models.Model):
     ATTENDANCE_STATUS = (
         ('present', 'Present'),
@@ -213,9 +351,18 @@ class Attendance(models.Model):
     marked_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='marked_attendances')
     marked_at = models.DateTimeField(auto_now_add=True)
     
+    objects = AttendanceQuerySet.as_manager()
+    
     class Meta:
+        # Its unique index also serves (employee, date) lookups
         unique_together = ['employee', 'date']
         ordering = ['-date']
+        indexes = [
+            # Department reports: one department, a date range, by status
+            models.Index(fields=['department', 'date', 'status'], name='emp_attendance_dept_date_idx'),
+            # Seek key for keyset pagination of attendance reports
+            models.Index(fields=['-date', 'id'], name='emp_attendance_date_id_idx'),
+        ]
     
     def save(self, *args, **kwargs):
 
@@ -223,14 +370,55 @@ class Attendance(models.Model):
             self.department = self.employee.department
         
         if self.check_in and self.check_out:
-            check_in_dt = datetime.combine(self.date, self.check_in)
-            check_out_dt = datetime.combine(self.date, self.check_out)
+            check_in_dt = datetime.datetime.combine(self.date, self.check_in)
+            check_out_dt = datetime.datetime.combine(self.date, self.check_out)
             diff = check_out_dt - check_in_dt
             self.total_hours = round(diff.total_seconds() / 3600, 2)
         
         super().save(*args, **kwargs)
 
 
+class DailyDepartmentAttendance(models.Model):
+    """ Attendance of one department on one day, maintained by emp.rollups """
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, related_name='daily_attendance')
+    date = models.DateField()
+    present_count = models.PositiveIntegerField(default=0)
+    absent_count = models.PositiveIntegerField(default=0)
+    half_day_count = models.PositiveIntegerField(default=0)
+    leave_count = models.PositiveIntegerField(default=0)
+    holiday_count = models.PositiveIntegerField(default=0)
+    weekend_count = models.PositiveIntegerField(default=0)
+    late_count = models.PositiveIntegerField(default=0)
+    record_count = models.PositiveIntegerField(default=0)
+    # rows with hours recorded, the divisor of average_hours
+    hours_count = models.PositiveIntegerField(default=0)
+    total_hours = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['department', 'date'], name='emp_daily_dept_attendance_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.department_id} - {self.date}"
+    
+    @property
+    def average_hours(self):
+        return round(self.total_hours / self.hours_count, 2) if self.hours_count else 0
+
+
+class JobCursor(models.Model):
+    """ Last date a resumable batch job (e.g. autofill_attendance) finished """
+    name = models.CharField(max_length=100, unique=True)
+    position = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+
 class LeaveRequest(models.Model):
     LEAVE_TYPES = (
         ('sick', 'Sick Leave'),
@@ -262,7 +450,9 @@ class LeaveRequest(models.Model):
     
     def save(self, *args, **kwargs):
         if self.start_date and self.end_date:
-            self.total_days = (self.end_date - self.start_date).days + 1
+            # Working days only, per the employee's department calendar
+            calendar = WorkingCalendar.for_department(self.employee.department_id)
+            self.total_days = calendar.working_days_between(self.start_date, self.end_date)
         super().save(*args, **kwargs)
 
     
@@ -281,4 +471,40 @@ class AttendanceSettings(models.Model):
     
     def __str__(self):
         return f"Attendance Settings - {self.department.name}"
+
+    DEFAULT_WEEKDAYS = DEFAULT_WEEKDAYS
+
+    @classmethod
+    def parse_weekdays(cls, weekdays):
+        """ ISO weekday numbers (1 = Monday) from the comma separated field """
+        days = set()
+        for part in (weekdays or '').split(','):
+            part = part.strip()
+            if part.isdigit() and 1 <= int(part) <= 7:
+                days.add(int(part))
+        return frozenset(days) if days else cls.DEFAULT_WEEKDAYS
+
+    @staticmethod
+    def parse_holidays(holidays):
+        """ Holiday dates from the JSON list of 'YYYY-MM-DD' strings, skipping bad entries """
+        dates = set()
+        for value in holidays or []:
+            try:
+                dates.add(datetime.date.fromisoformat(str(value).strip()))
+            except ValueError:
+                continue
+        return frozenset(dates)
+
+    @property
+    def working_weekdays(self):
+        return self.parse_weekdays(self.weekdays)
+
+    @property
+    def holiday_dates(self):
+        return self.parse_holidays(self.holidays)
+
+    @property
+    def calendar(self):
+        """ The compiled (cached) WorkingCalendar of this department """
+        return WorkingCalendar.for_department(self.department_id)
     
\ No newline at end of file
@@ -0,0 +1,193 @@
+from datetime import datetime
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+
+
+DEFAULT_PAGINATION_SETTINGS = {
+    # 'offset' keeps Django's numbered pages, 'cursor' seeks on the ordering
+    # key so deep pages cost the same as the first one
+    'MODE': 'offset',
+    # how cursor pages report a total: 'exact' (COUNT(*)), 'estimate'
+    # (count at most COUNT_CAP rows) or 'none'
+    'COUNT': 'estimate',
+    'COUNT_CAP': 1000,
+}
+
+
+def get_pagination_settings():
+    config = dict(DEFAULT_PAGINATION_SETTINGS)
+    config.update(getattr(settings, 'EMP_PAGINATION', {}) or {})
+    return config
+
+
+def use_cursor_pagination(request):
+    """Cursor mode when configured, or when the request already carries a cursor"""
+    return get_pagination_settings()['MODE'] == 'cursor' or 'cursor' in request.GET
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage:
+    """One page of a KeysetPaginator; iterates like a Django Page"""
+
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next or not self.object_list:
+            return None
+        return self.paginator.encode(self.object_list[-1], 'next')
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous or not self.object_list:
+            return None
+        return self.paginator.encode(self.object_list[0], 'prev')
+
+
+class KeysetPaginator:
+    """
+    Keyset (seek) pagination over a queryset ordered by `ordering`, which
+    must end in a unique column, e.g. ('-created_at', 'id'). A page is
+    fetched with WHERE (key) past the cursor row ... LIMIT per_page + 1,
+    so its cost does not grow with how far the user has paged.
+
+    Cursors are signed, opaque tokens holding the key values of the first
+    or last row of the page they came from.
+    """
+
+    def __init__(self, queryset, per_page, ordering, count=None, count_cap=None, total=None):
+        config = get_pagination_settings()
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.keys = [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+        self.fields = [queryset.model._meta.get_field(name) for name, _ in self.keys]
+        self.count_mode = count or config['COUNT']
+        self.count_cap = int(count_cap or config['COUNT_CAP'])
+        self.salt = f'emp.pagination:{queryset.model._meta.label_lower}:{",".join(self.ordering)}'
+        self._count = None
+        if total is not None:
+            # Already known to the caller, e.g. from a summary query
+            self._count = total
+            self.count_mode = 'exact'
+
+    # -- cursors -----------------------------------------------------------
+
+    def encode(self, obj, direction):
+        values = []
+        for field in self.fields:
+            value = getattr(obj, field.attname)
+            # isoformat keeps the microseconds that DjangoJSONEncoder drops
+            values.append(value.isoformat() if isinstance(value, datetime) else str(value))
+        return signing.dumps([direction, values], salt=self.salt, compress=True)
+
+    def decode(self, cursor):
+        try:
+            direction, values = signing.loads(cursor, salt=self.salt)
+            if direction not in ('next', 'prev') or len(values) != len(self.fields):
+                raise InvalidCursor(cursor)
+            return direction, [field.to_python(value) for field, value in zip(self.fields, values)]
+        except (signing.BadSignature, ValueError, TypeError) as e:
+            raise InvalidCursor(cursor) from e
+
+    def _seek(self, values, backwards):
+        """Rows strictly after the key values in the (possibly reversed) ordering"""
+        condition = Q()
+        for i, (name, descending) in enumerate(self.keys):
+            lookup = 'lt' if descending != backwards else 'gt'
+            term = Q(**{f'{name}__{lookup}': values[i]})
+            for (prior, _), value in zip(self.keys[:i], values):
+                term &= Q(**{prior: value})
+            condition |= term
+        return condition
+
+    # -- pages -------------------------------------------------------------
+
+    def page(self, cursor=None):
+        direction, values = ('next', None)
+        if cursor:
+            direction, values = self.decode(cursor)
+        backwards = direction == 'prev'
+
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, backwards))
+        if backwards:
+            # Walk towards the start of the list, then flip the rows back
+            queryset = queryset.order_by(*[
+                name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering
+            ])
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if backwards:
+            rows.reverse()
+            return CursorPage(rows, self, has_next=True, has_previous=has_more)
+        return CursorPage(rows, self, has_next=has_more, has_previous=values is not None)
+
+    def get_page(self, cursor=None):
+        """Like page(), but a bad or tampered cursor falls back to the first page"""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+    # -- totals ------------------------------------------------------------
+
+    @property
+    def count(self):
+        """Total rows; capped at count_cap in 'estimate' mode, None in 'none' mode"""
+        if self._count is None and self.count_mode != 'none':
+            rows = self.queryset.order_by()
+            if self.count_mode == 'estimate':
+                # COUNT over a LIMITed subquery stops after count_cap + 1 rows
+                self._count = min(rows[:self.count_cap + 1].count(), self.count_cap + 1)
+            else:
+                self._count = rows.count()
+        return self._count
+
+    @property
+    def count_is_estimate(self):
+        return self.count_mode == 'estimate' and (self.count or 0) > self.count_cap
+
+    @property
+    def display_count(self):
+        """Total for templates: '1000+' once the estimate hits the cap"""
+        if self.count is None:
+            return ''
+        if self.count_is_estimate:
+            return f'{self.count_cap}+'
+        return str(self.count)
@@ -0,0 +1,98 @@
+import datetime
+
+from django.db.models import Count, F, IntegerField, Max, Q, Subquery, TimeField, Value
+from django.db.models.functions import Coalesce
+
+from .models import Attendance, AttendanceSettings, CustomUser
+from .working_calendar import WorkingCalendar
+
+
+class AttendanceSummary:
+    """
+    Summary cards of the attendance report, computed in one query with
+    conditional aggregation over the report's filtered attendance rows.
+
+    Late arrivals are counted in the same query by comparing check_in with
+    the late_threshold of the row's department settings (the model default
+    when the department has none).
+    """
+
+    STATUSES = [status for status, _ in Attendance.ATTENDANCE_STATUS]
+
+    # Statuses that have a meaningful check-in time
+    CHECK_IN_STATUSES = ('present', 'half_day')
+
+    @staticmethod
+    def default_late_threshold():
+        default = AttendanceSettings._meta.get_field('late_threshold').get_default()
+        if isinstance(default, str):
+            default = datetime.time.fromisoformat(default)
+        return default
+
+    @classmethod
+    def late_threshold(cls):
+        return Coalesce(
+            F('department__attendancesettings__late_threshold'),
+            Value(cls.default_late_threshold()),
+            output_field=TimeField(),
+        )
+
+    @classmethod
+    def late_filter(cls):
+        return Q(
+            status__in=cls.CHECK_IN_STATUSES,
+            check_in__isnull=False,
+            check_in__gt=cls.late_threshold(),
+        )
+
+    @classmethod
+    def _aggregates(cls):
+        aggregates = {
+            f'{status}_count': Count('id', filter=Q(status=status)) for status in cls.STATUSES
+        }
+        aggregates['late_count'] = Count('id', filter=cls.late_filter())
+        aggregates['total_records'] = Count('id')
+        return aggregates
+
+    @staticmethod
+    def _employee_count(department, **filters):
+        employees = (
+            CustomUser.objects.filter(department=department, **filters)
+            .order_by()
+            .values('department')
+            .annotate(total=Count('id'))
+            .values('total')
+        )
+        # Rides along as a scalar subquery
+        return Coalesce(Max(Subquery(employees, output_field=IntegerField())), 0)
+
+    @classmethod
+    def for_queryset(cls, attendances, department, start_date, end_date):
+        """Status, late and employee counts plus percentages for the report"""
+        summary = attendances.order_by().aggregate(
+            **cls._aggregates(),
+            total_employees=cls._employee_count(department),
+            active_employees=cls._employee_count(department, is_active=True),
+        )
+        if summary['total_records'] == 0:
+            # No attendance rows means the aggregate saw no subquery values either
+            counts = CustomUser.objects.filter(department=department).aggregate(
+                total=Count('id'), active=Count('id', filter=Q(is_active=True))
+            )
+            summary['total_employees'] = counts['total']
+            summary['active_employees'] = counts['active']
+
+        summary['inactive_employees'] = summary['total_employees'] - summary['active_employees']
+
+        # Employees are only expected in on the department's working days
+        total_days_in_range = WorkingCalendar.for_department(department.pk).working_days_between(
+            start_date, end_date
+        )
+        active_employees = summary['active_employees']
+        total_employee_days = total_days_in_range * active_employees if active_employees > 0 else 1
+        for name in ('present', 'absent', 'late'):
+            summary[f'{name}_percentage'] = (
+                round((summary[f'{name}_count'] / total_employee_days) * 100, 2)
+                if total_employee_days > 0 else 0
+            )
+        return summary
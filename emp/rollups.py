@@ -0,0 +1,161 @@
+import threading
+from collections import defaultdict
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, Q, Sum
+
+from .models import Attendance, AttendanceSettings, DailyDepartmentAttendance
+from .reports import AttendanceSummary
+
+
+COUNT_FIELDS = [f'{status}_count' for status in AttendanceSummary.STATUSES]
+ROLLUP_FIELDS = COUNT_FIELDS + ['late_count', 'record_count', 'hours_count', 'total_hours']
+
+# (department_id, date) keys waiting for the current transaction to commit
+_pending = threading.local()
+
+
+def _aggregates():
+    aggregates = {
+        f'{status}_count': Count('id', filter=Q(status=status))
+        for status in AttendanceSummary.STATUSES
+    }
+    aggregates['late_count'] = Count('id', filter=AttendanceSummary.late_filter())
+    aggregates['record_count'] = Count('id')
+    aggregates['hours_count'] = Count('id', filter=Q(total_hours__gt=0))
+    aggregates['total_hours'] = Sum('total_hours')
+    return aggregates
+
+
+def _rollup_rows(attendances):
+    """DailyDepartmentAttendance instances for every (department, date) in a queryset"""
+    grouped = (
+        attendances.filter(department__isnull=False)
+        .order_by()
+        .values('department_id', 'date')
+        .annotate(**_aggregates())
+    )
+    rows = {}
+    for row in grouped:
+        values = {name: row[name] for name in ROLLUP_FIELDS}
+        values['total_hours'] = values['total_hours'] or 0
+        rows[(row['department_id'], row['date'])] = DailyDepartmentAttendance(
+            department_id=row['department_id'], date=row['date'], **values
+        )
+    return rows
+
+
+def _save(rows, using):
+    DailyDepartmentAttendance.objects.using(using).bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['department', 'date'],
+        update_fields=ROLLUP_FIELDS + ['updated_at'],
+    )
+
+
+def refresh_days(keys, using=DEFAULT_DB_ALIAS):
+    """
+    Recompute the rollup of each (department_id, date) in keys from the
+    attendance rows: one grouped query, one upsert, and a delete for days
+    that no longer have any rows.
+    """
+    keys = {(department_id, day) for department_id, day in keys if department_id is not None}
+    if not keys:
+        return 0
+    attendances = Attendance.objects.using(using).filter(
+        department_id__in={department_id for department_id, _ in keys},
+        date__in={day for _, day in keys},
+    )
+    rows = {key: row for key, row in _rollup_rows(attendances).items() if key in keys}
+
+    emptied = defaultdict(set)
+    for department_id, day in keys - rows.keys():
+        emptied[day].add(department_id)
+
+    with transaction.atomic(using=using):
+        _save(list(rows.values()), using)
+        for day, department_ids in emptied.items():
+            DailyDepartmentAttendance.objects.using(using).filter(
+                date=day, department_id__in=department_ids
+            )._raw_delete(using)
+    return len(rows)
+
+
+def _flush_pending(using):
+    keys = _pending.keys.pop(using, set())
+    if keys:
+        refresh_days(keys, using=using)
+
+
+def schedule_refresh(keys, using=DEFAULT_DB_ALIAS):
+    """
+    Refresh the rollups for these keys once the current transaction commits
+    (immediately in autocommit). Keys scheduled within one transaction are
+    refreshed together.
+    """
+    keys = {key for key in keys if key[0] is not None}
+    if not keys:
+        return
+    if not hasattr(_pending, 'keys'):
+        _pending.keys = {}
+    _pending.keys.setdefault(using, set()).update(keys)
+    transaction.on_commit(lambda: _flush_pending(using), using=using)
+
+
+def _late_threshold(value):
+    """The threshold the late counts use; None stands for no settings row"""
+    if value is None:
+        return AttendanceSummary.default_late_threshold()
+    return AttendanceSettings._meta.get_field('late_threshold').to_python(value)
+
+
+def late_threshold_changed(old, new):
+    """True when a settings change moves the late threshold of the rollups"""
+    return _late_threshold(old) != _late_threshold(new)
+
+
+def schedule_rebuild(department_id, using=DEFAULT_DB_ALIAS):
+    """Rebuild one department's rollups once the current transaction commits"""
+    if department_id is None:
+        return
+    transaction.on_commit(
+        lambda: rebuild(department_ids=[department_id], using=using), using=using
+    )
+
+
+def rebuild(start_date=None, end_date=None, department_ids=None, using=DEFAULT_DB_ALIAS):
+    """Recompute the rollups of a date range (default everything) from scratch"""
+    attendances = Attendance.objects.using(using).all()
+    existing = DailyDepartmentAttendance.objects.using(using).all()
+    if start_date is not None:
+        attendances = attendances.filter(date__gte=start_date)
+        existing = existing.filter(date__gte=start_date)
+    if end_date is not None:
+        attendances = attendances.filter(date__lte=end_date)
+        existing = existing.filter(date__lte=end_date)
+    if department_ids is not None:
+        attendances = attendances.filter(department_id__in=department_ids)
+        existing = existing.filter(department_id__in=department_ids)
+
+    rows = list(_rollup_rows(attendances).values())
+    with transaction.atomic(using=using):
+        # _raw_delete: utils.signals' catch-all post_delete receiver would
+        # otherwise make delete() load and signal every rollup row
+        existing._raw_delete(using)
+        DailyDepartmentAttendance.objects.using(using).bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def day_summary(department, day):
+    """The rollup of one department and day; an empty one if nothing was recorded"""
+    row = DailyDepartmentAttendance.objects.filter(department=department, date=day).first()
+    return row or DailyDepartmentAttendance(department=department, date=day)
+
+
+def month_summary(department, year, month):
+    """Rollup counters summed over one month"""
+    totals = DailyDepartmentAttendance.objects.filter(
+        department=department, date__year=year, date__month=month
+    ).aggregate(**{name: Sum(name) for name in ROLLUP_FIELDS})
+    return {name: value or 0 for name, value in totals.items()}
@@ -0,0 +1,267 @@
+import datetime
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from utils.models import ActivityLog, AuditLog, LoginLog, SystemLog
+from utils.rollups import rebuild_rollups
+
+from .models import Attendance, AttendanceSettings, CustomUser, Department, LeaveRequest
+from .working_calendar import WorkingCalendar
+
+
+# Share of working days per status; weekends and holidays are marked as such
+WORKDAY_STATUSES = (('present', 80), ('absent', 7), ('half_day', 5), ('leave', 8))
+
+SAMPLE_PASSWORD = 'sample-password'
+
+
+class SampleDataGenerator:
+    """
+    Synthetic but realistic data for benchmarks and local development:
+    departments with settings and a manager each, employees spread over
+    them, a daily attendance row per employee for the last `days` days,
+    leave requests, and activity/audit/login/system logs spread over the
+    same period (with their rollups rebuilt).
+
+    Everything goes in with bulk_create in batches of batch_size. Generated
+    usernames start with `prefix`, so several datasets can coexist; all
+    users get the password SAMPLE_PASSWORD.
+    """
+
+    def __init__(self, departments=10, employees=500, days=30, logs_per_day=200,
+                 prefix='sample', seed=None, batch_size=2000, stdout=None):
+        self.department_count = departments
+        self.employee_count = employees
+        self.days = days
+        self.logs_per_day = logs_per_day
+        self.prefix = prefix
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.stdout = stdout
+        self.end_date = timezone.localdate() - datetime.timedelta(days=1)
+        self.start_date = self.end_date - datetime.timedelta(days=max(days, 1) - 1)
+
+    def log(self, message):
+        if self.stdout is not None:
+            self.stdout.write(message)
+
+    def run(self):
+        with transaction.atomic():
+            departments = self.create_departments()
+            employees = self.create_employees(departments)
+        self.log(f"{len(departments)} departments, {len(employees)} employees")
+        attendance = self.create_attendance(departments, employees)
+        self.log(f"{attendance} attendance rows")
+        leaves = self.create_leave_requests(employees)
+        self.log(f"{leaves} leave requests")
+        logs = self.create_logs(employees)
+        self.log(f"{logs} log rows")
+        return {
+            'departments': [department.pk for department in departments],
+            'employees': len(employees),
+            'attendance': attendance,
+            'leave_requests': leaves,
+            'logs': logs,
+        }
+
+    # -- people ------------------------------------------------------------
+
+    def create_departments(self):
+        existing = Department.objects.filter(code__startswith=self.prefix[:4].upper()).count()
+        departments = Department.objects.bulk_create([
+            Department(
+                name=f"{self.prefix.title()} department {existing + number}",
+                code=f"{self.prefix[:4].upper()}{existing + number}"[:10],
+                description="Generated sample data",
+            )
+            for number in range(1, self.department_count + 1)
+        ])
+        if not departments[0].pk:
+            departments = list(Department.objects.filter(code__in=[d.code for d in departments]))
+        AttendanceSettings.objects.bulk_create([
+            AttendanceSettings(department=department, holidays=self.sample_holidays())
+            for department in departments
+        ])
+        return departments
+
+    def sample_holidays(self):
+        days = (self.end_date - self.start_date).days + 1
+        picks = self.random.sample(range(days), k=min(days // 30 + 1, days))
+        return sorted((self.start_date + datetime.timedelta(days=pick)).isoformat() for pick in picks)
+
+    def create_employees(self, departments):
+        password = make_password(SAMPLE_PASSWORD)
+        first_phone = (CustomUser.objects.aggregate(top=Max('phone_number'))['top'] or 8999999999) + 1
+        first_phone = max(first_phone, 9000000000)
+        taken = User.objects.filter(username__startswith=self.prefix).count()
+
+        users = []
+        for number in range(taken, taken + self.employee_count):
+            users.append(User(
+                username=f"{self.prefix}{number:06d}",
+                email=f"{self.prefix}{number:06d}@example.com",
+                first_name=self.random.choice(FIRST_NAMES),
+                last_name=self.random.choice(LAST_NAMES),
+                password=password,
+            ))
+        users = User.objects.bulk_create(users, batch_size=self.batch_size)
+        if users and users[0].pk is None:
+            ids = dict(User.objects.filter(
+                username__in=[user.username for user in users]
+            ).values_list('username', 'id'))
+            for user in users:
+                user.pk = ids[user.username]
+
+        employees = []
+        for index, user in enumerate(users):
+            # The first employee of each department manages it
+            manager = index < len(departments)
+            employees.append(CustomUser(
+                user=user,
+                phone_number=first_phone + index,
+                address=f"{self.random.randint(1, 999)} Sample Street",
+                department=departments[index % len(departments)],
+                role='manager' if manager else 'employee',
+                is_active=manager or self.random.random() > 0.05,
+            ))
+        employees = CustomUser.objects.bulk_create(employees, batch_size=self.batch_size)
+
+        for department, manager in zip(departments, employees):
+            department.manager = manager
+        Department.objects.bulk_update(departments, ['manager'])
+        return employees
+
+    # -- attendance --------------------------------------------------------
+
+    def attendance_row(self, employee, day, calendar, marked_by):
+        if not calendar.is_working_day(day):
+            status = 'holiday' if day in calendar.holiday_set else 'weekend'
+        else:
+            status = self.random.choices(
+                [status for status, _ in WORKDAY_STATUSES],
+                weights=[weight for _, weight in WORKDAY_STATUSES],
+            )[0]
+        row = Attendance(
+            employee_id=employee.pk, department_id=employee.department_id, date=day,
+            status=status, marked_by_id=marked_by,
+        )
+        if status in ('present', 'half_day'):
+            # Mostly on time, some after the default 10:00 late threshold
+            check_in = datetime.time(self.random.choice((8, 9, 9, 9, 10)), self.random.randint(0, 59))
+            hours = 8 if status == 'present' else 4
+            check_out = datetime.time(min(check_in.hour + hours, 23), self.random.randint(0, 59))
+            row.check_in, row.check_out = check_in, check_out
+            worked = (
+                datetime.datetime.combine(day, check_out) - datetime.datetime.combine(day, check_in)
+            ).total_seconds() / 3600
+            row.total_hours = Decimal(str(round(worked, 2)))
+        return row
+
+    def create_attendance(self, departments, employees):
+        calendars = WorkingCalendar.for_departments([department.pk for department in departments])
+        managers = {department.pk: department.manager.user_id for department in departments}
+        created = 0
+        day = self.start_date
+        while day <= self.end_date:
+            rows = [
+                self.attendance_row(
+                    employee, day, calendars[employee.department_id], managers[employee.department_id]
+                )
+                for employee in employees
+            ]
+            for start in range(0, len(rows), self.batch_size):
+                with transaction.atomic():
+                    Attendance.objects.bulk_create(rows[start:start + self.batch_size])
+            created += len(rows)
+            day += datetime.timedelta(days=1)
+        return created
+
+    def create_leave_requests(self, employees):
+        leaves = []
+        for employee in self.random.sample(employees, k=len(employees) // 5):
+            start = self.start_date + datetime.timedelta(days=self.random.randint(0, max(self.days - 3, 0)))
+            end = start + datetime.timedelta(days=self.random.randint(0, 2))
+            status = self.random.choice(('pending', 'approved', 'rejected'))
+            leaves.append(LeaveRequest(
+                employee=employee,
+                leave_type=self.random.choice([value for value, _ in LeaveRequest.LEAVE_TYPES]),
+                start_date=start,
+                end_date=end,
+                total_days=(end - start).days + 1,
+                reason="Generated sample leave",
+                status=status,
+            ))
+        LeaveRequest.objects.bulk_create(leaves, batch_size=self.batch_size)
+        return len(leaves)
+
+    # -- logs --------------------------------------------------------------
+
+    def _spread(self, model, rows_by_day):
+        """bulk_create stamps created_at with now; move each day's rows back"""
+        for day, rows in rows_by_day.items():
+            model.objects.bulk_create(rows, batch_size=self.batch_size)
+            moment = timezone.make_aware(datetime.datetime.combine(day, datetime.time(12)))
+            model.objects.filter(pk__in=[row.pk for row in rows]).update(created_at=moment)
+
+    def create_logs(self, employees):
+        user_ids = [employee.user_id for employee in employees]
+        log_types = [value for value, _ in ActivityLog.LOG_TYPES]
+        modules = [value for value, _ in ActivityLog.MODULES]
+        levels = [value for value, _ in SystemLog.LOG_LEVELS]
+        activity, audit, logins, system = {}, {}, {}, {}
+        day = self.start_date
+        while day <= self.end_date:
+            activity[day] = [
+                ActivityLog(
+                    user_id=self.random.choice(user_ids),
+                    log_type=self.random.choice(log_types),
+                    module=self.random.choice(modules),
+                    action=f"GET /sample/{number}/ - 200",
+                    status=self.random.choice(('success', 'success', 'success', 'failed', 'warning')),
+                    additional_data={'response_time': round(self.random.random(), 3)},
+                )
+                for number in range(self.logs_per_day)
+            ]
+            audit[day] = [
+                AuditLog(
+                    user_id=self.random.choice(user_ids), action='UPDATE', model_name='Attendance',
+                    object_id=str(number), object_repr=f"Attendance object ({number})",
+                    changes={'status': {'old': 'absent', 'new': 'present'}},
+                )
+                for number in range(self.logs_per_day // 10)
+            ]
+            logins[day] = [
+                LoginLog(
+                    username=f"{self.prefix}{number:06d}", user_id=self.random.choice(user_ids),
+                    status=self.random.choice(('success', 'success', 'success', 'failed')),
+                )
+                for number in range(self.logs_per_day // 5)
+            ]
+            system[day] = [
+                SystemLog(level=self.random.choice(levels), source='sample', message="Generated sample event")
+                for _ in range(self.logs_per_day // 20)
+            ]
+            day += datetime.timedelta(days=1)
+
+        total = 0
+        for model, rows_by_day in ((ActivityLog, activity), (AuditLog, audit), (LoginLog, logins), (SystemLog, system)):
+            self._spread(model, rows_by_day)
+            total += sum(len(rows) for rows in rows_by_day.values())
+        rebuild_rollups(self.start_date, self.end_date)
+        return total
+
+
+FIRST_NAMES = (
+    'Aarav', 'Anisha', 'Bikash', 'Deepa', 'Gita', 'Hari', 'Kiran', 'Manish', 'Nisha',
+    'Prakash', 'Rita', 'Sagar', 'Sita', 'Suman', 'Sunita', 'Ram',
+)
+LAST_NAMES = (
+    'Adhikari', 'Basnet', 'Gurung', 'Karki', 'Khatiwada', 'Lama', 'Magar', 'Poudel',
+    'Rai', 'Shrestha', 'Tamang', 'Thapa',
+)
@@ -0,0 +1,174 @@
+import uuid
+
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+
+class EmployeeSearchIndex:
+    """
+    SQLite FTS5 index over the employee directory (name, username, phone,
+    department and address), kept in sync by emp.signals.
+
+    The trigram tokenizer gives substring matches like the icontains
+    filters it replaces, but served from the index and ranked with bm25.
+    On other databases, or an SQLite build without FTS5/trigram, the
+    table does not exist and callers fall back to icontains.
+    """
+
+    TABLE = 'emp_customuser_search'
+
+    # bm25 weights for employee_id, name, username, phone, department, address
+    WEIGHTS = (0.0, 10.0, 8.0, 5.0, 3.0, 1.0)
+
+    # Trigram matching needs at least three characters per term
+    MIN_TERM_LENGTH = 3
+
+    # Ranked matches handed back to the view, counted after scoping
+    RESULT_LIMIT = 500
+
+    _available = {}
+
+    SELECT_ROWS = """
+        SELECT e.id,
+               TRIM(COALESCE(u.first_name, '') || ' ' || COALESCE(u.last_name, '')),
+               u.username,
+               CAST(e.phone_number AS TEXT),
+               COALESCE(d.name, ''),
+               COALESCE(e.address, '')
+        FROM emp_customuser e
+        INNER JOIN auth_user u ON u.id = e.user_id
+        LEFT OUTER JOIN emp_department d ON d.id = e.department_id
+    """
+
+    @classmethod
+    def create_table_sql(cls):
+        return (
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {cls.TABLE} USING fts5("
+            "employee_id UNINDEXED, name, username, phone, department, address, "
+            "tokenize='trigram')"
+        )
+
+    @classmethod
+    def is_available(cls, using=DEFAULT_DB_ALIAS):
+        """True when the index table exists on this database"""
+        if using not in cls._available:
+            connection = connections[using]
+            cls._available[using] = (
+                connection.vendor == 'sqlite'
+                and cls.TABLE in connection.introspection.table_names()
+            )
+        return cls._available[using]
+
+    @classmethod
+    def create(cls, using=DEFAULT_DB_ALIAS):
+        """Create and fill the index; returns False if this database can't host it"""
+        connection = connections[using]
+        if connection.vendor != 'sqlite':
+            return False
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(cls.create_table_sql())
+        except OperationalError:
+            # SQLite built without FTS5 or the trigram tokenizer (< 3.34)
+            return False
+        cls._available.pop(using, None)
+        cls.rebuild(using)
+        return True
+
+    @classmethod
+    def drop(cls, using=DEFAULT_DB_ALIAS):
+        with connections[using].cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {cls.TABLE}")
+        cls._available.pop(using, None)
+
+    @classmethod
+    def rebuild(cls, using=DEFAULT_DB_ALIAS):
+        """Re-index every employee with one INSERT ... SELECT"""
+        with connections[using].cursor() as cursor:
+            cursor.execute(f"DELETE FROM {cls.TABLE}")
+            cursor.execute(f"INSERT INTO {cls.TABLE} {cls.SELECT_ROWS}")
+
+    @classmethod
+    def _reindex_where(cls, where, params, using):
+        if not cls.is_available(using):
+            return
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {cls.TABLE} WHERE employee_id IN "
+                f"(SELECT e.id FROM emp_customuser e WHERE {where})",
+                params,
+            )
+            cursor.execute(f"INSERT INTO {cls.TABLE} {cls.SELECT_ROWS} WHERE {where}", params)
+
+    @classmethod
+    def index_employee(cls, employee_id, using=DEFAULT_DB_ALIAS):
+        cls._reindex_where('e.id = %s', [cls._key(employee_id)], using)
+
+    @classmethod
+    def index_employees(cls, employee_ids, using=DEFAULT_DB_ALIAS, batch_size=500):
+        employee_ids = [cls._key(employee_id) for employee_id in employee_ids]
+        for start in range(0, len(employee_ids), batch_size):
+            batch = employee_ids[start:start + batch_size]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cls._reindex_where(f'e.id IN ({placeholders})', batch, using)
+
+    @classmethod
+    def index_user(cls, user_id, using=DEFAULT_DB_ALIAS):
+        cls._reindex_where('e.user_id = %s', [user_id], using)
+
+    @classmethod
+    def index_department(cls, department_id, using=DEFAULT_DB_ALIAS):
+        cls._reindex_where('e.department_id = %s', [department_id], using)
+
+    @classmethod
+    def remove_employee(cls, employee_id, using=DEFAULT_DB_ALIAS):
+        if not cls.is_available(using):
+            return
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {cls.TABLE} WHERE employee_id = %s", [cls._key(employee_id)]
+            )
+
+    @staticmethod
+    def _key(employee_id):
+        # UUID primary keys are stored as 32 hex characters on SQLite
+        if not isinstance(employee_id, uuid.UUID):
+            employee_id = uuid.UUID(str(employee_id))
+        return employee_id.hex
+
+    @classmethod
+    def build_match(cls, query):
+        """FTS5 MATCH expression for a search box string, or None when it has
+        a term too short for the trigram index"""
+        terms = query.split()
+        if not terms or any(len(term) < cls.MIN_TERM_LENGTH for term in terms):
+            return None
+        # Quote every term so FTS5 operators in user input are taken literally
+        return ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+
+    @classmethod
+    def can_search(cls, query, using=DEFAULT_DB_ALIAS):
+        return cls.build_match(query) is not None and cls.is_available(using)
+
+    @classmethod
+    def search(cls, query, limit=None, scope=None, using=DEFAULT_DB_ALIAS):
+        """
+        Employee ids matching every term, best match first. scope, a
+        CustomUser queryset, restricts the matches to its rows inside the
+        index query so the limit applies to what the caller can see.
+        """
+        match = cls.build_match(query)
+        if match is None or not cls.is_available(using):
+            return []
+        weights = ', '.join(str(weight) for weight in cls.WEIGHTS)
+        where, params = f"{cls.TABLE} MATCH %s", [match]
+        if scope is not None:
+            scope_sql, scope_params = scope.order_by().values('pk').query.sql_with_params()
+            where += f" AND employee_id IN ({scope_sql})"
+            params.extend(scope_params)
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f"SELECT employee_id FROM {cls.TABLE} WHERE {where} "
+                f"ORDER BY bm25({cls.TABLE}, {weights}) LIMIT %s",
+                [*params, limit or cls.RESULT_LIMIT],
+            )
+            return [uuid.UUID(row[0]) for row in cursor.fetchall()]
@@ -0,0 +1,156 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from . import department_counters, rollups
+from .access import EmployeeAccess
+from .models import Attendance, AttendanceSettings, CustomUser, Department
+from .search import EmployeeSearchIndex
+from .statistics import EmployeeStatistics
+from .working_calendar import WorkingCalendar
+
+
+# Keep the employee directory search index in step with its sources
+@receiver(post_save, sender=CustomUser)
+def index_employee_on_save(sender, instance, using, **kwargs):
+    EmployeeSearchIndex.index_employee(instance.pk, using=using)
+
+@receiver(post_delete, sender=CustomUser)
+def remove_employee_from_index(sender, instance, using, **kwargs):
+    EmployeeSearchIndex.remove_employee(instance.pk, using=using)
+
+@receiver(post_save, sender=User)
+def index_user_on_save(sender, instance, created, using, **kwargs):
+    # A brand new User has no employee profile yet
+    if not created:
+        EmployeeSearchIndex.index_user(instance.pk, using=using)
+
+@receiver(post_save, sender=Department)
+def index_department_on_save(sender, instance, created, using, **kwargs):
+    if not created:
+        EmployeeSearchIndex.index_department(instance.pk, using=using)
+
+@receiver(pre_delete, sender=Department)
+def remember_department_employees(sender, instance, **kwargs):
+    # Their department_id is nulled without signals, so note who to re-index
+    instance._indexed_employee_ids = list(instance.employees.values_list('pk', flat=True))
+
+@receiver(post_delete, sender=Department)
+def reindex_department_employees(sender, instance, using, **kwargs):
+    for employee_id in getattr(instance, '_indexed_employee_ids', []):
+        EmployeeSearchIndex.index_employee(employee_id, using=using)
+
+
+# Deleted employees leave their department's counters; runs inside the
+# delete's transaction, for cascades from User deletes too
+@receiver(post_delete, sender=CustomUser)
+def uncount_deleted_employee(sender, instance, using, **kwargs):
+    state = getattr(instance, '_counted_state', None) or (instance.department_id, bool(instance.is_active))
+    department_counters.apply(department_counters.change(state, None), using=using)
+
+
+# Cached home page statistics are stale once employees or departments change
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+def invalidate_employee_statistics(sender, **kwargs):
+    EmployeeStatistics.invalidate()
+
+
+# Session-cached permissions depend on these fields only; other saves, like
+# the last_login update of every login, leave them alone
+ACCESS_FIELDS = {
+    CustomUser: ('role', 'department_id', 'is_active'),
+    User: ('is_superuser',),
+}
+
+# Stands in for a field that was deferred when the row was loaded
+_NOT_LOADED = object()
+
+def _access_state(sender, instance):
+    # Read from __dict__ so deferred fields are not fetched
+    return tuple(instance.__dict__.get(name, _NOT_LOADED) for name in ACCESS_FIELDS[sender])
+
+@receiver(post_init, sender=CustomUser)
+@receiver(post_init, sender=User)
+def remember_access_fields(sender, instance, **kwargs):
+    instance._access_state = _access_state(sender, instance)
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_save, sender=User)
+def invalidate_employee_access_on_save(sender, instance, created, **kwargs):
+    fields = ACCESS_FIELDS[sender]
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not any(
+        name in update_fields or name.removesuffix('_id') in update_fields for name in fields
+    ):
+        return
+    old = instance._access_state
+    instance._access_state = _access_state(sender, instance)
+    if created:
+        # A new User has no session yet; a new profile replaces the cached
+        # "no profile" access of its user
+        if sender is CustomUser:
+            EmployeeAccess.invalidate()
+    elif _NOT_LOADED in old or old != instance._access_state:
+        EmployeeAccess.invalidate()
+
+@receiver(post_delete, sender=CustomUser)
+@receiver(post_delete, sender=Department)
+def invalidate_employee_access(sender, **kwargs):
+    EmployeeAccess.invalidate()
+
+
+# Daily department attendance rollups
+@receiver(post_init, sender=Attendance)
+def remember_rollup_key(sender, instance, **kwargs):
+    # Read from __dict__ so deferred fields are not fetched
+    instance._rollup_key = (instance.__dict__.get('department_id'), instance.__dict__.get('date'))
+
+@receiver(post_save, sender=Attendance)
+def refresh_rollup_on_save(sender, instance, using, **kwargs):
+    key = (instance.department_id, instance.date)
+    rollups.schedule_refresh({key, getattr(instance, '_rollup_key', key)}, using=using)
+    instance._rollup_key = key
+
+@receiver(post_delete, sender=Attendance)
+def refresh_rollup_on_delete(sender, instance, using, **kwargs):
+    rollups.schedule_refresh({(instance.department_id, instance.date)}, using=using)
+
+# A new late threshold changes the late count of every day; it is the only
+# settings field the rollups depend on
+@receiver(post_init, sender=AttendanceSettings)
+def remember_late_threshold(sender, instance, **kwargs):
+    instance._rollup_late_threshold = instance.__dict__.get('late_threshold')
+
+@receiver(post_save, sender=AttendanceSettings)
+def rebuild_rollups_on_settings_change(sender, instance, created, using, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'late_threshold' not in update_fields:
+        return
+    old = instance._rollup_late_threshold
+    instance._rollup_late_threshold = instance.late_threshold
+    if created:
+        # The rollups were counted with the default threshold until now
+        changed = rollups.late_threshold_changed(None, instance.late_threshold)
+    else:
+        # None: the field was deferred when the row was loaded
+        changed = old is None or rollups.late_threshold_changed(old, instance.late_threshold)
+    if changed:
+        rollups.schedule_rebuild(instance.department_id, using=using)
+
+@receiver(post_delete, sender=AttendanceSettings)
+def rebuild_rollups_on_settings_delete(sender, instance, using, **kwargs):
+    if rollups.late_threshold_changed(instance.late_threshold, None):
+        rollups.schedule_rebuild(instance.department_id, using=using)
+
+
+# Compiled working calendars follow the settings they were built from. Only
+# once the change commits: a worker rebuilding before that would read the
+# old settings and keep them under the new generation.
+@receiver(post_save, sender=AttendanceSettings)
+@receiver(post_delete, sender=AttendanceSettings)
+def invalidate_working_calendars(sender, using, **kwargs):
+    transaction.on_commit(WorkingCalendar.invalidate, using=using)
@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, Max, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from utils import metrics
+from utils.generations import Generation
+
+from .models import CustomUser, Department
+
+
+class EmployeeStatistics:
+    """
+    Numbers behind the home page cards, each scope computed in a single
+    query with conditional aggregation. Results can be cached for
+    EMPLOYEE_STATS_CACHE_TIMEOUT seconds in the default cache, which must
+    be an in-memory one (LocMemCache, or Redis/memcached): a cache that
+    costs a database query per lookup is slower than the aggregate it
+    saves. emp.signals invalidates them whenever a CustomUser or
+    Department is saved or deleted, and the bulk paths that send no
+    signals (admin actions, the importer) call invalidate() themselves.
+    """
+
+    CACHE_PREFIX = 'emp:employee-stats'
+    GENERATION = Generation('employee-stats')
+
+    @staticmethod
+    def start_of_month():
+        return timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    @classmethod
+    def _employee_aggregates(cls):
+        return {
+            'total_employees': Count('id'),
+            'active_employees': Count('id', filter=Q(is_active=True)),
+            'managers_count': Count('id', filter=Q(role='manager')),
+            'new_hires_this_month': Count('id', filter=Q(created_at__gte=cls.start_of_month())),
+        }
+
+    @classmethod
+    def for_company(cls):
+        """Statistics over every employee (super admin view)"""
+        active_departments = (
+            Department.objects.filter(is_active=True)
+            .order_by()
+            .values('is_active')
+            .annotate(total=Count('id'))
+            .values('total')
+        )
+        stats = CustomUser.objects.aggregate(
+            **cls._employee_aggregates(),
+            # Department count rides along as a scalar subquery
+            total_departments=Coalesce(
+                Max(Subquery(active_departments, output_field=IntegerField())), 0
+            ),
+        )
+        if stats['total_employees'] == 0:
+            # No employee rows means the aggregate saw no subquery value either
+            stats['total_departments'] = Department.objects.filter(is_active=True).count()
+        return stats
+
+    @classmethod
+    def for_department(cls, department):
+        """Statistics for one department (manager view)"""
+        stats = CustomUser.objects.filter(department=department).aggregate(
+            **cls._employee_aggregates()
+        )
+        stats['total_departments'] = 1
+        return stats
+
+    @classmethod
+    def for_user(cls, custom_user):
+        """Pick the scope the user is allowed to see, using the cache if enabled"""
+        if custom_user.is_superadmin:
+            scope, department_id = 'admin', None
+        elif custom_user.role == 'manager' and custom_user.department_id:
+            scope, department_id = 'manager', custom_user.department_id
+        else:
+            return None
+
+        timeout = getattr(settings, 'EMPLOYEE_STATS_CACHE_TIMEOUT', 0)
+        if not timeout:
+            return cls._compute(scope, department_id)
+
+        key = f'{cls.CACHE_PREFIX}:{cls._generation()}:{scope}:{department_id}'
+        stats = cache.get(key)
+        metrics.CACHE_REQUESTS.inc('employee_statistics', 'miss' if stats is None else 'hit')
+        if stats is None:
+            stats = cls._compute(scope, department_id)
+            cache.set(key, stats, timeout)
+        return stats
+
+    @classmethod
+    def _compute(cls, scope, department_id):
+        if scope == 'admin':
+            return cls.for_company()
+        return cls.for_department(department_id)
+
+    @classmethod
+    def _generation(cls):
+        return cls.GENERATION.get()
+
+    @classmethod
+    def invalidate(cls):
+        """Make every cached statistics entry stale, in every worker process"""
+        cls.GENERATION.bump()
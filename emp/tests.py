@@ -1,3 +1,800 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import itertools
+import json
+import uuid
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from utils.logging_utils import ModelAuditor
+from utils.models import AuditLog
+
+from .access import EmployeeAccess
+from .attendance import (
+    CREATED, NOT_FOUND, OTHER_DEPARTMENT, UPDATED, AttendanceAutofill, bulk_mark_attendance,
+    review_leave_requests,
+)
+from .benchmarks import BenchmarkRunner, create_benchmark_admin, default_users
+from .importer import EmployeeImporter, read_rows
+from .models import (
+    Attendance, AttendanceSettings, CustomUser, DailyDepartmentAttendance, Department, JobCursor,
+    LeaveRequest,
+)
+from .pagination import InvalidCursor, KeysetPaginator
+from .reports import AttendanceSummary
+from .sample_data import SampleDataGenerator
+from .search import EmployeeSearchIndex
+from .statistics import EmployeeStatistics
+from .working_calendar import WorkingCalendar
+
+
+MONDAY = datetime.date(2026, 10, 12)
+
+_phone_numbers = itertools.count(9800000000)
+
+
+def make_employee(username, department, role='employee', superuser=False, **fields):
+    if superuser:
+        user = User.objects.create_superuser(username, f'{username}@example.com', 'pw')
+    else:
+        user = User.objects.create_user(
+            username, f'{username}@example.com', 'pw',
+            first_name=fields.pop('first_name', ''), last_name=fields.pop('last_name', ''),
+        )
+    return CustomUser.objects.create(
+        user=user, phone_number=next(_phone_numbers), address=fields.pop('address', 'Kathmandu'),
+        department=department, role=role, **fields,
+    )
+
+
+@override_settings(LOG_WRITER={'MODE': 'sync'})
+class EmpTestCase(TestCase):
+
+    def setUp(self):
+        # Compiled calendars are kept per process, across test transactions
+        WorkingCalendar.invalidate()
+        self.department = Department.objects.create(name='Engineering', code='ENG')
+        self.other_department = Department.objects.create(name='Operations', code='OPS')
+        self.manager = make_employee('manager', self.department, role='manager')
+
+
+@override_settings(LOG_WRITER={'MODE': 'sync'})
+class AuditTrailTests(TestCase):
+
+    def setUp(self):
+        self.department = Department.objects.create(name='Engineering', code='ENG')
+
+    def test_create_is_audited(self):
+        entry = AuditLog.objects.get(model_name='Department', object_id=str(self.department.pk))
+        self.assertEqual((entry.action, entry.changes), ('CREATE', {}))
+
+    def test_save_logs_only_the_changed_fields(self):
+        department = Department.objects.get(pk=self.department.pk)
+        department.description = 'Builds things'
+        department.save()
+
+        entry = AuditLog.objects.filter(action='UPDATE').get()
+        self.assertEqual(entry.changes, {'description': {'old': None, 'new': 'Builds things'}})
+
+    def test_deferred_fields_are_not_reported_or_loaded(self):
+        department = Department.objects.only('id', 'name').get(pk=self.department.pk)
+        department.name = 'Platform'
+        with self.assertNumQueries(0):
+            changes = ModelAuditor.get_changes(department)
+        self.assertEqual(changes, {'name': {'old': 'Engineering', 'new': 'Platform'}})
+
+    def test_unchanged_save_writes_no_entry(self):
+        Department.objects.get(pk=self.department.pk).save()
+        self.assertFalse(AuditLog.objects.filter(action='UPDATE').exists())
+
+    def test_delete_is_audited(self):
+        pk = self.department.pk
+        self.department.delete()
+        self.assertTrue(AuditLog.objects.filter(action='DELETE', object_id=str(pk)).exists())
+
+    def test_audited_update_logs_the_rows_it_changed(self):
+        inactive = Department.objects.create(name='Archive', code='ARC', is_active=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            updated = ModelAuditor.audited_update(Department.objects.all(), is_active=False)
+
+        self.assertEqual(updated, 2)
+        entries = AuditLog.objects.filter(action='UPDATE')
+        self.assertEqual(list(entries.values_list('object_id', flat=True)), [str(self.department.pk)])
+        self.assertEqual(entries.get().changes, {'is_active': {'old': 'True', 'new': 'False'}})
+        self.assertFalse(entries.filter(object_id=str(inactive.pk)).exists())
+
+
+class EmployeeSearchTests(EmpTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin = make_employee('admin', self.department, role='admin', superuser=True)
+        self.alice = make_employee('alice', self.department, first_name='Alice', last_name='Sharma')
+        self.alina = make_employee('alina', self.other_department, first_name='Alina', last_name='Rai')
+        self.client.force_login(self.admin.user)
+
+    def require_index(self):
+        if not EmployeeSearchIndex.is_available():
+            self.skipTest("SQLite without FTS5 trigram support")
+
+    def search_page(self, query):
+        response = self.client.get('/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return {employee.user.username for employee in response.context['emp_details']}
+
+    def test_build_match(self):
+        self.assertIsNone(EmployeeSearchIndex.build_match('al'))
+        self.assertIsNone(EmployeeSearchIndex.build_match('alice al'))
+        self.assertEqual(EmployeeSearchIndex.build_match('ali "xy'), '"ali" """xy"')
+
+    def test_index_matches_within_the_scope(self):
+        self.require_index()
+        self.assertEqual(set(EmployeeSearchIndex.search('ali')), {self.alice.id, self.alina.id})
+        scope = CustomUser.objects.filter(department=self.department)
+        self.assertEqual(EmployeeSearchIndex.search('ali', scope=scope), [self.alice.id])
+
+    def test_bulk_created_employees_are_indexed(self):
+        self.require_index()
+        users = User.objects.bulk_create([
+            User(username=f'bulk{i}', first_name='Bikash', last_name=f'Thapa{i}') for i in range(3)
+        ])
+        CustomUser.objects.bulk_create([
+            CustomUser(user=user, phone_number=next(_phone_numbers), address='Pokhara', department=self.department)
+            for user in users
+        ])
+        self.assertEqual(self.search_page('Bikash'), {'bulk0', 'bulk1', 'bulk2'})
+        self.assertEqual(len(EmployeeSearchIndex.search('Pokhara')), 3)
+
+    def test_queryset_update_reindexes_the_rows(self):
+        self.require_index()
+        CustomUser.objects.filter(pk=self.alina.pk).update(address='Lalitpur', department=self.department)
+        self.assertEqual(EmployeeSearchIndex.search('Lalitpur'), [self.alina.id])
+        self.assertEqual(EmployeeSearchIndex.search('Operations'), [])
+
+    def test_short_terms_fall_back_to_icontains(self):
+        self.assertEqual(self.search_page('Sh'), {'alice'})
+
+    def test_falls_back_to_icontains_without_the_index(self):
+        with mock.patch.object(EmployeeSearchIndex, 'is_available', return_value=False):
+            self.assertEqual(self.search_page('Rai'), {'alina'})
+        self.assertEqual(self.search_page('Rai'), {'alina'})
+
+
+class AccessInvalidationTests(EmpTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin = make_employee('admin', self.department, role='admin', superuser=True)
+        self.employees = [make_employee(f'employee{i}', self.department) for i in range(3)]
+
+    def cached_access(self, employee):
+        session = {}
+        EmployeeAccess.for_profile(employee.user, employee).to_session(session)
+        return session
+
+    def test_session_cached_access_costs_no_queries(self):
+        session = self.cached_access(self.manager)
+        with self.assertNumQueries(0):
+            access = EmployeeAccess.from_session(session, self.manager.user.pk)
+        self.assertTrue(access.is_department_manager)
+
+    def test_role_change_expires_session_cached_access(self):
+        session = self.cached_access(self.manager)
+
+        self.manager.role = 'employee'
+        self.manager.save()
+
+        self.assertIsNone(EmployeeAccess.from_session(session, self.manager.user.pk))
+
+    def test_saves_that_keep_the_permissions_keep_the_cache(self):
+        session = self.cached_access(self.manager)
+
+        self.assertTrue(self.client.login(username='manager', password='pw'))
+        self.manager.address = 'Bhaktapur'
+        self.manager.save()
+        self.manager.user.first_name = 'Maya'
+        self.manager.user.save()
+
+        self.assertIsNotNone(EmployeeAccess.from_session(session, self.manager.user.pk))
+
+    def test_superuser_change_expires_session_cached_access(self):
+        session = self.cached_access(self.manager)
+
+        user = User.objects.get(pk=self.manager.user.pk)
+        user.is_superuser = True
+        user.save()
+
+        self.assertIsNone(EmployeeAccess.from_session(session, self.manager.user.pk))
+
+    def test_admin_bulk_action_expires_session_cached_access(self):
+        session = self.cached_access(self.employees[0])
+
+        self.client.force_login(self.admin.user)
+        response = self.client.post('/admin/emp/customuser/', {
+            'action': 'deactivate_users',
+            '_selected_action': [str(employee.id) for employee in self.employees],
+        })
+
+        self.assertEqual(response.status_code, 302)
+        self.assertIsNone(EmployeeAccess.from_session(session, self.employees[0].user.pk))
+
+
+class EmployeeStatisticsTests(EmpTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin = make_employee('admin', self.department, role='admin', superuser=True)
+        self.employees = [make_employee(f'employee{i}', self.department) for i in range(3)]
+        make_employee('elsewhere', self.other_department, is_active=False)
+
+    def test_company_and_department_scopes(self):
+        self.assertEqual(EmployeeStatistics.for_company(), {
+            'total_employees': 6, 'active_employees': 5, 'managers_count': 1,
+            'new_hires_this_month': 6, 'total_departments': 2,
+        })
+        self.assertEqual(EmployeeStatistics.for_department(self.other_department), {
+            'total_employees': 1, 'active_employees': 0, 'managers_count': 0,
+            'new_hires_this_month': 1, 'total_departments': 1,
+        })
+
+    def test_departments_are_counted_without_employees(self):
+        CustomUser.objects.all().delete()
+        self.assertEqual(EmployeeStatistics.for_company()['total_departments'], 2)
+
+    @override_settings(EMPLOYEE_STATS_CACHE_TIMEOUT=300)
+    def test_cached_statistics_cost_no_queries(self):
+        stats = EmployeeStatistics.for_user(self.manager)
+        with self.assertNumQueries(0):
+            self.assertEqual(EmployeeStatistics.for_user(self.manager), stats)
+
+    @override_settings(EMPLOYEE_STATS_CACHE_TIMEOUT=300)
+    def test_admin_bulk_action_invalidates_the_cache(self):
+        self.assertEqual(EmployeeStatistics.for_user(self.admin)['active_employees'], 5)
+
+        self.client.force_login(self.admin.user)
+        response = self.client.post('/admin/emp/customuser/', {
+            'action': 'deactivate_users',
+            '_selected_action': [str(employee.id) for employee in self.employees],
+        })
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(EmployeeStatistics.for_user(self.admin)['active_employees'], 2)
+
+
+class WorkingCalendarTests(EmpTestCase):
+    # 2024-01-01 is a Monday
+    monday = datetime.date(2024, 1, 1)
+
+    def setUp(self):
+        super().setUp()
+        AttendanceSettings.objects.create(
+            department=self.department, weekdays='1,2,3,4,5', holidays=['2024-01-03', '2024-01-06', 'bad'],
+        )
+
+    def test_weekends_and_holidays_are_not_working_days(self):
+        calendar = WorkingCalendar.for_department(self.department.pk)
+        self.assertTrue(calendar.is_working_day(self.monday))
+        self.assertFalse(calendar.is_working_day(datetime.date(2024, 1, 3)))
+        self.assertFalse(calendar.is_working_day(datetime.date(2024, 1, 7)))
+
+    def test_working_days_between_matches_a_day_by_day_count(self):
+        calendar = WorkingCalendar.for_department(self.department.pk)
+        for length in range(20):
+            end = self.monday + datetime.timedelta(days=length)
+            for start in (self.monday, self.monday + datetime.timedelta(days=2)):
+                self.assertEqual(
+                    calendar.working_days_between(start, end), len(calendar.working_dates(start, end))
+                )
+        # The Saturday holiday is not subtracted twice
+        self.assertEqual(calendar.working_days_between(self.monday, self.monday + datetime.timedelta(days=13)), 9)
+
+    def test_departments_without_settings_work_monday_to_friday(self):
+        calendar = WorkingCalendar.for_department(self.other_department.pk)
+        self.assertEqual(calendar.working_days_between(self.monday, self.monday + datetime.timedelta(days=6)), 5)
+
+    def test_calendars_are_loaded_in_one_query_and_then_cached(self):
+        departments = [self.department.pk, self.other_department.pk]
+        with self.assertNumQueries(1):
+            calendars = WorkingCalendar.for_departments(departments)
+        with self.assertNumQueries(0):
+            self.assertEqual(WorkingCalendar.for_departments(departments), calendars)
+            self.assertIs(WorkingCalendar.for_department(self.department.pk), calendars[self.department.pk])
+
+    def test_saving_the_settings_rebuilds_the_calendar(self):
+        self.assertFalse(WorkingCalendar.for_department(self.department.pk).is_working_day(
+            datetime.date(2024, 1, 3)
+        ))
+
+        attendance_settings = AttendanceSettings.objects.get(department=self.department)
+        attendance_settings.holidays = []
+        with self.captureOnCommitCallbacks(execute=True):
+            attendance_settings.save()
+
+        self.assertTrue(WorkingCalendar.for_department(self.department.pk).is_working_day(
+            datetime.date(2024, 1, 3)
+        ))
+
+
+class KeysetPaginatorTests(TestCase):
+
+    ORDERING = ('name', 'id')
+
+    @classmethod
+    def setUpTestData(cls):
+        Department.objects.bulk_create([
+            Department(name=f'Department {i:02}', code=f'D{i:02}') for i in range(25)
+        ])
+
+    def paginator(self, **kwargs):
+        return KeysetPaginator(Department.objects.all(), 10, self.ORDERING, **kwargs)
+
+    def test_walks_every_row_once_in_order(self):
+        paginator = self.paginator()
+        names, cursor, pages = [], None, 0
+        while True:
+            page = paginator.page(cursor)
+            names.extend(department.name for department in page)
+            pages += 1
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(pages, 3)
+        self.assertEqual(names, [f'Department {i:02}' for i in range(25)])
+
+    def test_previous_cursor_returns_the_page_before(self):
+        paginator = self.paginator()
+        second = paginator.page(paginator.page().next_cursor)
+        third = paginator.page(second.next_cursor)
+        back = paginator.page(third.previous_cursor)
+        self.assertEqual([d.pk for d in back], [d.pk for d in second])
+        self.assertTrue(back.has_next())
+        self.assertTrue(back.has_previous())
+
+    def test_tampered_cursor(self):
+        paginator = self.paginator()
+        cursor = paginator.page().next_cursor
+        with self.assertRaises(InvalidCursor):
+            paginator.page(cursor[:-2] + 'xx')
+        first = paginator.get_page(cursor[:-2] + 'xx')
+        self.assertEqual(first[0].name, 'Department 00')
+
+    def test_estimated_count_stops_at_the_cap(self):
+        paginator = self.paginator(count='estimate', count_cap=20)
+        self.assertEqual(paginator.display_count, '20+')
+        self.assertEqual(self.paginator(count='exact').display_count, '25')
+
+
+class BulkMarkAttendanceTests(EmpTestCase):
+
+    def test_outcomes_per_submitted_id(self):
+        marked = make_employee('marked', self.department)
+        unmarked = make_employee('unmarked', self.department)
+        outsider = make_employee('outsider', self.other_department)
+        Attendance.objects.create(employee=marked, date=MONDAY, status='absent')
+        unknown = str(uuid.uuid4())
+
+        results = bulk_mark_attendance(
+            self.manager, MONDAY, 'present',
+            [str(marked.id), str(unmarked.id), str(outsider.id), unknown, 'not-an-id'],
+            marked_by=self.manager.user,
+        )
+
+        self.assertEqual(results, {
+            str(marked.id): UPDATED,
+            str(unmarked.id): CREATED,
+            str(outsider.id): OTHER_DEPARTMENT,
+            unknown: NOT_FOUND,
+            'not-an-id': NOT_FOUND,
+        })
+        self.assertEqual(
+            sorted(Attendance.objects.filter(date=MONDAY).values_list('employee__user__username', 'status')),
+            [('marked', 'present'), ('unmarked', 'present')],
+        )
+
+    def test_query_count_does_not_grow_with_the_employees(self):
+        employees = [make_employee(f'employee{i}', self.department) for i in range(6)]
+        ids = [str(employee.id) for employee in employees]
+
+        with CaptureQueriesContext(connection) as one:
+            bulk_mark_attendance(self.manager, MONDAY, 'present', ids[:1])
+        with CaptureQueriesContext(connection) as many:
+            bulk_mark_attendance(self.manager, MONDAY, 'absent', ids)
+
+        self.assertEqual(len(many), len(one))
+        self.assertEqual(Attendance.objects.filter(date=MONDAY, status='absent').count(), 6)
+
+
+class ReviewLeaveRequestsTests(EmpTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.employee = make_employee('employee', self.department)
+        with self.captureOnCommitCallbacks(execute=True):
+            AttendanceSettings.objects.create(department=self.department, holidays=['2026-10-19'])
+        # Friday to Tuesday: the weekend and the Monday holiday are skipped
+        self.leave = LeaveRequest.objects.create(
+            employee=self.employee, leave_type='sick', reason='Flu',
+            start_date=datetime.date(2026, 10, 16), end_date=datetime.date(2026, 10, 20),
+        )
+
+    def test_approval_upserts_leave_on_working_days(self):
+        Attendance.objects.create(employee=self.employee, date=datetime.date(2026, 10, 20), status='present')
+
+        days = review_leave_requests([self.leave], 'approve', self.manager.user)
+
+        self.assertEqual(days, {self.leave: 2})
+        self.assertEqual(
+            list(Attendance.objects.filter(employee=self.employee).order_by('date').values_list('date', 'status')),
+            [(datetime.date(2026, 10, 16), 'leave'), (datetime.date(2026, 10, 20), 'leave')],
+        )
+        self.leave.refresh_from_db()
+        self.assertEqual(self.leave.status, 'approved')
+        self.assertEqual(self.leave.reviewed_by, self.manager.user)
+
+    def test_rejection_writes_no_attendance(self):
+        days = review_leave_requests([self.leave], 'reject', self.manager.user, notes='Busy week')
+
+        self.assertEqual(days, {self.leave: 0})
+        self.assertFalse(Attendance.objects.filter(employee=self.employee).exists())
+        self.leave.refresh_from_db()
+        self.assertEqual((self.leave.status, self.leave.response_notes), ('rejected', 'Busy week'))
+
+
+class AttendanceSummaryTests(EmpTestCase):
+
+    def setUp(self):
+        super().setUp()
+        AttendanceSettings.objects.create(department=self.department, late_threshold=datetime.time(9, 30))
+        rows = [
+            ('on_time', 'present', datetime.time(9, 0)),
+            ('late', 'present', datetime.time(9, 45)),
+            ('late_half_day', 'half_day', datetime.time(12, 0)),
+            ('absent', 'absent', None),
+            ('on_leave', 'leave', None),
+        ]
+        for username, status, check_in in rows:
+            employee = make_employee(username, self.department)
+            Attendance.objects.create(employee=employee, date=MONDAY, status=status, check_in=check_in)
+        make_employee('inactive', self.department, is_active=False)
+
+    def summary(self, department):
+        attendances = Attendance.objects.filter(department=department, date=MONDAY)
+        return AttendanceSummary.for_queryset(attendances, department, MONDAY, MONDAY)
+
+    def test_counts_and_late_arrivals(self):
+        summary = self.summary(self.department)
+        self.assertEqual(
+            {key: summary[key] for key in (
+                'present_count', 'half_day_count', 'absent_count', 'leave_count', 'late_count',
+                'total_records', 'total_employees', 'active_employees', 'inactive_employees',
+            )},
+            {
+                'present_count': 2, 'half_day_count': 1, 'absent_count': 1, 'leave_count': 1,
+                'late_count': 2, 'total_records': 5, 'total_employees': 7, 'active_employees': 6,
+                'inactive_employees': 1,
+            },
+        )
+        self.assertEqual(summary['late_percentage'], round(2 / 6 * 100, 2))
+
+    def test_departments_without_settings_use_the_default_threshold(self):
+        employee = make_employee('elsewhere', self.other_department)
+        # Late by Engineering's 9:30, on time by the 10:00 default
+        Attendance.objects.create(employee=employee, date=MONDAY, status='present', check_in=datetime.time(9, 45))
+        self.assertEqual(self.summary(self.other_department)['late_count'], 0)
+
+    def test_the_summary_is_one_query(self):
+        WorkingCalendar.for_department(self.department.pk)
+        with self.assertNumQueries(1):
+            self.summary(self.department)
+
+
+class ReconcileAttendanceDepartmentsTests(EmpTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.employee = make_employee('mover', self.department)
+        self.old = Attendance.objects.create(employee=self.employee, date=MONDAY, status='present')
+        self.new = Attendance.objects.create(
+            employee=self.employee, date=MONDAY + datetime.timedelta(days=7), status='present',
+        )
+        # A queryset update moves the employee without touching their attendance
+        CustomUser.objects.filter(pk=self.employee.pk).update(department=self.other_department)
+
+    def departments(self):
+        return [
+            Attendance.objects.get(pk=row.pk).department_id for row in (self.old, self.new)
+        ]
+
+    def reconcile(self, *args):
+        out = io.StringIO()
+        call_command('reconcile_attendance_departments', *args, stdout=out)
+        return out.getvalue()
+
+    def test_rows_since_a_day_move_with_the_employee(self):
+        since = (MONDAY + datetime.timedelta(days=1)).isoformat()
+        self.assertIn('1 attendance row', self.reconcile('--since', since))
+        self.assertEqual(self.departments(), [self.department.pk, self.other_department.pk])
+
+    def test_every_row_in_batches(self):
+        self.assertIn('2 attendance row', self.reconcile('--batch-size', '1'))
+        self.assertEqual(self.departments(), [self.other_department.pk] * 2)
+
+    def test_dry_run_changes_nothing(self):
+        self.assertIn('2 attendance row(s) have an out of date department', self.reconcile('--dry-run'))
+        self.assertEqual(self.departments(), [self.department.pk] * 2)
+
+
+class AttendanceRollupTests(EmpTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.employees = [make_employee(f'employee{i}', self.department) for i in range(3)]
+        with self.captureOnCommitCallbacks(execute=True):
+            for employee, status in zip(self.employees, ('present', 'present', 'absent')):
+                Attendance.objects.create(
+                    employee=employee, date=MONDAY, status=status,
+                    check_in=datetime.time(10, 30) if status == 'present' else None,
+                )
+
+    def rollup(self, department=None):
+        return DailyDepartmentAttendance.objects.get(department=department or self.department, date=MONDAY)
+
+    def test_saves_refresh_the_day(self):
+        rollup = self.rollup()
+        self.assertEqual(
+            (rollup.present_count, rollup.absent_count, rollup.late_count, rollup.record_count), (2, 1, 2, 3)
+        )
+
+    def test_queryset_updates_refresh_the_day(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.filter(status='absent').update(status='leave')
+        rollup = self.rollup()
+        self.assertEqual((rollup.absent_count, rollup.leave_count), (0, 1))
+
+    def test_moving_rows_refreshes_both_departments(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.filter(status='absent').update(department=self.other_department)
+        self.assertEqual(self.rollup().record_count, 2)
+        self.assertEqual(self.rollup(self.other_department).absent_count, 1)
+
+    def test_deleting_the_last_row_removes_the_day(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.filter(date=MONDAY).delete()
+        self.assertFalse(DailyDepartmentAttendance.objects.exists())
+
+    def test_a_new_late_threshold_rebuilds_the_department(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            AttendanceSettings.objects.create(department=self.department, late_threshold=datetime.time(11, 0))
+        self.assertEqual(self.rollup().late_count, 0)
+
+    def test_rebuild_command_corrects_drift(self):
+        DailyDepartmentAttendance.objects.update(present_count=99)
+        call_command(
+            'rebuild_attendance_rollups', '--start', MONDAY.isoformat(), '--end', MONDAY.isoformat(),
+            stdout=io.StringIO(),
+        )
+        self.assertEqual(self.rollup().present_count, 2)
+
+
+class AttendanceAutofillTests(EmpTestCase):
+    # Friday to Monday, with the Monday a holiday of Engineering
+    friday = datetime.date(2026, 10, 16)
+    monday = datetime.date(2026, 10, 19)
+
+    def setUp(self):
+        super().setUp()
+        self.employee = make_employee('employee', self.department)
+        with self.captureOnCommitCallbacks(execute=True):
+            AttendanceSettings.objects.create(department=self.department, holidays=[self.monday.isoformat()])
+        CustomUser.objects.update(created_at=timezone.make_aware(datetime.datetime(2026, 10, 1)))
+        Attendance.objects.create(employee=self.employee, date=self.friday, status='present')
+
+    def statuses(self, employee):
+        return list(
+            Attendance.objects.filter(employee=employee).order_by('date').values_list('date', 'status')
+        )
+
+    def test_unmarked_days_are_filled_from_the_calendar(self):
+        added = dict(AttendanceAutofill().run(self.friday, self.monday))
+
+        self.assertEqual(added, {
+            self.friday: 1, self.friday + datetime.timedelta(days=1): 2,
+            self.friday + datetime.timedelta(days=2): 2, self.monday: 2,
+        })
+        self.assertEqual(self.statuses(self.employee), [
+            (self.friday, 'present'),
+            (self.friday + datetime.timedelta(days=1), 'weekend'),
+            (self.friday + datetime.timedelta(days=2), 'weekend'),
+            (self.monday, 'holiday'),
+        ])
+        self.assertEqual(self.statuses(self.manager)[0], (self.friday, 'absent'))
+
+    def test_employees_are_filled_from_their_first_day(self):
+        newcomer = make_employee('newcomer', self.department)
+        CustomUser.objects.filter(pk=newcomer.pk).update(created_at=timezone.make_aware(
+            datetime.datetime.combine(self.monday, datetime.time(12))
+        ))
+        list(AttendanceAutofill().run(self.friday, self.monday))
+        self.assertEqual(self.statuses(newcomer), [(self.monday, 'holiday')])
+
+    def test_a_rerun_resumes_after_the_last_finished_day(self):
+        list(AttendanceAutofill().run(self.friday, self.friday))
+        self.assertEqual(JobCursor.objects.get().position, self.friday)
+
+        out = io.StringIO()
+        call_command('autofill_attendance', '--end', self.monday.isoformat(), stdout=out)
+
+        self.assertNotIn(f'{self.friday}:', out.getvalue())
+        self.assertEqual(JobCursor.objects.get().position, self.monday)
+        self.assertEqual(Attendance.objects.filter(date=self.friday).count(), 2)
+
+    def test_a_department_run_leaves_the_cursor_alone(self):
+        list(AttendanceAutofill(department_ids=[self.department.pk]).run(self.friday, self.friday))
+        self.assertFalse(JobCursor.objects.exists())
+
+
+# The test mirror of the replica is a second connection that cannot see
+# the test transaction, so the report reads from the primary here
+@override_settings(DATABASE_REPLICA={'ALIAS': None})
+class AttendanceExportTests(EmpTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.employee = make_employee('employee', self.department)
+        make_employee('unmarked', self.department)
+        Attendance.objects.create(
+            employee=self.employee, date=MONDAY, status='present', notes='=HYPERLINK("x")',
+        )
+        self.client.force_login(self.manager.user)
+
+    def download(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_report_csv(self):
+        response, content = self.download(
+            reverse('emp:attendance_report'), format='csv',
+            start_date=MONDAY.isoformat(), end_date=MONDAY.isoformat(),
+        )
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn(f'attendance-{MONDAY}-{MONDAY}.csv', response['Content-Disposition'])
+        header, row = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(header[:2], ['date', 'username'])
+        self.assertEqual(row[:2], [MONDAY.isoformat(), 'employee'])
+        # Formula cells are quoted so a spreadsheet shows them as text
+        self.assertEqual(row[header.index('notes')], '\'=HYPERLINK("x")')
+
+    def test_daily_jsonl_includes_unmarked_employees(self):
+        _, content = self.download(reverse('emp:api_daily_attendance'), format='jsonl', date=MONDAY.isoformat())
+        rows = {row['username']: row for row in map(json.loads, content.splitlines())}
+        self.assertEqual(set(rows), {'manager', 'employee', 'unmarked'})
+        self.assertEqual((rows['employee']['status'], rows['unmarked']['status']), ('present', 'absent'))
+
+
+class EmployeeImportTests(EmpTestCase):
+
+    HEADER = 'username,email,password,phone_number,department,address,role\n'
+
+    def run_import(self, content, import_format='csv'):
+        importer = EmployeeImporter(chunk_size=2, workers=1)
+        return importer.run(read_rows(io.BytesIO(content.encode()), import_format))
+
+    def test_bad_rows_are_reported_and_the_rest_imported(self):
+        result = self.run_import(self.HEADER + (
+            'new1,new1@example.com,long-enough,9811111111,ENG,Kathmandu,employee\n'
+            'new1,other@example.com,long-enough,9811111112,ENG,Kathmandu,employee\n'
+            ',nobody@example.com,long-enough,9811111113,ENG,Kathmandu,employee\n'
+            'new2,not-an-email,short,9811111114,XYZ,Kathmandu,boss\n'
+            'manager,manager2@example.com,long-enough,9811111115,Operations,Kathmandu,employee\n'
+            'new3,new3@example.com,,9811111116,ops,Lalitpur,manager\n'
+        ))
+
+        self.assertEqual(result.created, 2)
+        self.assertEqual({error['line']: error['errors'] for error in result.errors}, {
+            3: ['duplicate username in the import file'],
+            4: ['username is required'],
+            5: [
+                'a valid email is required', "unknown role 'boss'", "unknown department 'XYZ'",
+                'password must be at least 8 characters long',
+            ],
+            6: ['a user with this username already exists'],
+        })
+        new1 = CustomUser.objects.select_related('user').get(user__username='new1')
+        self.assertEqual(new1.department, self.department)
+        self.assertTrue(new1.user.check_password('long-enough'))
+        new3 = CustomUser.objects.select_related('user').get(user__username='new3')
+        self.assertEqual((new3.department, new3.role), (self.other_department, 'manager'))
+        self.assertFalse(new3.user.has_usable_password())
+
+    def test_jsonl_errors_and_report(self):
+        result = self.run_import(
+            '{"username": "json1", "email": "json1@example.com", "phone_number": "9822222222", '
+            '"address": "Kathmandu"}\n'
+            'not json\n'
+            '[1, 2]\n',
+            import_format='jsonl',
+        )
+        self.assertEqual(result.created, 1)
+        self.assertEqual([error['line'] for error in result.errors], [2, 3])
+
+        report = io.StringIO()
+        result.write_report(report, 'csv')
+        lines = list(csv.reader(io.StringIO(report.getvalue())))
+        self.assertEqual(lines[0], ['line', 'username', 'errors'])
+        self.assertEqual(lines[2], ['3', '', 'Each line must be a JSON object'])
+
+
+class DepartmentCounterTests(EmpTestCase):
+
+    def counters(self):
+        return {
+            department.code: (department.employee_count, department.active_employee_count)
+            for department in Department.objects.all()
+        }
+
+    def test_saves_moves_and_deletes_keep_the_counters(self):
+        employee = make_employee('employee', self.department, is_active=False)
+        self.assertEqual(self.counters(), {'ENG': (2, 1), 'OPS': (0, 0)})
+
+        employee.department, employee.is_active = self.other_department, True
+        employee.save()
+        self.assertEqual(self.counters(), {'ENG': (1, 1), 'OPS': (1, 1)})
+
+        employee.user.delete()
+        self.assertEqual(self.counters(), {'ENG': (1, 1), 'OPS': (0, 0)})
+
+    def test_queryset_updates_and_bulk_creates_keep_the_counters(self):
+        users = User.objects.bulk_create([User(username=f'bulk{i}') for i in range(3)])
+        CustomUser.objects.bulk_create([
+            CustomUser(user=user, phone_number=next(_phone_numbers), address='Kathmandu',
+                       department=self.other_department)
+            for user in users
+        ])
+        self.assertEqual(self.counters(), {'ENG': (1, 1), 'OPS': (3, 3)})
+
+        CustomUser.objects.filter(user__username='bulk0').update(department=self.department)
+        CustomUser.objects.filter(department=self.other_department).update(is_active=False)
+        self.assertEqual(self.counters(), {'ENG': (2, 2), 'OPS': (2, 0)})
+
+    def test_reconcile_command_fixes_drift(self):
+        Department.objects.filter(pk=self.department.pk).update(employee_count=7, active_employee_count=0)
+
+        out = io.StringIO()
+        call_command('reconcile_department_counters', '--dry-run', stdout=out)
+        self.assertIn('stored 7 total / 0 active, actual 1 / 1', out.getvalue())
+        self.assertEqual(self.counters()['ENG'], (7, 0))
+
+        call_command('reconcile_department_counters', stdout=io.StringIO())
+        self.assertEqual(self.counters(), {'ENG': (1, 1), 'OPS': (0, 0)})
+
+
+# Reads stay on the primary: the replica's test mirror cannot see the test
+# transaction
+@override_settings(LOG_WRITER={'MODE': 'sync'}, DATABASE_REPLICA={'ALIAS': None})
+class BenchmarkTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        dataset = SampleDataGenerator(departments=2, employees=60, days=3, logs_per_day=60, seed=1).run()
+        create_benchmark_admin(Department.objects.get(pk=dataset['departments'][0]))
+
+    @mock.patch('utils.log_writer.BufferedLogWriter._ensure_thread')
+    def test_every_page_stays_within_its_query_limit(self, ensure_thread):
+        runner = BenchmarkRunner(*default_users(), iterations=1)
+        # Request logs are queued, as in production, rather than written by
+        # each request; they are flushed inside the test when it ends
+        with self.settings(LOG_WRITER={'MODE': 'buffered'}):
+            results = runner.run()
+
+        self.assertEqual(set(results), set(runner.thresholds))
+        violations = [violation for violation in runner.check(results) if violation[1] in ('status', 'queries')]
+        self.assertEqual(violations, [])
@@ -1,5 +1,6 @@
 from django.shortcuts import render, redirect,get_object_or_404,HttpResponse
-from django.db.models import Count, Q
+from django.db.models import Count, Q, Sum, Case, When, Value, IntegerField, FilteredRelation
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.core.paginator import Paginator
 from django.utils import timezone
@@ -7,6 +8,16 @@ from datetime import date, timedelta
 import datetime
 from emp.models import CustomUser, Department, Attendance, AttendanceSettings ,LeaveRequest
 from emp.forms import CustomUserCreationForm
+from emp import attendance as attendance_service
+from emp.access import session_cached_access
+from emp import rollups
+from emp.exports import CHUNK_SIZE as EXPORT_CHUNK_SIZE, requested_format, stream_export
+from emp.pagination import KeysetPaginator, use_cursor_pagination
+from emp.reports import AttendanceSummary
+from emp.search import EmployeeSearchIndex
+from emp.statistics import EmployeeStatistics
+from utils.db_routing import bind_to_current_db, replica_reads
+from utils.db_writer import single_writer
 from django.http import JsonResponse
 from django.contrib import messages
 from emp.forms import DepartmentForm
@@ -34,6 +45,7 @@ def home_page(request):
         status_filter = request.GET.get('status', '')
         search_query = request.GET.get('q', '')
         page_number = request.GET.get('page', 1)
+        ranked_search = False
         
         # Start with base queryset based on user role
         if custom_user.role == 'admin' and request.user.is_superuser:
@@ -41,9 +53,8 @@ def home_page(request):
             emp_details = CustomUser.objects.select_related('user', 'department').order_by('-created_at')
             
             # Get all departments for super admin
-            departments = Department.objects.annotate(
-                dept_employee_count=Count('employees')
-            ).order_by('name')
+            # The cards show the stored employee counters and the manager
+            departments = Department.objects.select_related('manager__user').order_by('name')
             
         elif custom_user.role == 'manager':
             # Manager can only see employees from their department
@@ -55,9 +66,7 @@ def home_page(request):
                 # Get only manager's department and other active departments for filter
                 departments = Department.objects.filter(
                     Q(id=custom_user.department.id) | Q(is_active=True)
-                ).annotate(
-                    dept_employee_count=Count('employees')
-                ).order_by('name')
+                ).select_related('manager__user').order_by('name')
             else:
                 # If manager has no department, they can only see themselves
                 emp_details = CustomUser.objects.filter(id=custom_user.id).select_related('user', 'department')
@@ -82,42 +91,38 @@ def home_page(request):
                 emp_details = emp_details.filter(is_active=False)
         
         if search_query:
-            emp_details = emp_details.filter(
-                Q(user__username__icontains=search_query) |
-                Q(user__first_name__icontains=search_query) |
-                Q(user__last_name__icontains=search_query) |
-                Q(phone_number__icontains=search_query) |
-                Q(department__name__icontains=search_query) |
-                Q(address__icontains=search_query)
-            )
+            if EmployeeSearchIndex.can_search(search_query):
+                # Ranked matches within the visible employees, best first
+                matched_ids = EmployeeSearchIndex.search(search_query, scope=emp_details)
+                ranked_search = True
+                emp_details = emp_details.filter(id__in=matched_ids).order_by(
+                    Case(
+                        *[When(id=emp_id, then=Value(rank)) for rank, emp_id in enumerate(matched_ids)],
+                        output_field=IntegerField()
+                    )
+                ) if matched_ids else emp_details.none()
+            else:
+                search_filter = (
+                    Q(user__username__icontains=search_query) |
+                    Q(user__first_name__icontains=search_query) |
+                    Q(user__last_name__icontains=search_query) |
+                    Q(department__name__icontains=search_query) |
+                    Q(address__icontains=search_query)
+                )
+                # Casting every phone number to text only makes sense for digits
+                if search_query.isdigit():
+                    search_filter |= Q(phone_number__icontains=search_query)
+                emp_details = emp_details.filter(search_filter)
         
-        # Calculate statistics based on user role
-        if custom_user.role == 'admin' and request.user.is_superuser:
-            # Super Admin gets full statistics
-            total_employees = CustomUser.objects.count()
-            active_employees = CustomUser.objects.filter(is_active=True).count()
-            managers_count = CustomUser.objects.filter(role='manager').count()
-            total_departments = Department.objects.filter(is_active=True).count()
-            
-            # Calculate new hires this month
-            current_month = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            new_hires_this_month = CustomUser.objects.filter(
-                created_at__gte=current_month
-            ).count()
-            
-        elif custom_user.role == 'manager' and custom_user.department:
-            # Manager gets statistics for their department only
-            dept_employees = CustomUser.objects.filter(department=custom_user.department)
-            total_employees = dept_employees.count()
-            active_employees = dept_employees.filter(is_active=True).count()
-            managers_count = dept_employees.filter(role='manager').count()
-            total_departments = 1  # Only their department
-            
-            # Calculate new hires this month in their department
-            current_month = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            new_hires_this_month = dept_employees.filter(
-                created_at__gte=current_month
-            ).count()
+        # Calculate statistics based on user role (one query per scope)
+        stats = EmployeeStatistics.for_user(custom_user)
+        if stats is not None:
+            # Super Admin gets full statistics, a manager those of their department
+            total_employees = stats['total_employees']
+            active_employees = stats['active_employees']
+            managers_count = stats['managers_count']
+            total_departments = stats['total_departments']
+            new_hires_this_month = stats['new_hires_this_month']
             
         else:
             # Regular employee gets minimal statistics
@@ -134,9 +139,14 @@ def home_page(request):
         # Calculate average employees per department
         avg_employees_per_dept = round(total_employees / total_departments, 1) if total_departments > 0 else 0
         
-        # Pagination
-        paginator = Paginator(emp_details, 10)
-        page_obj = paginator.get_page(page_number)
+        # Pagination; ranked search results keep numbered pages since
+        # their order has no seekable key
+        if use_cursor_pagination(request) and not ranked_search:
+            paginator = KeysetPaginator(emp_details, 10, ordering=('-created_at', 'id'))
+            page_obj = paginator.get_page(request.GET.get('cursor'))
+        else:
+            paginator = Paginator(emp_details, 10)
+            page_obj = paginator.get_page(page_number)
         
         # Get user's full name for display
         user_full_name = custom_user.full_name or request.user.username
@@ -462,16 +472,18 @@ def add_employee(request):
 @login_required
 def manage_departments(request):
     """View to manage departments"""
-    departments = Department.objects.all().order_by('name')
+    departments = Department.objects.select_related('manager__user').order_by('name')
     
-    total_departments = departments.count()
-    active_departments = departments.filter(is_active=True).count()
-    departments_with_managers = departments.exclude(manager__isnull=True).count()
-    
-
-    total_employees = 0
-    for dept in departments:
-        total_employees += dept.employee_count
+    totals = departments.aggregate(
+        total_departments=Count('id'),
+        active_departments=Count('id', filter=Q(is_active=True)),
+        departments_with_managers=Count('id', filter=Q(manager__isnull=False)),
+        total_employees=Coalesce(Sum('employee_count'), 0),
+    )
+    total_departments = totals['total_departments']
+    active_departments = totals['active_departments']
+    departments_with_managers = totals['departments_with_managers']
+    total_employees = totals['total_employees']
     
     
     managers = CustomUser.objects.filter(
@@ -740,7 +752,7 @@ def my_profile(request):
 @login_required
 def attendance_dashboard(request):
     """Attendance dashboard for managers"""
-    if not request.user.custom_user_profile.is_department_manager:
+    if not request.employee_access.is_department_manager:
         messages.error(request, "Only managers can access attendance dashboard")
         return redirect('emp:home_page')
     
@@ -758,23 +770,24 @@ def attendance_dashboard(request):
         selected_date = timezone.now().date()
     
     # Get department employees
-    employees = CustomUser.objects.filter(department=department, is_active=True)
+    employees = CustomUser.objects.filter(department=department, is_active=True).select_related('user')
     
     # Get attendance for selected date
-    today_attendance = Attendance.objects.filter(
-        date=selected_date,
-        employee__department=department
+    today_attendance = Attendance.objects.for_department(department).filter(
+        date=selected_date
     ).select_related('employee')
     
-    # Calculate statistics
-    present_today = today_attendance.filter(status='present').count()
-    absent_today = employees.count() - present_today
-    late_today = today_attendance.filter(status='late').count()
+    # Calculate statistics from the day's department rollup
+    day_rollup = rollups.day_summary(department, selected_date)
+    employee_count = employees.count()
+    present_today = day_rollup.present_count
+    absent_today = employee_count - present_today
+    late_today = day_rollup.late_count
     
     # Calculate percentages
-    if employees.count() > 0:
-        present_percentage = round((present_today / employees.count()) * 100, 1)
-        absent_percentage = round((absent_today / employees.count()) * 100, 1)
+    if employee_count > 0:
+        present_percentage = round((present_today / employee_count) * 100, 1)
+        absent_percentage = round((absent_today / employee_count) * 100, 1)
     else:
         present_percentage = 0
         absent_percentage = 0
@@ -795,9 +808,10 @@ def attendance_dashboard(request):
     return render(request, 'emp/attendence_dashboard.html', context)
 
 @login_required
+@session_cached_access
 def mark_attendance(request):
     """Mark attendance for employees"""
-    if not request.user.custom_user_profile.is_department_manager:
+    if not request.employee_access.is_department_manager:
         return JsonResponse({'success': False, 'error': 'Permission denied'})
     
     if request.method == 'POST':
@@ -813,20 +827,21 @@ def mark_attendance(request):
             employee = CustomUser.objects.get(id=employee_id)
             attendance_date = timezone.datetime.strptime(date_str, '%Y-%m-%d').date()
             
-            if employee.department != request.user.custom_user_profile.department:
+            if employee.department_id != request.employee_access.department_id:
                 return JsonResponse({'success': False, 'error': 'Cannot mark attendance for employees in other departments'})
             
-            attendance, created = Attendance.objects.update_or_create(
-                employee=employee,
-                date=attendance_date,
-                defaults={
-                    'status': status,
-                    'check_in': check_in,
-                    'check_out': check_out,
-                    'notes': notes,
-                    'marked_by': request.user
-                }
-            )
+            with single_writer():
+                attendance, created = Attendance.objects.update_or_create(
+                    employee=employee,
+                    date=attendance_date,
+                    defaults={
+                        'status': status,
+                        'check_in': check_in,
+                        'check_out': check_out,
+                        'notes': notes,
+                        'marked_by': request.user
+                    }
+                )
             
             return JsonResponse({
                 'success': True,
@@ -844,7 +859,7 @@ def mark_attendance(request):
 @login_required
 def bulk_mark_attendance(request):
     """Bulk mark attendance for multiple employees"""
-    if not request.user.custom_user_profile.is_department_manager:
+    if not request.employee_access.is_department_manager:
         messages.error(request, "Permission denied")
         return redirect('emp:attendance_dashboard')
     
@@ -853,29 +868,42 @@ def bulk_mark_attendance(request):
         status = request.POST.get('status')
         employee_ids = request.POST.getlist('employees')
         
+        wants_json = request.headers.get('x-requested-with') == 'XMLHttpRequest'
+        
         try:
             attendance_date = timezone.datetime.strptime(date_str, '%Y-%m-%d').date()
-            marked_count = 0
+            if status not in dict(Attendance.ATTENDANCE_STATUS):
+                raise ValueError(f'Invalid status: {status}')
             
-            for emp_id in employee_ids:
-                employee = CustomUser.objects.get(id=emp_id)
-                
-                if employee.department != request.user.custom_user_profile.department:
-                    continue
-                
-                Attendance.objects.update_or_create(
-                    employee=employee,
-                    date=attendance_date,
-                    defaults={
-                        'status': status,
-                        'marked_by': request.user
-                    }
-                )
-                marked_count += 1
+            # One lookup, one upsert, one transaction for the whole selection
+            results = attendance_service.bulk_mark_attendance(
+                request.user.custom_user_profile,
+                attendance_date,
+                status,
+                employee_ids,
+                marked_by=request.user,
+            )
+            marked_count = sum(
+                1 for outcome in results.values()
+                if outcome in (attendance_service.CREATED, attendance_service.UPDATED)
+            )
+            skipped_count = len(results) - marked_count
+            
+            if wants_json:
+                return JsonResponse({
+                    'success': True,
+                    'marked_count': marked_count,
+                    'skipped_count': skipped_count,
+                    'results': results,
+                })
             
             messages.success(request, f'Attendance marked for {marked_count} employees')
+            if skipped_count:
+                messages.warning(request, f'Skipped {skipped_count} employees outside your department or not found')
             
         except Exception as e:
+            if wants_json:
+                return JsonResponse({'success': False, 'error': str(e)})
             messages.error(request, f'Error: {str(e)}')
     
     return redirect('emp:attendance_dashboard')
@@ -886,9 +914,10 @@ import calendar
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 
 @login_required
+@replica_reads
 def attendance_report(request, employee_id=None):
     """Generate attendance reports"""
-    if not request.user.custom_user_profile.is_department_manager:
+    if not request.employee_access.is_department_manager:
         messages.error(request, "Only managers can view reports")
         return redirect('emp:home_page')
     
@@ -927,17 +956,15 @@ def attendance_report(request, employee_id=None):
     departments = Department.objects.filter(id=department.id)
     
     # Base queryset for attendances
-    attendances_qs = Attendance.objects.filter(
-        employee__department=department,
-        date__gte=start_date,
-        date__lte=end_date
+    attendances_qs = Attendance.objects.for_department(department).between(
+        start_date, end_date
     ).select_related('employee', 'employee__department', 'employee__user')
     
     # Apply department filter
     if selected_department_id:
         try:
             selected_department = Department.objects.get(id=selected_department_id)
-            attendances_qs = attendances_qs.filter(employee__department=selected_department)
+            attendances_qs = attendances_qs.for_department(selected_department)
         except Department.DoesNotExist:
             selected_department = None
     else:
@@ -960,64 +987,53 @@ def attendance_report(request, employee_id=None):
     # Order by date (newest first)
     attendances_qs = attendances_qs.order_by('-date')
     
-    # Get all employees in department for dropdown
-    all_employees = CustomUser.objects.filter(department=department, is_active=True)
-    
-    # Calculate statistics
-    total_employees = CustomUser.objects.filter(department=department).count()
-    active_employees = CustomUser.objects.filter(department=department, is_active=True).count()
-    inactive_employees = total_employees - active_employees
-    
-    # Get attendance counts
-    present_count = attendances_qs.filter(status='present').count()
-    absent_count = attendances_qs.filter(status='absent').count()
-    leave_count = attendances_qs.filter(status='leave').count()
-    half_day_count = attendances_qs.filter(status='half_day').count()
-    holiday_count = attendances_qs.filter(status='holiday').count()
-    weekend_count = attendances_qs.filter(status='weekend').count()
-    
-    # For "late" count, check if you have a 'late' status or calculate based on check-in time
-    # Since your model doesn't have 'late' status, you might need to calculate it differently
-    late_count = 0  # You'll need to implement this based on your business logic
+    # CSV / JSON lines download of every matching row, streamed in chunks
+    export_format = requested_format(request)
+    if export_format:
+        # Streamed after the view returns, so bind the replica it reads now
+        rows = bind_to_current_db(attendances_qs).order_by('-date', 'id').values_list(
+            'date', 'employee__user__username', 'employee__user__first_name',
+            'employee__user__last_name', 'department__name', 'status', 'check_in',
+            'check_out', 'total_hours', 'notes', 'marked_by__username',
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        return stream_export(
+            export_format,
+            f'attendance-{start_date}-{end_date}',
+            ('date', 'username', 'first_name', 'last_name', 'department', 'status',
+             'check_in', 'check_out', 'total_hours', 'notes', 'marked_by'),
+            rows,
+        )
     
-    # Calculate percentages
-    total_days_in_range = (end_date - start_date).days + 1
-    total_employee_days = total_days_in_range * active_employees if active_employees > 0 else 1
+    # Get all employees in department for dropdown
+    all_employees = CustomUser.objects.filter(department=department, is_active=True).select_related('user')
     
-    present_percentage = round((present_count / total_employee_days) * 100, 2) if total_employee_days > 0 else 0
-    absent_percentage = round((absent_count / total_employee_days) * 100, 2) if total_employee_days > 0 else 0
-    late_percentage = round((late_count / total_employee_days) * 100, 2) if total_employee_days > 0 else 0
+    # Status, late arrival and employee counts in one query
+    summary = AttendanceSummary.for_queryset(attendances_qs, department, start_date, end_date)
     
     # Prepare pagination
-    paginator = Paginator(attendances_qs, 50)
-    page_number = request.GET.get('page')
-    
-    try:
-        page_obj = paginator.page(page_number)
-    except PageNotAnInteger:
-        page_obj = paginator.page(1)
-    except EmptyPage:
-        page_obj = paginator.page(paginator.num_pages)
+    if use_cursor_pagination(request):
+        paginator = KeysetPaginator(
+            attendances_qs, 50, ordering=('-date', 'id'), total=summary['total_records']
+        )
+        page_obj = paginator.get_page(request.GET.get('cursor'))
+    else:
+        paginator = Paginator(attendances_qs, 50)
+        # The summary already counted the rows
+        paginator.count = summary['total_records']
+        page_number = request.GET.get('page')
+        
+        try:
+            page_obj = paginator.page(page_number)
+        except PageNotAnInteger:
+            page_obj = paginator.page(1)
+        except EmptyPage:
+            page_obj = paginator.page(paginator.num_pages)
     
     # Prepare context
     context = {
         'attendances': page_obj,
         'page_obj': page_obj,
-        'summary': {
-            'total_employees': total_employees,
-            'active_employees': active_employees,
-            'inactive_employees': inactive_employees,
-            'present_count': present_count,
-            'absent_count': absent_count,
-            'late_count': late_count,
-            'leave_count': leave_count,
-            'half_day_count': half_day_count,
-            'holiday_count': holiday_count,
-            'weekend_count': weekend_count,
-            'present_percentage': present_percentage,
-            'absent_percentage': absent_percentage,
-            'late_percentage': late_percentage,
-        },
+        'summary': summary,
         'departments': departments,
         'all_employees': all_employees,
         'selected_department': selected_department_id,
@@ -1035,7 +1051,7 @@ def attendance_report(request, employee_id=None):
 @login_required
 def manage_leave_requests(request):
     """Manage leave requests (approve/reject)"""
-    if not request.user.custom_user_profile.is_department_manager:
+    if not request.employee_access.is_department_manager:
         messages.error(request, "Only managers can manage leave requests")
         return redirect('emp:home_page')
     
@@ -1047,41 +1063,28 @@ def manage_leave_requests(request):
     ).select_related('employee').order_by('-created_at')
     
     if request.method == 'POST':
-        leave_id = request.POST.get('leave_id')
+        # One or many leave requests per POST
+        leave_ids = request.POST.getlist('leave_ids') or request.POST.getlist('leave_id')
         action = request.POST.get('action') 
         notes = request.POST.get('notes', '')
         
         try:
-            leave_request = LeaveRequest.objects.get(id=leave_id)
+            # Only leave requests of the manager's own department
+            selected = leave_requests.filter(id__in=leave_ids).select_related('employee__user')
+            reviewed = attendance_service.review_leave_requests(
+                selected, action, request.user, notes=notes, request=request
+            )
             
-            if action == 'approve':
-                leave_request.status = 'approved'
-                # Mark attendance as leave for the period
-                current_date = leave_request.start_date
-                while current_date <= leave_request.end_date:
-                    Attendance.objects.update_or_create(
-                        employee=leave_request.employee,
-                        date=current_date,
-                        defaults={
-                            'status': 'leave',
-                            'notes': f'Approved {leave_request.get_leave_type_display()}',
-                            'marked_by': request.user
-                        }
-                    )
-                    current_date += timedelta(days=1)
-                
-                messages.success(request, f"Leave request approved for {leave_request.employee.user.get_full_name()}")
+            if not reviewed:
+                messages.error(request, "Leave request not found")
             else:
-                leave_request.status = 'rejected'
-                messages.success(request, f"Leave request rejected for {leave_request.employee.user.get_full_name()}")
-            
-            leave_request.reviewed_by = request.user
-            leave_request.reviewed_at = timezone.now()
-            leave_request.response_notes = notes
-            leave_request.save()
-            
-        except LeaveRequest.DoesNotExist:
+                verb = 'approved' if action == 'approve' else 'rejected'
+                for leave_request in reviewed:
+                    messages.success(request, f"Leave request {verb} for {leave_request.employee.user.get_full_name()}")
+        except (ValueError, TypeError):
             messages.error(request, "Leave request not found")
+        
+        return redirect('emp:manage_leaves')
     
     context = {
         'leave_requests': leave_requests,
@@ -1096,7 +1099,7 @@ from emp.models import CustomUser, Department, Attendance, AttendanceSettings ,L
 @login_required
 def attendance_settings(request):
     """Configure attendance settings for department"""
-    if not request.user.custom_user_profile.is_department_manager:
+    if not request.employee_access.is_department_manager:
         messages.error(request, "Only managers can configure settings")
         return redirect('emp:home_page')
     
@@ -1147,15 +1150,16 @@ def attendance_settings(request):
 #Apis
 
 @login_required
+@session_cached_access
 def get_employee_attendance(request, employee_id):
     """API endpoint to get employee attendance data"""
-    if not request.user.custom_user_profile.is_department_manager:
+    if not request.employee_access.is_department_manager:
         return JsonResponse({'success': False, 'error': 'Permission denied'})
     
     try:
         employee = CustomUser.objects.get(id=employee_id)
         
-        if employee.department != request.user.custom_user_profile.department:
+        if employee.department_id != request.employee_access.department_id:
             return JsonResponse({'success': False, 'error': 'Cannot access employee from other department'})
         
         date_str = request.GET.get('date', timezone.now().date().isoformat())
@@ -1193,9 +1197,10 @@ def get_employee_attendance(request, employee_id):
         return JsonResponse({'success': False, 'error': str(e)})
 
 @login_required
+@replica_reads
 def monthly_attendance_summary(request):
     """API endpoint to get monthly attendance summary"""
-    if not request.user.custom_user_profile.is_department_manager:
+    if not request.employee_access.is_department_manager:
         return JsonResponse({'success': False, 'error': 'Permission denied'})
     
     try:
@@ -1205,25 +1210,18 @@ def monthly_attendance_summary(request):
         month = request.GET.get('month', timezone.now().month)
         year = request.GET.get('year', timezone.now().year)
         
-        # Get attendance for the month
-        attendances = Attendance.objects.filter(
-            employee__department=department,
-            date__year=year,
-            date__month=month
-        )
-        
-        # Calculate summary
+        # Sum the month's daily department rollups
+        totals = rollups.month_summary(department, int(year), int(month))
         employees = CustomUser.objects.filter(department=department, is_active=True)
-        total_days = attendances.count()
         
         summary = {
             'total_employees': employees.count(),
-            'total_days': total_days,
-            'present': attendances.filter(status='present').count(),
-            'absent': attendances.filter(status='absent').count(),
-            'late': attendances.filter(status='late').count(),
-            'leave': attendances.filter(status='leave').count(),
-            'half_day': attendances.filter(status='half_day').count(),
+            'total_days': totals['record_count'],
+            'present': totals['present_count'],
+            'absent': totals['absent_count'],
+            'late': totals['late_count'],
+            'leave': totals['leave_count'],
+            'half_day': totals['half_day_count'],
         }
         
         return JsonResponse({
@@ -1240,7 +1238,7 @@ def monthly_attendance_summary(request):
 @login_required
 def get_daily_attendance(request):
     """Get attendance for a specific date"""
-    if not request.user.custom_user_profile.is_department_manager:
+    if not request.employee_access.is_department_manager:
         return JsonResponse({'success': False, 'error': 'Permission denied'})
     
     try:
@@ -1251,11 +1249,31 @@ def get_daily_attendance(request):
         department = manager.department
         
         
-        employees = CustomUser.objects.filter(department=department, is_active=True)
+        employees = CustomUser.objects.filter(department=department, is_active=True).select_related('user')
+        
+        export_format = requested_format(request)
+        if export_format:
+            # One streamed query: every employee joined to their row for the day
+            rows = (
+                bind_to_current_db(employees).annotate(day=FilteredRelation('attendances', condition=Q(attendances__date=date)))
+                .order_by('user__username')
+                .values_list(
+                    'id', 'user__username', 'user__first_name', 'user__last_name',
+                    Coalesce('day__status', Value('absent')), 'day__check_in',
+                    'day__check_out', 'day__total_hours', 'day__notes',
+                )
+                .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+            )
+            return stream_export(
+                export_format,
+                f'attendance-{date_str}',
+                ('employee_id', 'username', 'first_name', 'last_name', 'status',
+                 'check_in', 'check_out', 'total_hours', 'notes'),
+                rows,
+            )
         
         # Get attendance for the date
-        attendance_data = Attendance.objects.filter(
-            employee__department=department,
+        attendance_data = Attendance.objects.for_department(department).filter(
             date=date
         ).select_related('employee')
         
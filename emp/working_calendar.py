@@ -0,0 +1,142 @@
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+
+from utils import metrics
+from utils.generations import Generation
+
+
+DEFAULT_WEEKDAYS = frozenset({1, 2, 3, 4, 5})
+
+
+class WorkingCalendar:
+    """
+    Working days of one department, compiled from its AttendanceSettings:
+    the working ISO weekdays as a 7-bit mask and the holidays that fall on
+    them as a sorted tuple.
+
+    is_working_day() is O(1); working_days_between() counts whole weeks
+    arithmetically and subtracts holidays found by bisection, O(log n) in
+    the number of holidays.
+
+    Compiled calendars are cached in process. The cache is checked against
+    a shared generation (utils.generations), which is itself read from disk
+    at most once per CACHE_GENERATIONS['CHECK_INTERVAL'], so a lookup costs
+    neither a query nor a cache round trip.
+    """
+
+    GENERATION = Generation('working-calendar')
+
+    _cache = {}
+    _lock = threading.Lock()
+
+    def __init__(self, weekdays=DEFAULT_WEEKDAYS, holidays=()):
+        self.weekday_mask = 0
+        for weekday in weekdays:
+            self.weekday_mask |= 1 << (weekday - 1)
+        self.weekdays_per_week = bin(self.weekday_mask).count('1')
+        self.holiday_set = frozenset(holidays)
+        # Only holidays on working weekdays change any count
+        self.holidays = tuple(sorted(day for day in self.holiday_set if self._is_working_weekday(day)))
+
+    @classmethod
+    def from_settings(cls, attendance_settings):
+        if attendance_settings is None:
+            return cls()
+        return cls(attendance_settings.working_weekdays, attendance_settings.holiday_dates)
+
+    # -- lookups -----------------------------------------------------------
+
+    def _is_working_weekday(self, day):
+        return bool(self.weekday_mask >> (day.isoweekday() - 1) & 1)
+
+    def is_working_day(self, day):
+        return self._is_working_weekday(day) and day not in self.holiday_set
+
+    def _weekdays_between(self, start_date, end_date):
+        days = (end_date - start_date).days + 1
+        weeks, remainder = divmod(days, 7)
+        count = weeks * self.weekdays_per_week
+        first = start_date.isoweekday() - 1
+        for offset in range(remainder):
+            count += self.weekday_mask >> ((first + offset) % 7) & 1
+        return count
+
+    def working_days_between(self, start_date, end_date):
+        """Number of working days from start_date to end_date, both included"""
+        if end_date < start_date:
+            return 0
+        holidays = bisect_right(self.holidays, end_date) - bisect_left(self.holidays, start_date)
+        return self._weekdays_between(start_date, end_date) - holidays
+
+    def working_dates(self, start_date, end_date):
+        """The working days from start_date to end_date, in order"""
+        dates = []
+        day = start_date
+        while day <= end_date:
+            if self.is_working_day(day):
+                dates.append(day)
+            day += timedelta(days=1)
+        return dates
+
+    # -- per-department cache ----------------------------------------------
+
+    @classmethod
+    def _generation(cls):
+        return cls.GENERATION.get()
+
+    @classmethod
+    def for_department(cls, department_id):
+        """The department's compiled calendar, built once per process and
+        settings generation"""
+        from .models import AttendanceSettings
+
+        generation = cls._generation()
+        cached = cls._cache.get(department_id)
+        if cached is not None and cached[0] == generation:
+            metrics.CACHE_REQUESTS.inc('working_calendar', 'hit')
+            return cached[1]
+        metrics.CACHE_REQUESTS.inc('working_calendar', 'miss')
+        attendance_settings = AttendanceSettings.objects.filter(department_id=department_id).first()
+        calendar = cls.from_settings(attendance_settings)
+        with cls._lock:
+            cls._cache[department_id] = (generation, calendar)
+        return calendar
+
+    @classmethod
+    def for_departments(cls, department_ids):
+        """{department_id: calendar}, loading every uncached one in one query"""
+        from .models import AttendanceSettings
+
+        generation = cls._generation()
+        calendars, missing = {}, set()
+        for department_id in department_ids:
+            cached = cls._cache.get(department_id)
+            if cached is not None and cached[0] == generation:
+                calendars[department_id] = cached[1]
+            else:
+                missing.add(department_id)
+        metrics.CACHE_REQUESTS.inc('working_calendar', 'hit', amount=len(calendars))
+        metrics.CACHE_REQUESTS.inc('working_calendar', 'miss', amount=len(missing))
+        if missing:
+            loaded = {
+                attendance_settings.department_id: attendance_settings
+                for attendance_settings in AttendanceSettings.objects.filter(department_id__in=missing)
+            }
+            with cls._lock:
+                for department_id in missing:
+                    calendar = cls.from_settings(loaded.get(department_id))
+                    cls._cache[department_id] = (generation, calendar)
+                    calendars[department_id] = calendar
+        return calendars
+
+    @classmethod
+    def invalidate(cls):
+        """
+        Drop the compiled calendars of this process and bump the shared
+        generation. Other processes rebuild theirs on the first lookup after
+        they next read the generation, at most CHECK_INTERVAL seconds later.
+        """
+        with cls._lock:
+            cls._cache.clear()
+        cls.GENERATION.bump()
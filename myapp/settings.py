@@ -43,14 +43,20 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # outermost, so the per-request write counter also sees the session save
+    'utils.logging_middleware.LoggingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    # Django's, except that the metrics endpoint never saves the session
+    'utils.session_middleware.SessionMiddleware',
+    'utils.db_routing.ReplicaRoutingMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'emp.middleware.EmployeeAccessMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'utils.logging_middleware.LoggingMiddleware'
+    # innermost, so the samples cover the view and little else
+    'utils.profiling_middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'myapp.urls'
@@ -96,11 +102,75 @@ WSGI_APPLICATION = 'myapp.wsgi.application'
 #     }
 # }
 
+# SQLite production profile: WAL lets readers run alongside the single
+# writer, synchronous=NORMAL is durable in WAL mode up to the last
+# checkpoint, and busy_timeout waits for the write lock instead of
+# failing. Transactions stay DEFERRED, so read-only ones never wait for the
+# writer; the write paths wrapped in utils.db_writer.single_writer begin
+# IMMEDIATE, so a transaction that read first cannot fail upgrading to a
+# write.
+# `manage.py benchmark_sqlite_locks` compares it with the plain defaults.
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-20000',      # KiB, i.e. ~20 MB of page cache
+    'PRAGMA mmap_size=134217728',    # 128 MB
+    'PRAGMA busy_timeout=5000',      # ms
+    'PRAGMA temp_store=MEMORY',
+]
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': '; '.join(SQLITE_PRAGMAS),
+        },
+    },
+    # Read replica for the reports, the log dashboard and the admin
+    # changelists (utils.db_routing). Locally it is a SQLite snapshot of
+    # the primary (`manage.py snapshot_replica --interval 30`); reads stay
+    # on the primary until the file exists. Connections are not kept, so
+    # each request opens the latest snapshot.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db-replica.sqlite3',
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {
+            'init_command': 'PRAGMA query_only=ON',
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
+}
+
+DATABASE_ROUTERS = ['utils.db_routing.PrimaryReplicaRouter']
+
+# after a write, a session reads from the primary for PIN_SECONDS; keep it
+# above the snapshot (or replication) lag
+DATABASE_REPLICA = {
+    'ALIAS': 'replica',
+    'PIN_SECONDS': 60,
+}
+
+# The permission, statistics and working calendar caches are kept per
+# process (the default LocMemCache and in-memory dicts) and invalidated
+# through generation counters (utils.generations) stored in small files
+# here, so a change made in one worker reaches the others within
+# CHECK_INTERVAL seconds without a database round trip. All workers of a
+# host must share DIRECTORY.
+CACHE_GENERATIONS = {
+    'DIRECTORY': BASE_DIR / 'cache_generations',
+    'CHECK_INTERVAL': 1.0,
+}
+
+# serialize SQLite write transactions (log flushes, attendance marking)
+# across threads and worker processes with a lock file (utils.db_writer)
+SQLITE_SINGLE_WRITER = {
+    'ENABLED': False,
 }
 
 
@@ -161,4 +231,86 @@ SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 
 #Security settings
 CSRF_COOKIE_SECURE =False
-SESSION_COOKIE_SECURE =False
\ No newline at end of file
+SESSION_COOKIE_SECURE =False
+
+# log writer (utils.log_writer)
+# 'buffered' queues log rows in-process and bulk inserts them from a
+# background thread; set MODE to 'sync' to write each row inside the request
+LOG_WRITER = {
+    'MODE': 'buffered',
+    'BATCH_SIZE': 200,           # flush as soon as this many rows are waiting
+    'FLUSH_INTERVAL': 2.0,       # ...or after this many seconds
+    'MAX_QUEUE_SIZE': 10000,
+    'OVERFLOW_POLICY': 'sync',   # 'sync', 'block', 'drop_newest' or 'drop_oldest'
+}
+
+# models whose saves/deletes are recorded by utils.signals; changes made
+# during a request are folded into that request's single ActivityLog row
+LOG_MODEL_CHANGES = [
+    'auth.User',
+    'emp.CustomUser',
+    'emp.Department',
+    'emp.Attendance',
+    'emp.LeaveRequest',
+    'emp.AttendanceSettings',
+]
+
+# per-request instrumentation (utils.instrumentation): SQL and template
+# time and repeated statements go into the request's additional_data and a
+# Server-Timing header (True, 'staff' or False)
+LOG_INSTRUMENTATION = {
+    'SERVER_TIMING': 'staff',
+    'TEMPLATE_TIMING': True,
+    'DUPLICATE_QUERY_THRESHOLD': 5,
+}
+
+# sampling profiler (utils.profiler), results on the admin profiler page;
+# staff can profile a request with the X-Profile header or ?_profile=1
+PROFILER = {
+    'ENABLED': DEBUG,      # development only unless turned on explicitly
+    'SAMPLE_RATE': 0.0,    # fraction of all requests profiled
+    'INTERVAL': 0.005,     # seconds between stack samples
+}
+
+# Prometheus metrics at /metrics (utils.metrics); with several worker
+# processes point DIRECTORY at a directory they share so a scrape of any
+# of them reports the totals of all
+METRICS = {
+    'DIRECTORY': None,
+    'FLUSH_INTERVAL': 5.0,
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],  # empty allows any client
+}
+
+# log retention (utils.log_archive, `manage.py archive_logs`)
+# rows older than HOT_DAYS are moved to monthly archive tables ('table'),
+# gzipped JSONL files under LOG_ARCHIVE_DIR ('file'), or dropped ('delete')
+LOG_RETENTION = {
+    'ActivityLog': {'HOT_DAYS': 90, 'ARCHIVE': 'table'},
+    'AuditLog': {'HOT_DAYS': 365, 'ARCHIVE': 'table'},
+    'SystemLog': {'HOT_DAYS': 30, 'ARCHIVE': 'file'},
+    'LoginLog': {'HOT_DAYS': 90, 'ARCHIVE': 'table'},
+}
+LOG_ARCHIVE_DIR = BASE_DIR / 'log_archive'
+
+# log dashboard rollups (utils.rollups, `manage.py rollup_logs`)
+LOG_ROLLUPS = {
+    'INCREMENTAL': True,   # update rollups as the log writer flushes rows
+    'HOURLY_DAYS': 30,     # hourly rollups kept by `rollup_logs --prune`
+}
+
+# seconds the home page statistics cards are cached per role/department
+# (emp.statistics); 0 computes them on every request
+EMPLOYEE_STATS_CACHE_TIMEOUT = 30
+
+# employee list and attendance report pagination (emp.pagination)
+# MODE 'cursor' pages by (-created_at, id) / (-date, id) keys instead of
+# OFFSET; COUNT 'estimate' stops counting at COUNT_CAP rows ('exact', 'none')
+EMP_PAGINATION = {
+    'MODE': 'cursor',
+    'COUNT': 'estimate',
+    'COUNT_CAP': 1000,
+}
+
+# seconds a session-cached emp.access.EmployeeAccess is trusted by views
+# marked @session_cached_access (role/department changes expire it sooner)
+EMP_ACCESS_SESSION_CACHE_TTL = 300
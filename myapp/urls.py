@@ -16,10 +16,16 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from . import views,views_api
+from utils.admin import LogDashboardView, ProfilerView
+from utils.views import metrics_view
 from django.conf import settings
 from django.conf.urls.static import static
 urlpatterns = [
+    # Log dashboard and profiler pages on the default admin site
+    path('admin/logs-dashboard/', admin.site.admin_view(LogDashboardView.as_view()), name='logs-dashboard'),
+    path('admin/profiler/', admin.site.admin_view(ProfilerView.as_view()), name='profiler'),
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path("",include('emp.urls')),
     
     #api paths
@@ -5,11 +5,12 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.utils import timezone
 from .models import ActivityLog, AuditLog, SystemLog, LoginLog
-from django.db.models import Count
+from .rollups import count_for_day, totals_by_value
+from .db_routing import ReplicaChangelistMixin, replica_reads
 import json
 
 # Common admin configuration
-class BaseLogAdmin(admin.ModelAdmin):
+class BaseLogAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     list_per_page = 50
     date_hierarchy = 'created_at'
     readonly_fields = ['created_at']
@@ -37,6 +38,7 @@ class ActivityLogAdmin(BaseLogAdmin):
         'module_display', 'action_short', 'status_display', 
         'ip_address', 'created_at_display'
     ]
+    list_select_related = ['user']
     list_filter = [
         'log_type', 'module', 'status', 'created_at', 'user'
     ]
@@ -136,6 +138,7 @@ class AuditLogAdmin(BaseLogAdmin):
         'id_short', 'user_display', 'action_display', 
         'model_name', 'object_repr_short', 'created_at_display'
     ]
+    list_select_related = ['user']
     list_filter = [
         'action', 'model_name', 'created_at', 'user'
     ]
@@ -291,6 +294,7 @@ class LoginLogAdmin(BaseLogAdmin):
         'id_short', 'username', 'user_display', 
         'status_display', 'ip_address', 'created_at_display'
     ]
+    list_select_related = ['user']
     list_filter = [
         'status', 'created_at', 'user'
     ]
@@ -349,11 +353,16 @@ from django.shortcuts import render
 from django.utils.decorators import method_decorator
 from django.views.generic import TemplateView
 from django.urls import path
+from django.contrib import messages
+from django.http import Http404, HttpResponse
+from django.shortcuts import redirect
+from . import profiler
 
 class LogDashboardView(TemplateView):
     template_name = 'admin/logs_dashboard.html'
     
     @method_decorator(staff_member_required)
+    @method_decorator(replica_reads)
     def dispatch(self, *args, **kwargs):
         return super().dispatch(*args, **kwargs)
     
@@ -361,40 +370,68 @@ class LogDashboardView(TemplateView):
         context = super().get_context_data(**kwargs)
         
         # Get recent logs
-        context['recent_activities'] = ActivityLog.objects.all()[:10]
+        context['recent_activities'] = ActivityLog.objects.select_related('user')[:10]
         context['recent_audits'] = AuditLog.objects.all()[:10]
         context['recent_system_logs'] = SystemLog.objects.filter(level__in=['ERROR', 'WARNING'])[:10]
         context['recent_login_attempts'] = LoginLog.objects.all()[:10]
         
-        # Get statistics
-        context['activity_stats'] = ActivityLog.objects.values('log_type').annotate(
-            count=Count('id')
-        ).order_by('-count')
-        
-        context['login_stats'] = LoginLog.objects.values('status').annotate(
-            count=Count('id')
-        ).order_by('-count')
-        
-        context['system_log_stats'] = SystemLog.objects.values('level').annotate(
-            count=Count('id')
-        ).order_by('-count')
+        # Statistics come from the pre-aggregated rollups (utils.rollups),
+        # never from group-bys over the raw log tables
+        context['activity_stats'] = totals_by_value('ActivityLog', 'log_type')
+        context['login_stats'] = totals_by_value('LoginLog', 'status')
+        context['system_log_stats'] = totals_by_value('SystemLog', 'level')
         
         # Today's stats
-        today = timezone.now().date()
-        context['today_activities'] = ActivityLog.objects.filter(
-            created_at__date=today
-        ).count()
-        
-        context['today_logins'] = LoginLog.objects.filter(
-            created_at__date=today, status='success'
-        ).count()
-        
-        context['today_errors'] = SystemLog.objects.filter(
-            created_at__date=today, level='ERROR'
-        ).count()
+        today = timezone.localdate()
+        context['today_activities'] = count_for_day(today, 'ActivityLog', 'log_type')
+        context['today_logins'] = count_for_day(today, 'LoginLog', 'status', 'success')
+        context['today_errors'] = count_for_day(today, 'SystemLog', 'level', 'ERROR')
         
         return context
 
+class ProfilerView(TemplateView):
+    """
+    Stacks sampled by utils.profiling_middleware, per view: the frames the
+    most samples were taken in, and the collapsed stacks as plain text
+    (?view=<name>&format=collapsed) for flamegraph.pl or speedscope.
+    """
+    template_name = 'admin/profiler.html'
+
+    @method_decorator(staff_member_required)
+    def dispatch(self, *args, **kwargs):
+        return super().dispatch(*args, **kwargs)
+
+    def get(self, request, *args, **kwargs):
+        if request.GET.get('format') == 'collapsed':
+            profile = profiler.get_profile(request.GET.get('view', ''))
+            if profile is None:
+                raise Http404("No samples for this view")
+            response = HttpResponse(profiler.collapsed_stacks(profile), content_type='text/plain; charset=utf-8')
+            response['Content-Disposition'] = f'attachment; filename="{profile["view"]}.collapsed.txt"'
+            return response
+        return super().get(request, *args, **kwargs)
+
+    def post(self, request, *args, **kwargs):
+        profiler.reset()
+        messages.success(request, "Profiles cleared")
+        return redirect(request.path)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        profiles = profiler.get_profiles()
+        selected = self.request.GET.get('view')
+        if profiles and not selected:
+            selected = profiles[0]['view']
+        context['profiles'] = profiles
+        context['selected'] = next((profile for profile in profiles if profile['view'] == selected), None)
+        if context['selected'] is not None:
+            context['top_frames'] = profiler.top_frames(context['selected'])
+        context['config'] = config = profiler.get_profiler_settings()
+        context['sample_percent'] = config['SAMPLE_RATE'] * 100
+        context['interval_ms'] = config['INTERVAL'] * 1000
+        context['title'] = "Profiler"
+        return context
+
 # Add custom admin site with dashboard
 class CustomAdminSite(admin.AdminSite):
     site_header = "Employee Management System - Admin"
@@ -405,6 +442,7 @@ class CustomAdminSite(admin.AdminSite):
         urls = super().get_urls()
         custom_urls = [
             path('logs-dashboard/', self.admin_view(LogDashboardView.as_view()), name='logs-dashboard'),
+            path('profiler/', self.admin_view(ProfilerView.as_view()), name='profiler'),
         ]
         return custom_urls + urls
     
@@ -423,164 +461,20 @@ class CustomAdminSite(admin.AdminSite):
                     'object_name': 'dashboard',
                     'admin_url': '/admin/logs-dashboard/',
                     'view_only': True,
-                }
+                },
+                {
+                    'name': 'Profiler',
+                    'object_name': 'profiler',
+                    'admin_url': '/admin/profiler/',
+                    'view_only': True,
+                },
             ],
         })
         
         return app_list
 
-# Create a templates folder in your app and add:
-# templates/admin/logs_dashboard.html
-"""
-{% extends "admin/base_site.html" %}
-{% load i18n static %}
-
-{% block extrastyle %}
-{{ block.super }}
-<style>
-.dashboard-card {
-    background: white;
-    border-radius: 8px;
-    padding: 20px;
-    margin-bottom: 20px;
-    box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-}
-.stats-grid {
-    display: grid;
-    grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-    gap: 20px;
-    margin-bottom: 30px;
-}
-.stat-card {
-    background: white;
-    border-radius: 8px;
-    padding: 20px;
-    text-align: center;
-    box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-}
-.stat-number {
-    font-size: 2.5rem;
-    font-weight: bold;
-    color: #4361ee;
-}
-.stat-label {
-    color: #666;
-    margin-top: 10px;
-}
-.log-table {
-    width: 100%;
-    border-collapse: collapse;
-    margin-top: 15px;
-}
-.log-table th, .log-table td {
-    padding: 10px;
-    text-align: left;
-    border-bottom: 1px solid #eee;
-}
-.log-table th {
-    background: #f8f9fa;
-    font-weight: 600;
-}
-</style>
-{% endblock %}
-
-{% block content %}
-<h1>{% trans "Logs Dashboard" %}</h1>
-
-<div class="stats-grid">
-    <div class="stat-card">
-        <div class="stat-number">{{ today_activities }}</div>
-        <div class="stat-label">Today's Activities</div>
-    </div>
-    <div class="stat-card">
-        <div class="stat-number">{{ today_logins }}</div>
-        <div class="stat-label">Today's Logins</div>
-    </div>
-    <div class="stat-card">
-        <div class="stat-number">{{ today_errors }}</div>
-        <div class="stat-label">Today's Errors</div>
-    </div>
-</div>
-
-<div class="dashboard-card">
-    <h2>Recent Activities</h2>
-    <table class="log-table">
-        <thead>
-            <tr>
-                <th>User</th>
-                <th>Type</th>
-                <th>Module</th>
-                <th>Action</th>
-                <th>Time</th>
-            </tr>
-        </thead>
-        <tbody>
-            {% for log in recent_activities %}
-            <tr>
-                <td>{{ log.user_display|safe }}</td>
-                <td>{{ log.log_type_display|safe }}</td>
-                <td>{{ log.module_display }}</td>
-                <td>{{ log.action_short }}</td>
-                <td>{{ log.created_at|date:"H:i" }}</td>
-            </tr>
-            {% empty %}
-            <tr><td colspan="5">No recent activities</td></tr>
-            {% endfor %}
-        </tbody>
-    </table>
-</div>
-
-<div class="dashboard-card">
-    <h2>Recent System Errors/Warnings</h2>
-    <table class="log-table">
-        <thead>
-            <tr>
-                <th>Level</th>
-                <th>Source</th>
-                <th>Message</th>
-                <th>Time</th>
-            </tr>
-        </thead>
-        <tbody>
-            {% for log in recent_system_logs %}
-            <tr>
-                <td>{{ log.level_display|safe }}</td>
-                <td>{{ log.source }}</td>
-                <td>{{ log.message_short }}</td>
-                <td>{{ log.created_at|date:"H:i" }}</td>
-            </tr>
-            {% empty %}
-            <tr><td colspan="4">No recent system logs</td></tr>
-            {% endfor %}
-        </tbody>
-    </table>
-</div>
-
-<div class="dashboard-card">
-    <h2>Activity Statistics</h2>
-    <table class="log-table">
-        <thead>
-            <tr>
-                <th>Activity Type</th>
-                <th>Count</th>
-            </tr>
-        </thead>
-        <tbody>
-            {% for stat in activity_stats %}
-            <tr>
-                <td>{{ stat.log_type }}</td>
-                <td>{{ stat.count }}</td>
-            </tr>
-            {% empty %}
-            <tr><td colspan="2">No statistics available</td></tr>
-            {% endfor %}
-        </tbody>
-    </table>
-</div>
-{% endblock %}
-"""
-
-# To use the custom admin site, in your project's urls.py:
+# The dashboard and profiler pages are mounted on the default admin.site in
+# myapp/urls.py. To use the custom admin site instead, in your project's urls.py:
 # from django.contrib import admin
 # from your_app.admin import CustomAdminSite
 # 
@@ -8,3 +8,12 @@ class UtilsConfig(AppConfig):
         import sys
         if 'migrate' not in sys.argv and 'makemigrations' not in sys.argv:
             import utils.signals
+            
+            from utils.log_writer import register_write_hook
+            from utils.rollups import get_rollup_settings, record_log_rows
+            if get_rollup_settings()['INCREMENTAL']:
+                register_write_hook(record_log_rows)
+
+            from utils.instrumentation import get_instrumentation_settings, install_template_timing
+            if get_instrumentation_settings()['TEMPLATE_TIMING']:
+                install_template_timing()
@@ -0,0 +1,260 @@
+import contextvars
+import functools
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.dispatch import receiver
+
+
+DEFAULT_REPLICA_SETTINGS = {
+    # Database alias report reads go to; routing is off while it is not
+    # configured (or, for SQLite, while its file does not exist yet)
+    'ALIAS': 'replica',
+    # After a session writes, its reads stay on the primary this long, so
+    # users see their own changes until the replica has caught up
+    'PIN_SECONDS': 60,
+    # Apps whose inserts and updates do not pin the session: the session
+    # save itself, the log rows and rollups every request writes,
+    # DatabaseCache entries. Deletes from them still pin, so a superuser
+    # deleting log rows in the admin (where they are otherwise read-only)
+    # does not see them again on the replica's changelist
+    'UNPINNED_APPS': ['sessions', 'utils', 'django_cache'],
+}
+
+PIN_SESSION_KEY = '_db_primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Statements that change rows, and the table they change
+WRITE_STATEMENT = re.compile(
+    r'\s*(?P<verb>INSERT\s+(?:OR\s+\w+\s+)?INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM)\s+[`"]?(?P<table>\w+)',
+    re.IGNORECASE,
+)
+
+# DatabaseCache's table is never read from a snapshot: invalidation
+# generations stored there must be current
+PRIMARY_ONLY_APPS = ('django_cache',)
+
+
+def get_replica_settings():
+    """Merge DATABASE_REPLICA from settings over the defaults"""
+    config = dict(DEFAULT_REPLICA_SETTINGS)
+    config.update(getattr(settings, 'DATABASE_REPLICA', {}) or {})
+    return config
+
+
+class RoutingState:
+    """What the router needs to know about the request being handled"""
+
+    def __init__(self):
+        self.use_replica = False
+        self.wrote = False
+
+
+_state = contextvars.ContextVar('db_routing_state', default=None)
+
+
+def replica_alias():
+    """The replica alias if it can serve reads right now, else None"""
+    alias = get_replica_settings()['ALIAS']
+    if alias not in settings.DATABASES:
+        return None
+    connection = connections[alias]
+    if connection.vendor == 'sqlite' and not connection.is_in_memory_db():
+        if not os.path.exists(connection.settings_dict['NAME']):
+            return None
+    return alias
+
+
+class PrimaryReplicaRouter:
+    """
+    Writes always go to the primary ('default'). Reads go to the replica
+    only inside use_replica() (the report views, the log dashboard and the
+    admin changelists) and only while the session is not pinned to the
+    primary by a recent write. The cache table is always read from the
+    primary, and objects keep reading from the database they were loaded
+    from. ReplicaRoutingMiddleware pins the session after a write.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        state = _state.get()
+        if state is not None and state.use_replica and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            return replica_alias() or DEFAULT_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica is a copy of the primary, so any two objects may relate
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets the primary's schema with each snapshot
+        return db == DEFAULT_DB_ALIAS
+
+
+def is_pinned(request):
+    session = getattr(request, 'session', None)
+    return session is not None and session.get(PIN_SESSION_KEY, 0) > time.time()
+
+
+@contextmanager
+def use_replica():
+    """Send the reads made inside the block to the replica"""
+    state = _state.get()
+    if state is None:
+        state = RoutingState()
+        token = _state.set(state)
+    else:
+        token = None
+    previous, state.use_replica = state.use_replica, True
+    try:
+        yield
+    finally:
+        state.use_replica = previous
+        if token is not None:
+            _state.reset(token)
+
+
+def bind_to_current_db(queryset):
+    """
+    The queryset fixed to the database it reads from right now. Querysets
+    consumed after the routing block has exited, like the rows of a
+    StreamingHttpResponse, would otherwise be sent to the primary.
+    """
+    return queryset.using(queryset.db)
+
+
+def replica_reads(view_func):
+    """
+    Serve a read-only view's queries from the replica, unless the request
+    is not a safe method or the session wrote recently. The response is
+    rendered inside, so TemplateResponses read from the replica too.
+    """
+    @functools.wraps(view_func)
+    def wrapped(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS or is_pinned(request):
+            return view_func(request, *args, **kwargs)
+        with use_replica():
+            response = view_func(request, *args, **kwargs)
+            if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+                response = response.render()
+        return response
+    return wrapped
+
+
+class ReplicaChangelistMixin:
+    """ModelAdmin mixin serving the changelist pages from the replica"""
+
+    def changelist_view(self, request, extra_context=None):
+        return replica_reads(super().changelist_view)(request, extra_context)
+
+
+@functools.lru_cache(maxsize=None)
+def unpinned_tables():
+    """Tables whose inserts and updates do not pin the session (UNPINNED_APPS)"""
+    labels = set(get_replica_settings()['UNPINNED_APPS'])
+    tables = {
+        model._meta.db_table
+        for model in apps.get_models()
+        if model._meta.app_label in labels
+    }
+    if 'django_cache' in labels:
+        # DatabaseCache tables have no model in the app registry
+        tables.update(
+            config['LOCATION'] for config in settings.CACHES.values()
+            if config['BACKEND'] == 'django.core.cache.backends.db.DatabaseCache'
+        )
+    return frozenset(tables)
+
+
+@receiver(setting_changed)
+def _reset_unpinned_tables(sender, setting, **kwargs):
+    if setting in ('DATABASE_REPLICA', 'CACHES'):
+        unpinned_tables.cache_clear()
+
+
+class WriteTracker:
+    """
+    execute_wrapper on the primary noting that the request changed rows.
+    Only statements that write count: a get_or_create that found its row
+    asks the router for the write database but leaves the data as it was.
+    Inserts and updates of the unpinned tables do not count either; deletes
+    from them do.
+    """
+
+    def __init__(self, state):
+        self.state = state
+
+    def __call__(self, execute, sql, params, many, context):
+        if not self.state.wrote:
+            match = WRITE_STATEMENT.match(sql)
+            if match and (
+                match.group('verb').upper().startswith('DELETE')
+                or match.group('table') not in unpinned_tables()
+            ):
+                self.state.wrote = True
+        return execute(sql, params, many, context)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Track writes per request and pin the session to the primary for
+    DATABASE_REPLICA['PIN_SECONDS'] after one (read-your-writes). Goes
+    after SessionMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            with connections[DEFAULT_DB_ALIAS].execute_wrapper(WriteTracker(state)):
+                response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote and hasattr(request, 'session'):
+            request.session[PIN_SESSION_KEY] = time.time() + get_replica_settings()['PIN_SECONDS']
+        return response
+
+
+def snapshot_replica(source_alias=DEFAULT_DB_ALIAS, alias=None, pages_per_step=1024):
+    """
+    Copy a SQLite primary onto the replica's file with the online backup
+    API and swap it in atomically; returns the seconds it took. The copy
+    uses a rollback journal and is never written, so the previous file's
+    readers finish undisturbed and the next connection sees the new one.
+    """
+    alias = alias or get_replica_settings()['ALIAS']
+    source = connections[source_alias].settings_dict['NAME']
+    target = str(connections[alias].settings_dict['NAME'])
+    if os.path.abspath(str(source)) == os.path.abspath(target):
+        raise ValueError(f"{alias!r} points at the primary database itself (a test mirror?)")
+    temporary = f'{target}.snapshot-tmp'
+    started = time.perf_counter()
+    if os.path.exists(temporary):
+        os.remove(temporary)
+    primary = sqlite3.connect(str(source))
+    try:
+        copy = sqlite3.connect(temporary)
+        try:
+            primary.backup(copy, pages=pages_per_step)
+            copy.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            copy.close()
+    finally:
+        primary.close()
+    os.replace(temporary, target)
+    return time.perf_counter() - started
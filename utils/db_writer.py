@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+from contextlib import ContextDecorator
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are serialized per process only
+    fcntl = None
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+DEFAULT_SINGLE_WRITER_SETTINGS = {
+    # Serialize write transactions on SQLite databases across threads and
+    # worker processes (see single_writer)
+    'ENABLED': False,
+    # Lock file; defaults to '<database file>.writer-lock'
+    'LOCK_FILE': None,
+}
+
+
+def get_single_writer_settings():
+    """Merge SQLITE_SINGLE_WRITER from settings over the defaults"""
+    config = dict(DEFAULT_SINGLE_WRITER_SETTINGS)
+    config.update(getattr(settings, 'SQLITE_SINGLE_WRITER', {}) or {})
+    return config
+
+
+class FileWriteLock:
+    """
+    An exclusive flock() on a lock file: waiting writers queue in the
+    kernel instead of spinning in SQLite's busy handler, and readers, which
+    never take it, are not held up. Without fcntl it falls back to a lock
+    shared by the threads of this process.
+    """
+
+    _process_locks = {}
+    _process_locks_guard = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def acquire(self):
+        """Take the lock; returns the seconds spent waiting for it"""
+        started = time.perf_counter()
+        if fcntl is None:
+            with self._process_locks_guard:
+                lock = self._process_locks.setdefault(self.path, threading.Lock())
+            lock.acquire()
+            self._local.handle = lock
+        else:
+            handle = open(self.path, 'a+b')
+            try:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            except BaseException:
+                handle.close()
+                raise
+            self._local.handle = handle
+        return time.perf_counter() - started
+
+    def release(self):
+        handle = self._local.handle
+        self._local.handle = None
+        if fcntl is None:
+            handle.release()
+        else:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            handle.close()
+
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def get_write_lock(using=DEFAULT_DB_ALIAS):
+    """The FileWriteLock of a database, or None when single_writer does not apply to it"""
+    config = get_single_writer_settings()
+    if not config['ENABLED']:
+        return None
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+        return None
+    path = config['LOCK_FILE'] or f"{connection.settings_dict['NAME']}.writer-lock"
+    with _locks_guard:
+        if path not in _locks:
+            _locks[path] = FileWriteLock(str(path))
+        return _locks[path]
+
+
+class single_writer(ContextDecorator):
+    """
+    Mark the enclosed code as a write path. On SQLite, transactions opened
+    inside start with BEGIN IMMEDIATE and take the write lock up front, so
+    one that reads before it writes cannot fail upgrading its lock; all
+    other transactions stay DEFERRED and never wait for the writer. When
+    SQLITE_SINGLE_WRITER['ENABLED'] is on, the write transactions also run
+    one at a time across every thread and worker process.
+
+    Enter it outside transaction.atomic(), so the lock is held from before
+    BEGIN until after COMMIT. Nested uses, and uses inside a transaction
+    that is already open (which may hold SQLite's write lock already), do
+    not wait again.
+    """
+
+    _depth = threading.local()
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+        self.lock = None
+        self.transaction_mode = None
+        self.immediate = False
+
+    def _recreate_cm(self):
+        # A fresh instance per decorated call, the lock handle is per call
+        return self.__class__(self.using)
+
+    def __enter__(self):
+        depth = getattr(self._depth, self.using, 0)
+        setattr(self._depth, self.using, depth + 1)
+        connection = connections[self.using]
+        if depth or connection.in_atomic_block:
+            return self
+        if connection.vendor == 'sqlite':
+            # Connecting resets transaction_mode from the settings
+            connection.ensure_connection()
+            self.transaction_mode = connection.transaction_mode
+            connection.transaction_mode = 'IMMEDIATE'
+            self.immediate = True
+        self.lock = get_write_lock(self.using)
+        if self.lock is not None:
+            self.lock.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        setattr(self._depth, self.using, getattr(self._depth, self.using) - 1)
+        if self.lock is not None:
+            self.lock.release()
+            self.lock = None
+        if self.immediate:
+            connections[self.using].transaction_mode = self.transaction_mode
+            self.immediate = False
+        return False
@@ -0,0 +1,86 @@
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from .db_writer import FileWriteLock
+
+
+DEFAULT_GENERATION_SETTINGS = {
+    # Directory with one small file per counter, shared by every worker
+    # process so a bump in one reaches the others; None keeps the counters
+    # per process
+    'DIRECTORY': None,
+    # Seconds a process goes on using the value it read last before it
+    # reads the file again
+    'CHECK_INTERVAL': 1.0,
+}
+
+
+def get_generation_settings():
+    """Merge CACHE_GENERATIONS from settings over the defaults"""
+    config = dict(DEFAULT_GENERATION_SETTINGS)
+    config.update(getattr(settings, 'CACHE_GENERATIONS', {}) or {})
+    return config
+
+
+class Generation:
+    """
+    A counter that per-process caches put into their keys; bump() makes
+    everything cached under the previous value stale.
+
+    The value lives in a file under CACHE_GENERATIONS['DIRECTORY'], read
+    at most once per CHECK_INTERVAL and otherwise answered from memory, so
+    checking it never costs a database or network round trip. Other
+    processes see a bump within CHECK_INTERVAL seconds; the bumping
+    process sees it at once.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._value = 0
+        self._read_at = None
+        self._lock = threading.Lock()
+
+    def _path(self, directory):
+        return os.path.join(directory, f'{self.name}.generation')
+
+    def _read(self, directory):
+        try:
+            with open(self._path(directory)) as fh:
+                return int(fh.read() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def get(self):
+        config = get_generation_settings()
+        directory = config['DIRECTORY']
+        if directory is None:
+            return self._value
+        now = time.monotonic()
+        if self._read_at is None or now - self._read_at >= config['CHECK_INTERVAL']:
+            self._value, self._read_at = self._read(directory), now
+        return self._value
+
+    def bump(self):
+        directory = get_generation_settings()['DIRECTORY']
+        if directory is None:
+            with self._lock:
+                self._value += 1
+                return self._value
+        os.makedirs(directory, exist_ok=True)
+        path = self._path(directory)
+        lock = FileWriteLock(f'{path}.lock')
+        lock.acquire()
+        try:
+            value = self._read(directory) + 1
+            # Readers see the old file or the new one, never half of it
+            temporary = f'{path}.{os.getpid()}.{threading.get_ident()}'
+            with open(temporary, 'w') as fh:
+                fh.write(str(value))
+            os.replace(temporary, path)
+        finally:
+            lock.release()
+        self._value, self._read_at = value, time.monotonic()
+        return value
@@ -0,0 +1,99 @@
+import functools
+import time
+
+from django.conf import settings
+from django.template.backends.django import Template as DjangoTemplate
+
+from . import log_context
+
+
+DEFAULT_INSTRUMENTATION_SETTINGS = {
+    # Add a Server-Timing header (db, tpl and total time) to responses:
+    # True for everyone, 'staff' for staff users only, False for no one
+    'SERVER_TIMING': 'staff',
+    # Time Django template rendering per request
+    'TEMPLATE_TIMING': True,
+    # A statement run this many times in one request is reported as a
+    # duplicate (the N+1 pattern); only the TOP_DUPLICATES worst are kept
+    'DUPLICATE_QUERY_THRESHOLD': 5,
+    'TOP_DUPLICATES': 5,
+}
+
+
+def get_instrumentation_settings():
+    """Merge LOG_INSTRUMENTATION from settings over the defaults"""
+    config = dict(DEFAULT_INSTRUMENTATION_SETTINGS)
+    config.update(getattr(settings, 'LOG_INSTRUMENTATION', {}) or {})
+    return config
+
+
+def _timed_render(render):
+    @functools.wraps(render)
+    def timed(self, context=None, request=None):
+        current = log_context.get_current()
+        # Nested renders (render_to_string from a tag) are part of the outer one
+        if current is None or current.template_depth:
+            return render(self, context, request)
+        current.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            current.template_depth -= 1
+            current.template_time += time.perf_counter() - started
+            current.templates_rendered += 1
+
+    timed.instrumented = True
+    return timed
+
+
+def install_template_timing():
+    """
+    Time every render of a Django template backend Template (render(),
+    render_to_string(), TemplateResponse) into the current request's log
+    context. Queries run lazily from the template count towards both.
+    """
+    if not getattr(DjangoTemplate.render, 'instrumented', False):
+        DjangoTemplate.render = _timed_render(DjangoTemplate.render)
+
+
+def request_metrics(context, total_time, config=None):
+    """The instrumentation numbers of a finished request, for additional_data"""
+    config = config or get_instrumentation_settings()
+    timings = {
+        'db_queries': context.db_queries,
+        'db_writes': context.db_writes,
+        'db_time_ms': round(context.db_time * 1000, 2),
+        'template_time_ms': round(context.template_time * 1000, 2),
+        'templates_rendered': context.templates_rendered,
+        'total_time_ms': round(total_time * 1000, 2),
+    }
+    duplicates = context.duplicate_queries(config['DUPLICATE_QUERY_THRESHOLD'])
+    if duplicates:
+        timings['duplicate_queries'] = [
+            {'sql': sql[:300], 'count': count}
+            for sql, count in duplicates[:config['TOP_DUPLICATES']]
+        ]
+    return timings
+
+
+def wants_server_timing(request, config=None):
+    config = config or get_instrumentation_settings()
+    mode = config['SERVER_TIMING']
+    if mode == 'staff':
+        user = getattr(request, 'user', None)
+        return bool(user is not None and user.is_authenticated and user.is_staff)
+    return bool(mode)
+
+
+def server_timing_header(timings):
+    """Server-Timing value: db and tpl time with their counts, and the total"""
+    entries = [
+        f'db;dur={timings["db_time_ms"]};desc="{timings["db_queries"]} queries"',
+        f'tpl;dur={timings["template_time_ms"]};desc="{timings["templates_rendered"]} templates"',
+    ]
+    duplicates = timings.get('duplicate_queries')
+    if duplicates:
+        entries.append(f'dup;desc="{len(duplicates)} repeated statements, worst x{duplicates[0]["count"]}"')
+    entries.append(f'total;dur={timings["total_time_ms"]}')
+    return ', '.join(entries)
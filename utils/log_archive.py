@@ -0,0 +1,261 @@
+import gzip
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from .models import ActivityLog, AuditLog, SystemLog, LoginLog
+
+
+LOG_MODELS = {
+    'ActivityLog': ActivityLog,
+    'AuditLog': AuditLog,
+    'SystemLog': SystemLog,
+    'LoginLog': LoginLog,
+}
+
+# HOT_DAYS: how long rows stay in the hot table
+# ARCHIVE: 'table' (monthly archive tables), 'file' (gzipped JSONL) or 'delete'
+DEFAULT_RETENTION = {
+    'ActivityLog': {'HOT_DAYS': 90, 'ARCHIVE': 'table'},
+    'AuditLog': {'HOT_DAYS': 365, 'ARCHIVE': 'table'},
+    'SystemLog': {'HOT_DAYS': 30, 'ARCHIVE': 'file'},
+    'LoginLog': {'HOT_DAYS': 90, 'ARCHIVE': 'table'},
+}
+
+ARCHIVE_MODES = ('table', 'file', 'delete')
+
+
+class ArchiveJSONEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder cuts datetimes to milliseconds; archives keep them whole"""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def get_retention_policy(model_name):
+    """Policy for one log model, LOG_RETENTION settings over the defaults"""
+    policy = dict(DEFAULT_RETENTION[model_name])
+    policy.update(getattr(settings, 'LOG_RETENTION', {}).get(model_name, {}))
+    if policy['ARCHIVE'] not in ARCHIVE_MODES:
+        raise ValueError(
+            f"LOG_RETENTION['{model_name}']['ARCHIVE'] must be one of {ARCHIVE_MODES}"
+        )
+    return policy
+
+
+def get_archive_dir():
+    return str(getattr(settings, 'LOG_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'log_archive')))
+
+
+class LogArchiver:
+    """
+    Moves rows older than the model's HOT_DAYS out of its hot table in
+    batches, into a monthly archive table (<table>_archive_YYYYMM) or a
+    gzipped JSONL file per month under LOG_ARCHIVE_DIR. Archived rows can
+    be read back with query().
+    """
+
+    def __init__(self, model, hot_days=None, mode=None, batch_size=5000, archive_dir=None):
+        policy = get_retention_policy(model.__name__)
+        self.model = model
+        self.hot_days = int(hot_days if hot_days is not None else policy['HOT_DAYS'])
+        self.mode = mode or policy['ARCHIVE']
+        self.batch_size = batch_size
+        self.archive_dir = archive_dir or get_archive_dir()
+        self.db = router.db_for_write(model)
+        self.connection = connections[self.db]
+        self.columns = [field.column for field in model._meta.concrete_fields]
+        self.attnames = [field.attname for field in model._meta.concrete_fields]
+
+    # -- naming ------------------------------------------------------------
+
+    def archive_table_name(self, month):
+        return f'{self.model._meta.db_table}_archive_{month:%Y%m}'
+
+    def archive_file_path(self, month):
+        return os.path.join(
+            self.archive_dir, f'{self.model._meta.model_name}-{month:%Y-%m}.jsonl.gz'
+        )
+
+    def cutoff(self, now=None):
+        return (now or timezone.now()) - timedelta(days=self.hot_days)
+
+    def expired(self, now=None):
+        return self.model._default_manager.using(self.db).filter(created_at__lt=self.cutoff(now))
+
+    # -- archiving ---------------------------------------------------------
+
+    def archive(self, now=None, limit=None):
+        """Archive every expired row in batches; returns the number moved"""
+        cutoff = self.cutoff(now)
+        moved = 0
+        while limit is None or moved < limit:
+            size = self.batch_size if limit is None else min(self.batch_size, limit - moved)
+            batch = list(
+                self.model._default_manager.using(self.db)
+                .filter(created_at__lt=cutoff)
+                .order_by('created_at')
+                .values_list('pk', 'created_at')[:size]
+            )
+            if not batch:
+                break
+
+            # A batch can straddle a month boundary
+            by_month = {}
+            for pk, created_at in batch:
+                month = timezone.localtime(created_at).date().replace(day=1)
+                by_month.setdefault(month, []).append(pk)
+
+            for month, pks in by_month.items():
+                part = None
+                try:
+                    with transaction.atomic(using=self.db):
+                        if self.mode == 'table':
+                            self._copy_to_table(month, pks)
+                        elif self.mode == 'file':
+                            part = self._write_part(month, pks)
+                            transaction.on_commit(
+                                lambda month=month, part=part: self._append_part(month, part),
+                                using=self.db,
+                            )
+                        # utils.signals has a catch-all post_delete receiver, which
+                        # would make delete() load and signal every row
+                        self.model._default_manager.using(self.db).filter(pk__in=pks)._raw_delete(self.db)
+                except BaseException:
+                    # The rows are still in the hot table; don't archive them twice
+                    if part is not None and os.path.exists(part):
+                        os.remove(part)
+                    raise
+            moved += len(batch)
+        return moved
+
+    def _ensure_archive_table(self, month):
+        table = self.archive_table_name(month)
+        if table in self.connection.introspection.table_names():
+            return table
+        qn = self.connection.ops.quote_name
+        hot = self.model._meta.db_table
+        with self.connection.cursor() as cursor:
+            # Same columns as the hot table, no constraints
+            cursor.execute(f'CREATE TABLE {qn(table)} AS SELECT * FROM {qn(hot)} WHERE 1 = 0')
+            cursor.execute(
+                f'CREATE INDEX {qn(table + "_created")} ON {qn(table)} ({qn("created_at")})'
+            )
+        return table
+
+    def _copy_to_table(self, month, pks):
+        table = self._ensure_archive_table(month)
+        qn = self.connection.ops.quote_name
+        select = (
+            self.model._default_manager.using(self.db)
+            .filter(pk__in=pks).order_by().values_list(*self.attnames)
+        )
+        sql, params = select.query.sql_with_params()
+        columns = ', '.join(qn(column) for column in self.columns)
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'INSERT INTO {qn(table)} ({columns}) {sql}', params)
+
+    def _write_part(self, month, pks):
+        """
+        Write a batch as one gzip member next to the month's file. It is only
+        appended to the archive once the delete of the rows has committed
+        (_append_part), and removed if that transaction rolls back.
+        """
+        os.makedirs(self.archive_dir, exist_ok=True)
+        rows = (
+            self.model._default_manager.using(self.db)
+            .filter(pk__in=pks).order_by('created_at').values(*self.attnames)
+        )
+        part = f'{self.archive_file_path(month)}.{uuid.uuid4().hex}.part'
+        with gzip.open(part, 'wt', encoding='utf-8') as fh:
+            for row in rows.iterator(chunk_size=self.batch_size):
+                fh.write(json.dumps(row, cls=ArchiveJSONEncoder))
+                fh.write('\n')
+        return part
+
+    def _append_part(self, month, part):
+        # gzip members can be concatenated, so each batch is appended as one
+        with open(part, 'rb') as source, open(self.archive_file_path(month), 'ab') as target:
+            shutil.copyfileobj(source, target)
+        os.remove(part)
+
+    # -- reading archives back ---------------------------------------------
+
+    def archived_months(self):
+        """Months that have an archive table or file, oldest first"""
+        months = set()
+        prefix = f'{self.model._meta.db_table}_archive_'
+        for table in self.connection.introspection.table_names():
+            if table.startswith(prefix):
+                months.add(datetime.strptime(table[len(prefix):], '%Y%m').date())
+        file_prefix = f'{self.model._meta.model_name}-'
+        if os.path.isdir(self.archive_dir):
+            for name in os.listdir(self.archive_dir):
+                if name.startswith(file_prefix) and name.endswith('.jsonl.gz'):
+                    stamp = name[len(file_prefix):-len('.jsonl.gz')]
+                    months.add(datetime.strptime(stamp, '%Y-%m').date())
+        return sorted(months)
+
+    def query(self, start=None, end=None, **filters):
+        """
+        Yield archived rows as unsaved model instances, oldest month first.
+        start/end bound created_at; filters are exact matches on attnames
+        (e.g. level='ERROR', user_id=3).
+        """
+        for month in self.archived_months():
+            next_month = (month + timedelta(days=32)).replace(day=1)
+            if start is not None and next_month <= timezone.localtime(start).date():
+                continue
+            if end is not None and month > timezone.localtime(end).date():
+                continue
+            if self.archive_table_name(month) in self.connection.introspection.table_names():
+                yield from self._query_table(month, start, end, filters)
+            if os.path.exists(self.archive_file_path(month)):
+                yield from self._query_file(month, start, end, filters)
+
+    def _query_table(self, month, start, end, filters):
+        qn = self.connection.ops.quote_name
+        fields = {field.attname: field for field in self.model._meta.concrete_fields}
+        where, params = [], []
+        if start is not None:
+            where.append(f'{qn("created_at")} >= %s')
+            params.append(fields['created_at'].get_db_prep_value(start, self.connection))
+        if end is not None:
+            where.append(f'{qn("created_at")} < %s')
+            params.append(fields['created_at'].get_db_prep_value(end, self.connection))
+        for attname, value in filters.items():
+            field = fields[attname]
+            where.append(f'{qn(field.column)} = %s')
+            params.append(field.get_db_prep_value(value, self.connection))
+        sql = f'SELECT * FROM {qn(self.archive_table_name(month))}'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += f' ORDER BY {qn("created_at")}'
+        yield from self.model._default_manager.db_manager(self.db).raw(sql, params)
+
+    def _query_file(self, month, start, end, filters):
+        fields = {field.attname: field for field in self.model._meta.concrete_fields}
+        with gzip.open(self.archive_file_path(month), 'rt', encoding='utf-8') as fh:
+            for line in fh:
+                data = json.loads(line)
+                values = {
+                    attname: fields[attname].to_python(value) if value is not None else None
+                    for attname, value in data.items() if attname in fields
+                }
+                created_at = values.get('created_at')
+                if start is not None and created_at < start:
+                    continue
+                if end is not None and created_at >= end:
+                    continue
+                if any(str(values.get(key)) != str(value) for key, value in filters.items()):
+                    continue
+                yield self.model(**values)
@@ -0,0 +1,119 @@
+import contextvars
+import functools
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+# Models whose saves/deletes are recorded when LOG_MODEL_CHANGES is not set
+DEFAULT_LOGGED_MODELS = [
+    'auth.User',
+    'emp.CustomUser',
+    'emp.Department',
+    'emp.Attendance',
+    'emp.LeaveRequest',
+    'emp.AttendanceSettings',
+]
+
+# Literals and IN lists of any length collapse, so the same query with
+# different values (the N+1 pattern) has one fingerprint
+_SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SQL_IN_LISTS = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)")
+
+_current = contextvars.ContextVar('request_log_context', default=None)
+
+
+class RequestLogContext:
+    """Everything the logging pipeline collects while one request is handled"""
+
+    def __init__(self, request):
+        self.request = request
+        self.model_changes = []
+        self.db_queries = 0
+        self.db_writes = 0
+        self.db_time = 0.0
+        self.query_fingerprints = Counter()
+        self.template_time = 0.0
+        self.templates_rendered = 0
+        self.template_depth = 0
+        self.exception = None
+        # set by the user_logged_out receiver
+        self.logged_out_user = None
+
+    def add_model_change(self, action, instance):
+        self.model_changes.append({
+            'action': action,
+            'model': instance._meta.label,
+            'object_id': str(instance.pk),
+            'object_repr': str(instance)[:100],
+        })
+
+    def count_query(self, execute, sql, params, many, context):
+        """connection.execute_wrapper hook counting queries, writes and SQL time"""
+        self.db_queries += 1
+        if sql.lstrip()[:7].upper().startswith(WRITE_STATEMENTS):
+            self.db_writes += 1
+        self.query_fingerprints[fingerprint(sql)] += 1
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+
+    def duplicate_queries(self, threshold):
+        """[(fingerprint, count)] of the statements run at least threshold times"""
+        return [
+            (sql, count) for sql, count in self.query_fingerprints.most_common()
+            if count >= threshold
+        ]
+
+
+@functools.lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """The shape of a statement, with its literal values taken out"""
+    return _SQL_IN_LISTS.sub('(%s...)', _SQL_LITERALS.sub('?', sql))
+
+
+def start(request):
+    """Open a log context for the request; returns the token for end()"""
+    context = RequestLogContext(request)
+    request.log_context = context
+    return context, _current.set(context)
+
+
+def end(token):
+    _current.reset(token)
+
+
+def get_current():
+    """The RequestLogContext of the request being handled, or None"""
+    return _current.get()
+
+
+_logged_models = None
+
+
+def get_logged_models():
+    """Set of 'app_label.ModelName' labels allowed to produce model-change logs"""
+    global _logged_models
+    if _logged_models is None:
+        labels = getattr(settings, 'LOG_MODEL_CHANGES', DEFAULT_LOGGED_MODELS)
+        _logged_models = frozenset(labels)
+    return _logged_models
+
+
+def is_logged_model(model):
+    return model._meta.label in get_logged_models()
+
+
+@receiver(setting_changed)
+def _reset_logged_models(sender, setting, **kwargs):
+    global _logged_models
+    if setting == 'LOG_MODEL_CHANGES':
+        _logged_models = None
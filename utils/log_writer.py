@@ -0,0 +1,310 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections, connection
+from django.dispatch import receiver
+
+from .db_writer import single_writer
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_WRITER_SETTINGS = {
+    # 'sync' writes every record inside the request, 'buffered' hands it to
+    # the background flusher thread
+    'MODE': 'sync',
+    'BATCH_SIZE': 200,
+    'FLUSH_INTERVAL': 2.0,
+    'MAX_QUEUE_SIZE': 10000,
+    # what to do when the queue is full: 'sync', 'block', 'drop_newest', 'drop_oldest'
+    'OVERFLOW_POLICY': 'sync',
+    'BLOCK_TIMEOUT': 0.5,
+}
+
+OVERFLOW_POLICIES = ('sync', 'block', 'drop_newest', 'drop_oldest')
+
+# Callables run with a list of log records once they are in the database
+_write_hooks = []
+
+
+def register_write_hook(hook):
+    """Call hook(records) after every successful write of log records"""
+    if hook not in _write_hooks:
+        _write_hooks.append(hook)
+
+
+def run_write_hooks(records):
+    for hook in _write_hooks:
+        try:
+            hook(records)
+        except Exception:
+            logger.exception("Log writer hook %s failed", getattr(hook, '__name__', hook))
+
+
+def get_writer_settings():
+    """Merge LOG_WRITER from settings over the defaults"""
+    config = dict(DEFAULT_WRITER_SETTINGS)
+    config.update(getattr(settings, 'LOG_WRITER', {}) or {})
+    if config['OVERFLOW_POLICY'] not in OVERFLOW_POLICIES:
+        raise ValueError(
+            f"LOG_WRITER['OVERFLOW_POLICY'] must be one of {OVERFLOW_POLICIES}, "
+            f"got {config['OVERFLOW_POLICY']!r}"
+        )
+    return config
+
+
+class SyncLogWriter:
+    """Writes each log record immediately (the original behaviour)"""
+
+    mode = 'sync'
+
+    def write(self, record):
+        with single_writer():
+            record.save(force_insert=True)
+            run_write_hooks([record])
+
+    def flush(self):
+        return 0
+
+    def shutdown(self):
+        pass
+
+    def stats(self):
+        return {'mode': self.mode, 'queued': 0, 'written': 0, 'dropped': 0}
+
+
+class BufferedLogWriter:
+    """
+    Queues unsaved log model instances and writes them from a background
+    thread with bulk_create, once BATCH_SIZE records are waiting or every
+    FLUSH_INTERVAL seconds, whichever comes first. A record's created_at is
+    set when it is built, so it keeps the time of the event, not the flush.
+    """
+
+    mode = 'buffered'
+
+    def __init__(self, batch_size=200, flush_interval=2.0, max_queue_size=10000,
+                 overflow_policy='sync', block_timeout=0.5):
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = float(flush_interval)
+        self.max_queue_size = int(max_queue_size)
+        self.overflow_policy = overflow_policy
+        self.block_timeout = float(block_timeout)
+
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+        self.written = 0
+        self.dropped = 0
+
+    # -- producer side -----------------------------------------------------
+
+    def write(self, record):
+        """Enqueue a record, applying the overflow policy if the queue is full"""
+        if self._stopping.is_set():
+            self._save_now(record)
+            return
+
+        self._ensure_thread()
+
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._handle_overflow(record)
+
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    def _handle_overflow(self, record):
+        policy = self.overflow_policy
+        if policy == 'sync':
+            self._save_now(record)
+        elif policy == 'block':
+            self._wakeup.set()
+            try:
+                self._queue.put(record, timeout=self.block_timeout)
+            except queue.Full:
+                self._count(dropped=1)
+        elif policy == 'drop_oldest':
+            try:
+                self._queue.get_nowait()
+                self._count(dropped=1)
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(record)
+            except queue.Full:
+                self._count(dropped=1)
+        else:
+            # drop_newest
+            self._count(dropped=1)
+
+    def _save_now(self, record):
+        """Write one record from the calling thread, like SyncLogWriter"""
+        with single_writer():
+            record.save(force_insert=True)
+            run_write_hooks([record])
+        self._count(written=1)
+
+    def _count(self, written=0, dropped=0):
+        # Producers, the flusher and shutdown all update the counters
+        with self._counter_lock:
+            self.written += written
+            self.dropped += dropped
+
+    # -- consumer side -----------------------------------------------------
+
+    def _ensure_thread(self):
+        """Start the flusher lazily, and again in a forked worker process"""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                # Records inherited from the parent belong to the parent
+                self._queue = queue.Queue(maxsize=self.max_queue_size)
+                self._flush_lock = threading.Lock()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name='log-writer', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+        # The thread owns its own connection
+        connection.close()
+
+    def _drain(self):
+        records = []
+        while True:
+            try:
+                records.append(self._queue.get_nowait())
+            except queue.Empty:
+                return records
+
+    def flush(self):
+        """Write everything currently queued, grouped per model"""
+        with self._flush_lock:
+            records = self._drain()
+            if not records:
+                return 0
+
+            grouped = defaultdict(list)
+            for record in records:
+                grouped[record.__class__].append(record)
+
+            with single_writer():
+                written = []
+                for model, batch in grouped.items():
+                    try:
+                        model.objects.bulk_create(batch, batch_size=self.batch_size)
+                        written.extend(batch)
+                    except Exception:
+                        # Fall back to row-by-row so one bad record does not
+                        # lose the rest of the batch
+                        dropped = 0
+                        for record in batch:
+                            try:
+                                record.save(force_insert=True)
+                                written.append(record)
+                            except Exception:
+                                dropped += 1
+                        self._count(dropped=dropped)
+                        logger.exception("Log writer bulk insert into %s failed", model.__name__)
+
+                run_write_hooks(written)
+
+            self._count(written=len(written))
+            return len(written)
+
+    def shutdown(self, timeout=5.0):
+        """Stop the flusher thread and write whatever is still queued"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        return {
+            'mode': self.mode,
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+        }
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Return the process-wide log writer, building it from settings on first use"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                config = get_writer_settings()
+                if config['MODE'] == 'buffered':
+                    _writer = BufferedLogWriter(
+                        batch_size=config['BATCH_SIZE'],
+                        flush_interval=config['FLUSH_INTERVAL'],
+                        max_queue_size=config['MAX_QUEUE_SIZE'],
+                        overflow_policy=config['OVERFLOW_POLICY'],
+                        block_timeout=config['BLOCK_TIMEOUT'],
+                    )
+                else:
+                    _writer = SyncLogWriter()
+    return _writer
+
+
+def reset_writer():
+    """Flush and discard the current writer so the next call re-reads settings"""
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.shutdown()
+        _writer = None
+
+
+def flush_logs():
+    """Force any buffered log records out to the database"""
+    if _writer is not None:
+        return _writer.flush()
+    return 0
+
+
+@receiver(setting_changed)
+def _reset_writer_on_setting_change(sender, setting, **kwargs):
+    # override_settings(LOG_WRITER=...) in tests takes effect on the next write
+    if setting == 'LOG_WRITER':
+        reset_writer()
+
+
+@atexit.register
+def _flush_on_exit():
+    if _writer is not None:
+        try:
+            _writer.shutdown()
+        except Exception:
+            logger.exception("Failed to flush buffered logs on shutdown")
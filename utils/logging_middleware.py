@@ -1,37 +1,125 @@
 import time
+from contextlib import ExitStack
+from django.db import connections
 from django.utils.deprecation import MiddlewareMixin
 from utils.logging_utils import Logger
+from utils import instrumentation, log_context, metrics
 
 class LoggingMiddleware(MiddlewareMixin):
-    """Middleware to log all requests"""
-    
+    """
+    Middleware to log all requests.
+
+    Each request produces a single ActivityLog row. Model changes made while
+    the request is handled (see utils.signals) and the number of queries and
+    writes it issued are folded into that row's additional_data instead of
+    being written as rows of their own.
+
+    Alongside the wall-clock response_time, the row records the SQL time,
+    template rendering time and any statement repeated often enough to
+    look like an N+1 (utils.instrumentation); the same numbers go out in a
+    Server-Timing header. Request counts, latency and query counts per
+    view also go to the /metrics counters (utils.metrics); views marked
+    with @no_activity_log (the metrics endpoint itself) get no log row.
+
+    A streaming response (the CSV and JSON lines exports) runs most of its
+    queries while the server iterates over it, after the middleware has
+    returned. Its queries go on being counted, and its row is written from
+    the response's close(), with the full duration and bytes sent.
+    """
+
+    def __call__(self, request):
+        context, token = log_context.start(request)
+        try:
+            with ExitStack() as stack:
+                # Count statements on every configured database for this request
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(context.count_query))
+                response = super().__call__(request)
+        finally:
+            log_context.end(token)
+        if response.streaming:
+            self.finish_when_closed(request, response, context)
+        return response
+
+    def finish_when_closed(self, request, response, context):
+        """Count the queries run while the body is streamed and log the
+        request when the server closes the response"""
+        count_query = context.count_query
+        streamed = list(connections.all())
+        for conn in streamed:
+            conn.execute_wrappers.append(count_query)
+
+        request.streamed_bytes = 0
+
+        def counted(chunks):
+            for chunk in chunks:
+                request.streamed_bytes += len(chunk)
+                yield chunk
+
+        response.streaming_content = counted(response.streaming_content)
+
+        def close():
+            for conn in streamed:
+                if count_query in conn.execute_wrappers:
+                    conn.execute_wrappers.remove(count_query)
+            self.finish(request, response)
+
+        # HttpResponseBase.close() runs these before request_finished
+        response._resource_closers.append(close)
+
     def process_request(self, request):
         """Store request start time"""
         request.start_time = time.time()
         return None
-    
+
     def process_response(self, request, response):
         """Log the request after it's processed"""
+        if not response.streaming:
+            self.finish(request, response)
+        return response
+
+    def finish(self, request, response):
+        """Record the request's metrics and write its log row"""
+        try:
+            self.record_metrics(request, response)
+        except Exception as e:
+            Logger.log_system_error('LoggingMiddleware.record_metrics', str(e))
+        if getattr(request, 'skip_activity_log', False):
+            return
+
         try:
             # Calculate response time
             response_time = 0
             if hasattr(request, 'start_time'):
                 response_time = time.time() - request.start_time
-            
+
             # Get user info
             user = request.user if hasattr(request, 'user') else None
-            username = user.username if user and user.is_authenticated else 'Anonymous'
-            
+            context = getattr(request, 'log_context', None)
+
             # Prepare log data
             log_data = {
                 'method': request.method,
                 'path': request.path,
                 'status_code': response.status_code,
                 'response_time': round(response_time, 3),
-                'content_length': len(response.content) if hasattr(response, 'content') else 0,
+                'content_length': (
+                    getattr(request, 'streamed_bytes', 0) if response.streaming else len(response.content)
+                ),
                 'query_params': dict(request.GET),
             }
-            
+            if context is not None:
+                config = instrumentation.get_instrumentation_settings()
+                timings = instrumentation.request_metrics(context, response_time, config)
+                log_data.update(timings)
+                # A streamed response's headers are long gone
+                if not response.streaming and instrumentation.wants_server_timing(request, config):
+                    response['Server-Timing'] = instrumentation.server_timing_header(timings)
+                if context.model_changes:
+                    log_data['model_changes'] = context.model_changes
+                if context.exception:
+                    log_data['exception'] = context.exception
+
             # Determine log type based on status code
             if response.status_code >= 400:
                 status = 'failed'
@@ -39,7 +127,9 @@ class LoggingMiddleware(MiddlewareMixin):
             else:
                 status = 'success'
                 log_type = 'view' if request.method == 'GET' else 'update'
-            
+            if context is not None and context.logged_out_user is not None:
+                user, log_type = context.logged_out_user, 'logout'
+
             # Log the request
             Logger.log_activity(
                 user=user if user and user.is_authenticated else None,
@@ -50,23 +140,31 @@ class LoggingMiddleware(MiddlewareMixin):
                 status=status,
                 additional_data=log_data
             )
-            
+
         except Exception as e:
             Logger.log_system_error('LoggingMiddleware', str(e))
-        
-        return response
-    
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(view_func, 'no_activity_log', False):
+            request.skip_activity_log = True
+        return None
+
+    def record_metrics(self, request, response):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None else 'unresolved'
+        metrics.REQUESTS.inc(view, request.method, response.status_code)
+        if hasattr(request, 'start_time'):
+            metrics.REQUEST_DURATION.observe(time.time() - request.start_time, view)
+        context = getattr(request, 'log_context', None)
+        if context is not None:
+            metrics.DB_QUERIES.inc(view, amount=context.db_queries)
+            metrics.DB_TIME.inc(view, amount=context.db_time)
+        metrics.flush()
+
     def process_exception(self, request, exception):
-        """Log exceptions"""
-        import traceback
-        Logger.log_system_error(
-            source='Middleware',
-            message=f'Exception in {request.method} {request.path}: {str(exception)}',
-            traceback_text=traceback.format_exc(),
-            additional_data={
-                'method': request.method,
-                'path': request.path,
-                'user': request.user.username if request.user.is_authenticated else 'Anonymous'
-            }
-        )
-        return None
\ No newline at end of file
+        """Note the exception on the request row; the SystemLog entry with the
+        traceback is written by the got_request_exception receiver"""
+        context = getattr(request, 'log_context', None)
+        if context is not None:
+            context.exception = f'{exception.__class__.__name__}: {exception}'
+        return None
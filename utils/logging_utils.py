@@ -1,13 +1,20 @@
 import json
 import traceback
 from django.utils import timezone
-from django.db import transaction
+from django.db import router, transaction
 from django.contrib.auth.models import User
 from .models import ActivityLog, AuditLog, SystemLog, LoginLog
+from .log_writer import get_writer
+from . import log_context, metrics
 
 class Logger:
     """Central logging utility class"""
     
+    @staticmethod
+    def _write(record):
+        """Hand an unsaved log record to the configured writer (sync or buffered)"""
+        get_writer().write(record)
+    
     @staticmethod
     def get_client_ip(request):
         """Get client IP address from request"""
@@ -31,7 +38,7 @@ class Logger:
             ip_address = cls.get_client_ip(request) if request else None
             user_agent = cls.get_user_agent(request) if request else None
             
-            ActivityLog.objects.create(
+            cls._write(ActivityLog(
                 user=user,
                 log_type=log_type,
                 module=module,
@@ -40,7 +47,7 @@ class Logger:
                 user_agent=user_agent,
                 status=status,
                 additional_data=additional_data or {}
-            )
+            ))
         except Exception as e:
             cls.log_system_error('Logger.log_activity', str(e))
     
@@ -51,7 +58,7 @@ class Logger:
         try:
             ip_address = cls.get_client_ip(request) if request else None
             
-            AuditLog.objects.create(
+            cls._write(AuditLog(
                 user=user,
                 action=action,
                 model_name=model_name,
@@ -59,7 +66,7 @@ class Logger:
                 object_repr=object_repr,
                 changes=changes,
                 ip_address=ip_address
-            )
+            ))
         except Exception as e:
             cls.log_system_error('Logger.log_audit', str(e))
     
@@ -67,13 +74,13 @@ class Logger:
     def log_system(cls, level, source, message, traceback_text=None, additional_data=None):
         """Log system events"""
         try:
-            SystemLog.objects.create(
+            cls._write(SystemLog(
                 level=level,
                 source=source,
                 message=message,
                 traceback=traceback_text,
                 additional_data=additional_data or {}
-            )
+            ))
         except Exception as e:
             print(f"Failed to log system event: {e}")
     
@@ -93,22 +100,27 @@ class Logger:
         cls.log_system('ERROR', source, message, traceback_text, additional_data)
     
     @classmethod
-    def log_login_attempt(cls, username, status, request=None, 
-                         failure_reason=None, user=None):
-        """Log login attempts"""
+    def log_login(cls, username, status, request=None, user=None, failure_reason=None):
+        """Record one login attempt in LoginLog and the login counter"""
+        metrics.LOGINS.inc(status)
         try:
-            ip_address = cls.get_client_ip(request) if request else None
-            user_agent = cls.get_user_agent(request) if request else None
-            
-            LoginLog.objects.create(
+            cls._write(LoginLog(
                 username=username,
                 user=user,
                 status=status,
-                ip_address=ip_address,
-                user_agent=user_agent,
+                ip_address=cls.get_client_ip(request) if request else None,
+                user_agent=cls.get_user_agent(request) if request else None,
                 failure_reason=failure_reason
-            )
-            
+            ))
+        except Exception as e:
+            cls.log_system_error('Logger.log_login', str(e))
+    
+    @classmethod
+    def log_login_attempt(cls, username, status, request=None, 
+                         failure_reason=None, user=None):
+        """Log login attempts"""
+        cls.log_login(username, status, request=request, user=user, failure_reason=failure_reason)
+        try:
             # Log activity as well
             if status == 'success' and user:
                 cls.log_activity(
@@ -134,134 +146,203 @@ class Logger:
 
 
 # Django signals for automatic auditing
-from django.db.models.signals import post_save, post_delete, pre_save
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 
+# Placeholder for fields that were deferred when the instance was loaded
+_NOT_LOADED = object()
+
 class ModelAuditor:
     """Automatic model change tracking"""
     
-    @staticmethod
-    def get_changes(instance, created=False):
+    IGNORED_FIELDS = ('password', 'created_at', 'updated_at')
+    
+    # model class -> ((field name, attname), ...) for the audited fields
+    _field_cache = {}
+    
+    @classmethod
+    def get_audited_fields(cls, model_class):
+        """(name, attname) pairs compared when diffing an instance"""
+        fields = cls._field_cache.get(model_class)
+        if fields is None:
+            fields = tuple(
+                (field.name, field.attname)
+                for field in model_class._meta.concrete_fields
+                if field.name not in cls.IGNORED_FIELDS
+            )
+            cls._field_cache[model_class] = fields
+        return fields
+    
+    @classmethod
+    def take_snapshot(cls, instance):
+        """Store the current field values on the instance as a flat tuple.
+        Values are read from __dict__ so deferred fields are never loaded."""
+        values = instance.__dict__
+        instance._audit_snapshot = tuple(
+            values.get(attname, _NOT_LOADED)
+            for _, attname in cls.get_audited_fields(instance.__class__)
+        )
+    
+    @classmethod
+    def diff_snapshot(cls, instance, snapshot, new_values=None):
+        """Compare a snapshot with the instance's current values (or with
+        new_values, a {attname: value} dict, when given) without querying"""
+        current = new_values if new_values is not None else instance.__dict__
+        changes = {}
+        for (field_name, attname), old_value in zip(cls.get_audited_fields(instance.__class__), snapshot):
+            if new_values is not None and attname not in new_values:
+                continue
+            new_value = current.get(attname, _NOT_LOADED)
+            if old_value is _NOT_LOADED or new_value is _NOT_LOADED:
+                continue
+            if old_value != new_value:
+                changes[field_name] = {
+                    'old': str(old_value) if old_value is not None else None,
+                    'new': str(new_value) if new_value is not None else None
+                }
+        return changes
+    
+    @classmethod
+    def get_changes(cls, instance, created=False):
         """Get changes between old and new instance"""
         if not instance.pk or created:
             return {}
         
+        snapshot = getattr(instance, '_audit_snapshot', None)
+        if snapshot is not None:
+            return cls.diff_snapshot(instance, snapshot)
+        
+        # Instance of an untracked model: fall back to reading the stored row
         try:
             old_instance = instance.__class__.objects.get(pk=instance.pk)
-            changes = {}
-            
-            for field in instance._meta.fields:
-                field_name = field.name
-                old_value = getattr(old_instance, field_name, None)
-                new_value = getattr(instance, field_name, None)
-                
-                # Handle special cases
-                if field_name in ['password', 'created_at', 'updated_at']:
-                    continue
-                
-                if old_value != new_value:
-                    changes[field_name] = {
-                        'old': str(old_value) if old_value is not None else None,
-                        'new': str(new_value) if new_value is not None else None
-                    }
-            
-            return changes
         except instance.__class__.DoesNotExist:
             return {}
+        cls.take_snapshot(old_instance)
+        return cls.diff_snapshot(instance, old_instance._audit_snapshot)
+    
+    @staticmethod
+    def _current_request(request):
+        """The given request, else the one being handled (utils.log_context)"""
+        if request is None:
+            context = log_context.get_current()
+            request = context.request if context is not None else None
+        return request
+    
+    @staticmethod
+    def _acting_user(request, user):
+        if user is not None:
+            return user
+        acting = getattr(request, 'user', None)
+        return acting if acting is not None and acting.is_authenticated else None
     
     @classmethod
     def track_model(cls, model_class, request=None, user=None):
-        """Decorator to track model changes"""
-        @receiver(pre_save, sender=model_class)
-        def pre_save_handler(sender, instance, **kwargs):
-            """Store instance state before save"""
-            if not instance.pk:
-                instance._old_state = {}
-            else:
-                try:
-                    old_instance = sender.objects.get(pk=instance.pk)
-                    instance._old_state = {
-                        field.name: getattr(old_instance, field.name, None)
-                        for field in instance._meta.fields
-                    }
-                except sender.DoesNotExist:
-                    instance._old_state = {}
+        """
+        Write an AuditLog entry, with the changed fields, for every save and
+        delete of model_class. The activity side of the change is recorded by
+        utils.signals (on the request's row for LOG_MODEL_CHANGES models).
+        Call once per model, e.g. from AppConfig.ready().
+        """
+        uid = f'model-auditor:{model_class._meta.label}'
+        
+        @receiver(post_init, sender=model_class, weak=False, dispatch_uid=f'{uid}:post_init')
+        def post_init_handler(sender, instance, **kwargs):
+            """Snapshot field values as loaded, so saves can be diffed in memory"""
+            cls.take_snapshot(instance)
         
-        @receiver(post_save, sender=model_class)
+        @receiver(post_save, sender=model_class, weak=False, dispatch_uid=f'{uid}:post_save')
         def post_save_handler(sender, instance, created, **kwargs):
             """Log save operations"""
-            action = 'CREATE' if created else 'UPDATE'
-            
-            # Get changes
             changes = {}
-            if hasattr(instance, '_old_state') and not created:
-                for field in instance._meta.fields:
-                    field_name = field.name
-                    if field_name in ['password', 'created_at', 'updated_at']:
-                        continue
-                    
-                    old_value = instance._old_state.get(field_name)
-                    new_value = getattr(instance, field_name, None)
-                    
-                    if old_value != new_value:
-                        changes[field_name] = {
-                            'old': str(old_value) if old_value is not None else None,
-                            'new': str(new_value) if new_value is not None else None
-                        }
+            snapshot = getattr(instance, '_audit_snapshot', None)
+            if snapshot is not None and not created:
+                changes = cls.diff_snapshot(instance, snapshot)
             
-            # Clean up
-            if hasattr(instance, '_old_state'):
-                del instance._old_state
+            # The saved state is the baseline for the next save of this instance
+            cls.take_snapshot(instance)
             
-            # Log the audit
+            if not created and not changes:
+                return
+            current = cls._current_request(request)
             Logger.log_audit(
-                user=user or (request.user if request and hasattr(request, 'user') else None),
-                action=action,
+                user=cls._acting_user(current, user),
+                action='CREATE' if created else 'UPDATE',
                 model_name=sender.__name__,
                 object_id=instance.pk,
                 object_repr=str(instance),
                 changes=changes,
-                request=request
-            )
-            
-            # Log activity
-            if action == 'CREATE':
-                activity_msg = f'Created {sender.__name__.lower()}: {instance}'
-                log_type = 'create'
-            else:
-                activity_msg = f'Updated {sender.__name__.lower()}: {instance}'
-                log_type = 'update'
-            
-            Logger.log_activity(
-                user=user or (request.user if request and hasattr(request, 'user') else None),
-                log_type=log_type,
-                module=sender.__name__.lower(),
-                action=activity_msg,
-                request=request,
-                status='success'
+                request=current
             )
         
-        @receiver(post_delete, sender=model_class)
+        @receiver(post_delete, sender=model_class, weak=False, dispatch_uid=f'{uid}:post_delete')
         def post_delete_handler(sender, instance, **kwargs):
             """Log delete operations"""
+            current = cls._current_request(request)
             Logger.log_audit(
-                user=user or (request.user if request and hasattr(request, 'user') else None),
+                user=cls._acting_user(current, user),
                 action='DELETE',
                 model_name=sender.__name__,
                 object_id=instance.pk,
                 object_repr=str(instance),
                 changes={},
-                request=request
+                request=current
             )
-            
-            Logger.log_activity(
-                user=user or (request.user if request and hasattr(request, 'user') else None),
-                log_type='delete',
-                module=sender.__name__.lower(),
-                action=f'Deleted {sender.__name__.lower()}: {instance}',
-                request=request,
-                status='success'
+        
+        return post_init_handler, post_save_handler, post_delete_handler
+    
+    @classmethod
+    def audited_update(cls, queryset, user=None, request=None, **values):
+        """
+        queryset.update(**values) that also writes one AuditLog entry per row
+        it actually changed. The rows are read once and diffed in memory, so
+        this costs one SELECT and one UPDATE regardless of the row count.
+
+        The rows are locked while they are read (SELECT ... FOR UPDATE where
+        the database supports it) and read and updated in one transaction, so
+        the recorded old values are the ones the update replaced; the audit
+        entries are only handed to the log writer once that transaction
+        commits.
+        """
+        model_class = queryset.model
+        fields = dict(cls.get_audited_fields(model_class))
+        new_values = {}
+        for name, value in values.items():
+            attname = fields.get(name, name)
+            # Store FK targets by primary key, the way they sit in __dict__
+            new_values[attname] = value.pk if hasattr(value, '_meta') else value
+        
+        using = router.db_for_write(model_class)
+        with transaction.atomic(using=using):
+            # Admin action querysets carry the changelist's select_related,
+            # which only() cannot be combined with
+            instances = list(
+                queryset.using(using).select_related(None).select_for_update().only(*values.keys())
             )
+            updated = model_class._default_manager.using(using).filter(
+                pk__in=[instance.pk for instance in instances]
+            ).update(**values)
+            
+            entries = []
+            for instance in instances:
+                if not hasattr(instance, '_audit_snapshot'):
+                    cls.take_snapshot(instance)
+                changes = cls.diff_snapshot(instance, instance._audit_snapshot, new_values)
+                if changes:
+                    entries.append((instance.pk, changes))
+            
+            def write_audit_entries():
+                for pk, changes in entries:
+                    Logger.log_audit(
+                        user=cls._acting_user(request, user),
+                        action='UPDATE',
+                        model_name=model_class.__name__,
+                        object_id=pk,
+                        object_repr=f'{model_class.__name__} object ({pk})',
+                        changes=changes,
+                        request=request
+                    )
+            
+            transaction.on_commit(write_audit_entries, using=using)
         
-        return pre_save_handler, post_save_handler, post_delete_handler
\ No newline at end of file
+        return updated
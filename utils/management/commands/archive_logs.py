@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from utils.log_archive import LOG_MODELS, LogArchiver
+from utils.log_writer import flush_logs
+
+
+class Command(BaseCommand):
+    help = (
+        "Move log rows older than their retention window (LOG_RETENTION) out of "
+        "the hot ActivityLog/AuditLog/SystemLog/LoginLog tables into monthly "
+        "archive tables or gzipped JSONL files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'models', nargs='*', metavar='model',
+            help=f"Log models to archive (default: all of {', '.join(LOG_MODELS)})",
+        )
+        parser.add_argument('--days', type=int, help="Override HOT_DAYS for this run")
+        parser.add_argument(
+            '--mode', choices=['table', 'file', 'delete'],
+            help="Override the ARCHIVE mode for this run",
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--limit', type=int, help="Stop after this many rows per model")
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Only report how many rows would be archived",
+        )
+        parser.add_argument(
+            '--vacuum', action='store_true',
+            help="Run VACUUM afterwards to give the space back (SQLite only)",
+        )
+
+    def handle(self, *args, **options):
+        names = options['models'] or list(LOG_MODELS)
+        unknown = [name for name in names if name not in LOG_MODELS]
+        if unknown:
+            raise CommandError(f"Unknown log model(s): {', '.join(unknown)}")
+
+        # Rows still sitting in the buffered writer belong in the hot table
+        flush_logs()
+
+        used_databases = set()
+        for name in names:
+            archiver = LogArchiver(
+                LOG_MODELS[name],
+                hot_days=options['days'],
+                mode=options['mode'],
+                batch_size=options['batch_size'],
+            )
+            if options['dry_run']:
+                count = archiver.expired().count()
+                self.stdout.write(
+                    f"{name}: {count} row(s) older than {archiver.hot_days} days "
+                    f"would be archived ({archiver.mode})"
+                )
+                continue
+
+            moved = archiver.archive(limit=options['limit'])
+            used_databases.add(archiver.db)
+            self.stdout.write(self.style.SUCCESS(
+                f"{name}: archived {moved} row(s) older than {archiver.hot_days} days ({archiver.mode})"
+            ))
+
+        if options['vacuum']:
+            for alias in used_databases:
+                connection = connections[alias]
+                if connection.vendor == 'sqlite':
+                    with connection.cursor() as cursor:
+                        cursor.execute('VACUUM')
@@ -0,0 +1,127 @@
+import json
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from utils.sqlite_bench import read_worker, write_worker
+
+
+def _percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round((len(ordered) - 1) * fraction)))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure SQLite lock waits with several processes writing (and some "
+        "reading) at once, on a scratch database: the plain SQLite defaults "
+        "against SQLITE_PRAGMAS with IMMEDIATE transactions, with and "
+        "without the single-writer lock."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4, help="Writer processes")
+        parser.add_argument('--readers', type=int, default=2, help="Reader processes")
+        parser.add_argument('--transactions', type=int, default=200, help="Transactions per writer")
+        parser.add_argument('--rows', type=int, default=20, help="Rows inserted per transaction")
+        parser.add_argument('--read-seconds', type=float, default=2.0, help="How long each reader runs")
+        parser.add_argument('--busy-timeout', type=float, default=5.0, help="Seconds a connection waits for a lock")
+        parser.add_argument('--output', help="Also write the results as JSON to this file")
+
+    def profiles(self):
+        tuned = [pragma for pragma in getattr(settings, 'SQLITE_PRAGMAS', []) if 'busy_timeout' not in pragma]
+        return [
+            ('defaults', [], 'BEGIN', False),
+            ('tuned', tuned, 'BEGIN IMMEDIATE', False),
+            ('tuned+single-writer', tuned, 'BEGIN IMMEDIATE', True),
+        ]
+
+    def handle(self, *args, **options):
+        results = {}
+        for name, pragmas, begin, single_writer in self.profiles():
+            results[name] = self.run_profile(pragmas, begin, single_writer, options)
+            self.report(name, results[name])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                json.dump({'options': {
+                    key: options[key] for key in ('writers', 'readers', 'transactions', 'rows', 'read_seconds', 'busy_timeout')
+                }, 'results': results}, fh, indent=2)
+
+    def run_profile(self, pragmas, begin, single_writer, options):
+        directory = tempfile.mkdtemp(prefix='sqlite-locks-')
+        try:
+            path = os.path.join(directory, 'bench.sqlite3')
+            with sqlite3.connect(path) as connection:
+                for pragma in pragmas:
+                    connection.execute(pragma)
+                connection.execute(
+                    'CREATE TABLE bench_log (id INTEGER PRIMARY KEY AUTOINCREMENT, worker INTEGER, payload TEXT)'
+                )
+            lock_file = os.path.join(directory, 'bench.sqlite3.writer-lock') if single_writer else None
+
+            writers, readers = options['writers'], options['readers']
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=writers + readers, mp_context=context) as pool:
+                # Start the pool's processes before the clock runs
+                list(pool.map(time.sleep, [0.2] * (writers + readers)))
+                started = time.perf_counter()
+                write_jobs = [
+                    pool.submit(
+                        write_worker, path, pragmas, options['busy_timeout'], begin, lock_file,
+                        options['transactions'], options['rows'],
+                    )
+                    for _ in range(writers)
+                ]
+                read_jobs = [
+                    pool.submit(read_worker, path, pragmas, options['busy_timeout'], options['read_seconds'])
+                    for _ in range(readers)
+                ]
+                waits, write_errors = [], 0
+                for job in write_jobs:
+                    worker_waits, worker_errors = job.result()
+                    waits.extend(worker_waits)
+                    write_errors += worker_errors
+                elapsed = time.perf_counter() - started
+                reads, read_errors = [], 0
+                for job in read_jobs:
+                    worker_reads, worker_errors = job.result()
+                    reads.extend(worker_reads)
+                    read_errors += worker_errors
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        committed = len(waits)
+        return {
+            'transactions': writers * options['transactions'],
+            'committed': committed,
+            'write_errors': write_errors,
+            'seconds': round(elapsed, 3),
+            'commits_per_second': round(committed / elapsed, 1) if elapsed else None,
+            'lock_wait_total_s': round(sum(waits), 3),
+            'lock_wait_p50_ms': round(_percentile(waits, 0.5) * 1000, 2),
+            'lock_wait_p95_ms': round(_percentile(waits, 0.95) * 1000, 2),
+            'lock_wait_max_ms': round(max(waits, default=0) * 1000, 2),
+            'reads': len(reads),
+            'read_errors': read_errors,
+            'read_p95_ms': round(_percentile(reads, 0.95) * 1000, 2),
+            'read_mean_ms': round(statistics.fmean(reads) * 1000, 3) if reads else None,
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            f"{name:>20}: {result['committed']}/{result['transactions']} committed "
+            f"({result['write_errors']} lock errors) in {result['seconds']}s, "
+            f"lock wait p50 {result['lock_wait_p50_ms']} ms / p95 {result['lock_wait_p95_ms']} ms / "
+            f"max {result['lock_wait_max_ms']} ms, total {result['lock_wait_total_s']}s; "
+            f"{result['reads']} reads ({result['read_errors']} errors), read p95 {result['read_p95_ms']} ms"
+        )
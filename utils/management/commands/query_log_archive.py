@@ -0,0 +1,57 @@
+import json
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.forms.models import model_to_dict
+from django.utils import timezone
+
+from utils.log_archive import LOG_MODELS, LogArchiver
+
+
+class Command(BaseCommand):
+    help = "Print archived log rows as JSON lines, optionally filtered by date range and column."
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=list(LOG_MODELS))
+        parser.add_argument('--start', help="Earliest date (YYYY-MM-DD), inclusive")
+        parser.add_argument('--end', help="Latest date (YYYY-MM-DD), inclusive")
+        parser.add_argument(
+            '--filter', action='append', default=[], metavar='COLUMN=VALUE',
+            help="Exact match on a column, e.g. --filter level=ERROR (repeatable)",
+        )
+        parser.add_argument('--months', action='store_true', help="Only list archived months")
+
+    def parse_day(self, value, end=False):
+        try:
+            day = datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f"Invalid date {value!r}, expected YYYY-MM-DD")
+        if end:
+            day = day + timedelta(days=1)
+        return timezone.make_aware(datetime.combine(day, time.min))
+
+    def handle(self, *args, **options):
+        archiver = LogArchiver(LOG_MODELS[options['model']])
+
+        if options['months']:
+            for month in archiver.archived_months():
+                self.stdout.write(month.strftime('%Y-%m'))
+            return
+
+        start = self.parse_day(options['start']) if options['start'] else None
+        end = self.parse_day(options['end'], end=True) if options['end'] else None
+        filters = {}
+        for item in options['filter']:
+            column, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f"Invalid filter {item!r}, expected COLUMN=VALUE")
+            if column not in archiver.attnames:
+                raise CommandError(f"Unknown column {column!r} for {options['model']}")
+            filters[column] = value
+
+        for row in archiver.query(start=start, end=end, **filters):
+            data = model_to_dict(row)
+            data['id'] = row.pk
+            data['created_at'] = row.created_at
+            self.stdout.write(json.dumps(data, cls=DjangoJSONEncoder))
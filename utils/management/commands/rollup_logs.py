@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from utils.log_archive import LogArchiver
+from utils.log_writer import flush_logs
+from utils.rollups import ROLLUP_DIMENSIONS, prune_hourly_rollups, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the hourly/daily log rollups behind the logs dashboard from the "
+        "raw log tables, and prune old hourly rollups. Run periodically when "
+        "LOG_ROLLUPS['INCREMENTAL'] is off, or to repair drift."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First day to rebuild (YYYY-MM-DD)")
+        parser.add_argument('--end', help="Last day to rebuild (YYYY-MM-DD), default today")
+        parser.add_argument(
+            '--days', type=int, default=1,
+            help="Without --start, rebuild today and this many days before it (default 1)",
+        )
+        parser.add_argument(
+            '--prune', action='store_true',
+            help="Also delete hourly rollups older than LOG_ROLLUPS['HOURLY_DAYS']",
+        )
+
+    def parse_day(self, value):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f"Invalid date {value!r}, expected YYYY-MM-DD")
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        end_day = self.parse_day(options['end']) if options['end'] else today
+        if options['start']:
+            start_day = self.parse_day(options['start'])
+        else:
+            start_day = end_day - timedelta(days=options['days'])
+        if start_day > end_day:
+            raise CommandError("--start must not be after --end")
+
+        flush_logs()
+
+        for model in ROLLUP_DIMENSIONS:
+            # Rebuilding a day whose rows were archived would undercount it
+            first_hot_day = timezone.localtime(LogArchiver(model).cutoff()).date() + timedelta(days=1)
+            model_start = max(start_day, first_hot_day)
+            if model_start > end_day:
+                self.stdout.write(f"{model.__name__}: range is outside the hot window, skipped")
+                continue
+            if model_start != start_day:
+                self.stdout.write(self.style.WARNING(
+                    f"{model.__name__}: starting at {model_start}, earlier rows are archived"
+                ))
+            created = rebuild_rollups(model_start, end_day, models=[model])
+            self.stdout.write(self.style.SUCCESS(
+                f"{model.__name__}: rebuilt {created} daily rollup row(s) for {model_start}..{end_day}"
+            ))
+
+        if options['prune']:
+            deleted = prune_hourly_rollups()
+            self.stdout.write(f"Pruned {deleted} hourly rollup row(s)")
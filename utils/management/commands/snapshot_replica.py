@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from utils.db_routing import get_replica_settings, snapshot_replica
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the SQLite primary database onto the read replica's file, once "
+        "or every --interval seconds, for local use of the primary/replica "
+        "routing without a database server."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float,
+            help="Keep running and take a snapshot every this many seconds",
+        )
+
+    def handle(self, *args, **options):
+        alias = get_replica_settings()['ALIAS']
+        if alias not in connections.settings:
+            raise CommandError(f"DATABASES has no {alias!r} entry to snapshot into")
+        if connections['default'].vendor != 'sqlite' or connections[alias].vendor != 'sqlite':
+            raise CommandError("Snapshots are only for SQLite; use the database's own replication otherwise")
+
+        while True:
+            seconds = snapshot_replica(alias=alias)
+            self.stdout.write(f"Snapshot of the primary written to {alias!r} in {seconds:.2f}s")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,386 @@
+import atexit
+import bisect
+import json
+import math
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from .db_writer import FileWriteLock
+
+
+DEFAULT_METRICS_SETTINGS = {
+    # Directory every worker process writes its snapshot to, so a scrape of
+    # any one of them reports the sum over all of them; None keeps the
+    # numbers per process
+    'DIRECTORY': None,
+    # Seconds between two snapshot writes of a process (done at the end of
+    # a request, never from a thread of its own)
+    'FLUSH_INTERVAL': 5.0,
+    # Client addresses allowed to scrape /metrics (loopback, for a
+    # Prometheus on the same host); empty allows everyone
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+}
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def get_metrics_settings():
+    """Merge METRICS from settings over the defaults"""
+    config = dict(DEFAULT_METRICS_SETTINGS)
+    config.update(getattr(settings, 'METRICS', {}) or {})
+    return config
+
+
+# -- per-thread shards ------------------------------------------------------
+# Every thread updates only its own shard, so recording takes no lock and
+# cannot race; readers copy each shard (a single C-level dict copy) and sum.
+# Once a thread has finished its shard is folded into _retired, so a server
+# starting a thread per request keeps one shard per live thread.
+
+class _Shard:
+    def __init__(self):
+        self.values = {}
+        self.histograms = {}
+
+    def merge(self, other):
+        for key, value in other.values.copy().items():
+            self.values[key] = self.values.get(key, 0) + value
+        for key, state in other.histograms.copy().items():
+            total = self.histograms.get(key)
+            self.histograms[key] = list(state) if total is None else [a + b for a, b in zip(total, state)]
+
+
+_local = threading.local()
+_shards = []            # (thread, shard) of the threads that recorded something
+_retired = _Shard()     # shards of the threads that have finished
+_shards_lock = threading.Lock()
+
+
+def _prune():
+    """Fold the shards of finished threads into _retired; holds _shards_lock"""
+    live = []
+    for thread, shard in _shards:
+        if thread.is_alive():
+            live.append((thread, shard))
+        else:
+            _retired.merge(shard)
+    _shards[:] = live
+
+
+def _shard():
+    shard = getattr(_local, 'shard', None)
+    if shard is None:
+        shard = _local.shard = _Shard()
+        with _shards_lock:
+            _prune()
+            _shards.append((threading.current_thread(), shard))
+    return shard
+
+
+class Metric:
+    type = 'untyped'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        _registry[name] = self
+
+    def _key(self, label_values):
+        if len(label_values) != len(self.labels):
+            raise ValueError(f"{self.name} takes the labels {self.labels}, got {label_values}")
+        return (self.name, tuple(str(value) for value in label_values))
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, *label_values, amount=1):
+        values = _shard().values
+        key = self._key(label_values)
+        values[key] = values.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *label_values):
+        histograms = _shard().histograms
+        key = self._key(label_values)
+        state = histograms.get(key)
+        if state is None:
+            # per-bucket (not cumulative) counts, the +Inf bucket, then the sum
+            state = histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+
+class Gauge(Metric):
+    """A value read from `callback` when the metrics are collected"""
+
+    type = 'gauge'
+
+    def __init__(self, name, documentation, callback, labels=(), type=None):
+        super().__init__(name, documentation, labels)
+        self.callback = callback
+        if type is not None:
+            self.type = type
+
+    def collect(self):
+        """[(label values, value)]"""
+        try:
+            return [(tuple(str(v) for v in labels), value) for labels, value in self.callback()]
+        except Exception:
+            return []
+
+
+_registry = {}
+
+
+# -- collection and multi-process aggregation -------------------------------
+
+def snapshot():
+    """This process's metrics as {'values': {key: value}, 'histograms': {key: state}}"""
+    total = _Shard()
+    with _shards_lock:
+        _prune()
+        total.merge(_retired)
+        for _, shard in _shards:
+            total.merge(shard)
+    values, histograms = total.values, total.histograms
+    for metric in list(_registry.values()):
+        if isinstance(metric, Gauge):
+            for labels, value in metric.collect():
+                values[(metric.name, labels)] = value
+    return {'values': values, 'histograms': histograms}
+
+
+def _encode(data, **extra):
+    return {
+        **extra,
+        'values': [[name, list(labels), value] for (name, labels), value in data['values'].items()],
+        'histograms': [[name, list(labels), state] for (name, labels), state in data['histograms'].items()],
+    }
+
+
+def _decode(payload):
+    return {
+        'values': {(name, tuple(labels)): value for name, labels, value in payload['values']},
+        'histograms': {(name, tuple(labels)): state for name, labels, state in payload['histograms']},
+    }
+
+
+def _to_shard(data, gauges=True):
+    shard = _Shard()
+    for key, value in data['values'].items():
+        metric = _registry.get(key[0])
+        if not gauges and isinstance(metric, Gauge) and metric.type == 'gauge':
+            continue
+        shard.values[key] = value
+    shard.histograms = dict(data['histograms'])
+    return shard
+
+
+_flush_lock = threading.Lock()
+_last_flush = 0.0
+
+# Counters and histograms of the processes that have exited, folded into one
+# file so the directory does not fill up with a snapshot per recycled worker
+RETIRED_FILENAME = 'metrics-retired.json'
+LOCK_FILENAME = 'metrics.lock'
+
+
+def _snapshot_path(directory, pid=None):
+    return os.path.join(directory, f'metrics-{pid or os.getpid()}.json')
+
+
+def _read(path):
+    try:
+        with open(path, encoding='utf-8') as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(path, payload):
+    temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as fh:
+        json.dump(payload, fh)
+    os.replace(temporary, path)
+
+
+def flush(force=False):
+    """Write this process's snapshot to METRICS['DIRECTORY'] if one is configured"""
+    global _last_flush
+    config = get_metrics_settings()
+    directory = config['DIRECTORY']
+    if not directory:
+        return False
+    if not force and time.monotonic() - _last_flush < config['FLUSH_INTERVAL']:
+        return False
+    # Whoever holds the lock is already writing a fresh snapshot
+    if not _flush_lock.acquire(blocking=False):
+        return False
+    try:
+        os.makedirs(directory, exist_ok=True)
+        _write(_snapshot_path(directory), _encode(snapshot(), pid=os.getpid(), written_at=time.time()))
+        _last_flush = time.monotonic()
+        return True
+    finally:
+        _flush_lock.release()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect():
+    """
+    The metrics of every process writing to METRICS['DIRECTORY'] (or just
+    this one): counters and histograms are summed over all snapshots, dead
+    processes included so totals don't go backwards when a worker is
+    recycled; gauges only over the processes that are still running.
+
+    The snapshot of a dead process is folded into RETIRED_FILENAME and
+    removed, under a lock file so two scrapes never fold it twice. The
+    retired file remembers the snapshots its last fold took in, so one left
+    behind by an interrupted fold is removed without being counted again.
+    """
+    directory = get_metrics_settings()['DIRECTORY']
+    if not directory:
+        return snapshot()
+
+    flush(force=True)
+    retired_path = os.path.join(directory, RETIRED_FILENAME)
+    lock = FileWriteLock(os.path.join(directory, LOCK_FILENAME))
+    lock.acquire()
+    try:
+        payload = _read(retired_path)
+        retired = _to_shard(_decode(payload)) if payload else _Shard()
+        folded = payload.get('folded', {}) if payload else {}
+        live, dead = [], []
+        for filename in os.listdir(directory):
+            if not (filename.startswith('metrics-') and filename.endswith('.json')):
+                continue
+            if filename == RETIRED_FILENAME:
+                continue
+            path = os.path.join(directory, filename)
+            payload = _read(path)
+            if payload is None:
+                continue
+            if _pid_alive(payload['pid']):
+                live.append(payload)
+            else:
+                dead.append((path, payload))
+
+        if dead:
+            newly_folded = {}
+            for path, payload in dead:
+                pid = str(payload['pid'])
+                if folded.get(pid) != payload['written_at']:
+                    retired.merge(_to_shard(_decode(payload), gauges=False))
+                newly_folded[pid] = payload['written_at']
+            _write(retired_path, _encode(vars(retired), folded=newly_folded))
+            for path, _ in dead:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+    finally:
+        lock.release()
+
+    total = _Shard()
+    total.merge(retired)
+    for payload in live:
+        total.merge(_to_shard(_decode(payload)))
+    return {'values': total.values, 'histograms': total.histograms}
+
+
+# -- exposition -------------------------------------------------------------
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render(data=None):
+    """The metrics in the Prometheus text exposition format (version 0.0.4)"""
+    data = collect() if data is None else data
+    lines = []
+    for name in sorted(_registry):
+        metric = _registry[name]
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.type}')
+        if isinstance(metric, Histogram):
+            series = sorted((labels, state) for (key, labels), state in data['histograms'].items() if key == name)
+            for labels, state in series:
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (math.inf,), state[:-1]):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_labels(metric.labels, labels, [("le", _number(bound))])} {cumulative}')
+                lines.append(f'{name}_sum{_labels(metric.labels, labels)} {_number(state[-1])}')
+                lines.append(f'{name}_count{_labels(metric.labels, labels)} {cumulative}')
+        else:
+            series = sorted((labels, value) for (key, labels), value in data['values'].items() if key == name)
+            for labels, value in series:
+                lines.append(f'{name}{_labels(metric.labels, labels)} {_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        flush(force=True)
+    except Exception:
+        pass
+
+
+# -- the application's metrics ----------------------------------------------
+
+def _log_writer_stats():
+    from .log_writer import _writer
+    return _writer.stats() if _writer is not None else {'queued': 0, 'written': 0, 'dropped': 0}
+
+
+REQUESTS = Counter('ems_http_requests_total', "HTTP requests by view, method and status", ('view', 'method', 'status'))
+REQUEST_DURATION = Histogram('ems_http_request_duration_seconds', "Request latency by view", ('view',))
+DB_QUERIES = Counter('ems_db_queries_total', "SQL statements run while handling requests, by view", ('view',))
+DB_TIME = Counter('ems_db_query_seconds_total', "Seconds spent in SQL while handling requests, by view", ('view',))
+LOGINS = Counter('ems_logins_total', "Login attempts by outcome", ('status',))
+CACHE_REQUESTS = Counter('ems_cache_requests_total', "Application cache lookups by cache and result (hit/miss)", ('cache', 'result'))
+LOG_QUEUE_DEPTH = Gauge(
+    'ems_log_queue_depth', "Log records waiting in the buffered log writer",
+    lambda: [((), _log_writer_stats()['queued'])],
+)
+LOG_RECORDS = Gauge(
+    'ems_log_records_total', "Log records written or dropped by the log writer",
+    lambda: [(('written',), _log_writer_stats()['written']), (('dropped',), _log_writer_stats()['dropped'])],
+    labels=('result',), type='counter',
+)
@@ -0,0 +1,49 @@
+# Hourly and daily rollup tables the logs dashboard reads its counts from
+# (utils.rollups)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utils', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyLogRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('log_table', models.CharField(choices=[('ActivityLog', 'Activity Log'), ('LoginLog', 'Login Log'), ('SystemLog', 'System Log')], max_length=20, verbose_name='Log Table')),
+                ('dimension', models.CharField(max_length=20, verbose_name='Dimension')),
+                ('value', models.CharField(max_length=20, verbose_name='Value')),
+                ('row_count', models.PositiveIntegerField(default=0, verbose_name='Row Count')),
+                ('day', models.DateField(verbose_name='Day')),
+            ],
+            options={
+                'verbose_name': 'Daily Log Rollup',
+                'verbose_name_plural': 'Daily Log Rollups',
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['log_table', 'dimension', 'day'], name='utils_daily_log_tab_5ae70f_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'log_table', 'dimension', 'value'), name='utils_daily_rollup_key')],
+            },
+        ),
+        migrations.CreateModel(
+            name='HourlyLogRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('log_table', models.CharField(choices=[('ActivityLog', 'Activity Log'), ('LoginLog', 'Login Log'), ('SystemLog', 'System Log')], max_length=20, verbose_name='Log Table')),
+                ('dimension', models.CharField(max_length=20, verbose_name='Dimension')),
+                ('value', models.CharField(max_length=20, verbose_name='Value')),
+                ('row_count', models.PositiveIntegerField(default=0, verbose_name='Row Count')),
+                ('hour', models.DateTimeField(verbose_name='Hour')),
+            ],
+            options={
+                'verbose_name': 'Hourly Log Rollup',
+                'verbose_name_plural': 'Hourly Log Rollups',
+                'ordering': ['-hour'],
+                'constraints': [models.UniqueConstraint(fields=('hour', 'log_table', 'dimension', 'value'), name='utils_hourly_rollup_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Fill the new rollup tables from the log rows already in the database
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+
+# Frozen copy of utils.rollups.ROLLUP_DIMENSIONS at the time of this migration
+DIMENSIONS = {
+    'ActivityLog': ('log_type', 'status', 'module'),
+    'LoginLog': ('status',),
+    'SystemLog': ('level',),
+}
+
+
+def backfill_rollups(apps, schema_editor):
+    """
+    The dashboard reads its totals from the rollups only, so fill them from
+    every row already in the log tables (the hot window; archived rows are
+    gone from them). Hourly rollups only cover LOG_ROLLUPS['HOURLY_DAYS'].
+    """
+    db = schema_editor.connection.alias
+    HourlyLogRollup = apps.get_model('utils', 'HourlyLogRollup')
+    DailyLogRollup = apps.get_model('utils', 'DailyLogRollup')
+    tz = timezone.get_current_timezone()
+    hourly_days = (getattr(settings, 'LOG_ROLLUPS', {}) or {}).get('HOURLY_DAYS', 30)
+    hourly_since = timezone.now() - timedelta(days=hourly_days)
+
+    for table, dimensions in DIMENSIONS.items():
+        rows = apps.get_model('utils', table).objects.using(db).order_by()
+        HourlyLogRollup.objects.using(db).filter(log_table=table).delete()
+        DailyLogRollup.objects.using(db).filter(log_table=table).delete()
+        for dimension in dimensions:
+            hourly = (
+                rows.filter(created_at__gte=hourly_since)
+                .annotate(bucket=TruncHour('created_at', tzinfo=tz))
+                .values('bucket', dimension)
+                .annotate(total=Count('pk'))
+            )
+            HourlyLogRollup.objects.using(db).bulk_create([
+                HourlyLogRollup(
+                    hour=row['bucket'], log_table=table, dimension=dimension,
+                    value=row[dimension], row_count=row['total'],
+                )
+                for row in hourly
+            ], batch_size=1000)
+            daily = (
+                rows.annotate(bucket=TruncDate('created_at', tzinfo=tz))
+                .values('bucket', dimension)
+                .annotate(total=Count('pk'))
+            )
+            DailyLogRollup.objects.using(db).bulk_create([
+                DailyLogRollup(
+                    day=row['bucket'], log_table=table, dimension=dimension,
+                    value=row[dimension], row_count=row['total'],
+                )
+                for row in daily
+            ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utils', '0002_log_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
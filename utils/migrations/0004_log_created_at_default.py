@@ -0,0 +1,27 @@
+# created_at of the log tables defaults to timezone.now instead of
+# auto_now_add, so a buffered record keeps the time it was logged rather
+# than the time of its bulk insert. Python defaults are not part of the
+# schema, so only the migration state changes and no table is rebuilt.
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def created_at():
+    return models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Created At')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utils', '0003_backfill_log_rollups'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(model_name=model_name, name='created_at', field=created_at())
+                for model_name in ('activitylog', 'auditlog', 'loginlog', 'systemlog')
+            ],
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 import uuid
 
@@ -80,7 +81,8 @@ class ActivityLog(models.Model):
     )
     created_at = models.DateTimeField(
         _("Created At"),
-        auto_now_add=True
+        default=timezone.now,
+        editable=False
     )
 
     class Meta:
@@ -145,7 +147,8 @@ class AuditLog(models.Model):
     )
     created_at = models.DateTimeField(
         _("Created At"),
-        auto_now_add=True
+        default=timezone.now,
+        editable=False
     )
 
     class Meta:
@@ -203,7 +206,8 @@ class SystemLog(models.Model):
     )
     created_at = models.DateTimeField(
         _("Created At"),
-        auto_now_add=True
+        default=timezone.now,
+        editable=False
     )
 
     class Meta:
@@ -266,7 +270,8 @@ class LoginLog(models.Model):
     )
     created_at = models.DateTimeField(
         _("Created At"),
-        auto_now_add=True
+        default=timezone.now,
+        editable=False
     )
 
     class Meta:
@@ -281,4 +286,78 @@ class LoginLog(models.Model):
         ]
 
     def __str__(self):
-        return f"{self.username} - {self.status} - {self.created_at}"
\ No newline at end of file
+        return f"{self.username} - {self.status} - {self.created_at}"
+
+class LogRollupBase(models.Model):
+    """Pre-aggregated log counts for one bucket, table, dimension and value"""
+    LOG_TABLES = [
+        ('ActivityLog', _('Activity Log')),
+        ('LoginLog', _('Login Log')),
+        ('SystemLog', _('System Log')),
+    ]
+    
+    log_table = models.CharField(
+        _("Log Table"),
+        max_length=20,
+        choices=LOG_TABLES
+    )
+    dimension = models.CharField(
+        _("Dimension"),
+        max_length=20
+    )
+    value = models.CharField(
+        _("Value"),
+        max_length=20
+    )
+    row_count = models.PositiveIntegerField(
+        _("Row Count"),
+        default=0
+    )
+
+    class Meta:
+        abstract = True
+
+
+class HourlyLogRollup(LogRollupBase):
+    """Log counts per local hour"""
+    hour = models.DateTimeField(
+        _("Hour")
+    )
+
+    class Meta:
+        verbose_name = _("Hourly Log Rollup")
+        verbose_name_plural = _("Hourly Log Rollups")
+        ordering = ['-hour']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['hour', 'log_table', 'dimension', 'value'],
+                name='utils_hourly_rollup_key'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.hour} {self.log_table}.{self.dimension}={self.value}: {self.row_count}"
+
+
+class DailyLogRollup(LogRollupBase):
+    """Log counts per local day"""
+    day = models.DateField(
+        _("Day")
+    )
+
+    class Meta:
+        verbose_name = _("Daily Log Rollup")
+        verbose_name_plural = _("Daily Log Rollups")
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'log_table', 'dimension', 'value'],
+                name='utils_daily_rollup_key'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['log_table', 'dimension', 'day']),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.log_table}.{self.dimension}={self.value}: {self.row_count}"
@@ -0,0 +1,182 @@
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+DEFAULT_PROFILER_SETTINGS = {
+    # False removes ProfilingMiddleware from the stack altogether; off
+    # unless the settings turn it on
+    'ENABLED': False,
+    # Fraction of all requests profiled (0 = only on demand)
+    'SAMPLE_RATE': 0.0,
+    # Staff users can ask for a profile with this header or query parameter
+    'HEADER': 'X-Profile',
+    'QUERY_FLAG': '_profile',
+    # Seconds between two stack samples of a profiled request
+    'INTERVAL': 0.005,
+    # Frames kept per stack (innermost ones are kept when deeper)
+    'MAX_DEPTH': 64,
+    # Distinct stacks kept per view; the rarest are dropped beyond this
+    'MAX_STACKS': 2000,
+}
+
+CACHE_PREFIX = 'profiler'
+INDEX_KEY = f'{CACHE_PREFIX}:views'
+
+
+def get_profiler_settings():
+    """Merge PROFILER from settings over the defaults"""
+    config = dict(DEFAULT_PROFILER_SETTINGS)
+    config.update(getattr(settings, 'PROFILER', {}) or {})
+    return config
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def collapse(frame, max_depth):
+    """A frame's stack as 'outer;...;inner', the collapsed-stack format of flame graph tools"""
+    labels = []
+    while frame is not None and len(labels) < max_depth:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ';'.join(labels)
+
+
+class StackSampler:
+    """
+    Wall-clock sampling profiler for request threads. One daemon thread per
+    process wakes every `interval` seconds while at least one thread is
+    being profiled and counts the current stack of each of them; it sleeps
+    on an event (no wake-ups at all) while nothing is profiled.
+    """
+
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self._profiled = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start(self, thread_id=None):
+        """Start sampling a thread (the calling one by default)"""
+        thread_id = thread_id or threading.get_ident()
+        with self._lock:
+            self._profiled[thread_id] = Counter()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def stop(self, thread_id=None):
+        """Stop sampling a thread; returns its Counter of collapsed stacks"""
+        with self._lock:
+            return self._profiled.pop(thread_id or threading.get_ident(), Counter())
+
+    def _run(self):
+        while True:
+            if not self._profiled:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, stacks in self._profiled.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[collapse(frame, self.max_depth)] += 1
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler():
+    global _sampler
+    if _sampler is None:
+        with _sampler_lock:
+            if _sampler is None:
+                config = get_profiler_settings()
+                _sampler = StackSampler(config['INTERVAL'], config['MAX_DEPTH'])
+    return _sampler
+
+
+# -- aggregation ------------------------------------------------------------
+# Stacks are summed per view in the default cache, so every worker sharing
+# that cache contributes to the same profile (with the local-memory cache
+# the admin page shows the worker that served it).
+
+_record_lock = threading.Lock()
+
+
+def _view_key(view_name):
+    return f'{CACHE_PREFIX}:view:{view_name}'
+
+
+def record(view_name, stacks, duration, max_stacks=None):
+    """Add one profiled request's stacks to its view's totals"""
+    if max_stacks is None:
+        max_stacks = get_profiler_settings()['MAX_STACKS']
+    key = _view_key(view_name)
+    with _record_lock:
+        entry = cache.get(key) or {'requests': 0, 'samples': 0, 'seconds': 0.0, 'stacks': {}}
+        entry['requests'] += 1
+        entry['samples'] += sum(stacks.values())
+        entry['seconds'] += duration
+        totals = Counter(entry['stacks'])
+        totals.update(stacks)
+        entry['stacks'] = dict(totals.most_common(max_stacks))
+        cache.set(key, entry, None)
+
+        index = cache.get(INDEX_KEY) or []
+        if view_name not in index:
+            cache.set(INDEX_KEY, index + [view_name], None)
+
+
+def get_profiles():
+    """[{'view', 'requests', 'samples', 'seconds', 'stacks'}] sorted by samples"""
+    views = cache.get(INDEX_KEY) or []
+    entries = cache.get_many([_view_key(view) for view in views])
+    profiles = [
+        dict(entries[_view_key(view)], view=view)
+        for view in views if _view_key(view) in entries
+    ]
+    return sorted(profiles, key=lambda profile: profile['samples'], reverse=True)
+
+
+def get_profile(view_name):
+    entry = cache.get(_view_key(view_name))
+    return dict(entry, view=view_name) if entry else None
+
+
+def collapsed_stacks(profile):
+    """'stack count' lines, the input format of flamegraph.pl and speedscope"""
+    return ''.join(
+        f'{stack} {count}\n'
+        for stack, count in sorted(profile['stacks'].items(), key=lambda item: item[1], reverse=True)
+    )
+
+
+def top_frames(profile, limit=20):
+    """[(frame, self samples, total samples)] of the frames samples were taken in"""
+    own, total = Counter(), Counter()
+    for stack, count in profile['stacks'].items():
+        frames = stack.split(';')
+        own[frames[-1]] += count
+        for frame in set(frames):
+            total[frame] += count
+    return [(frame, count, total[frame]) for frame, count in own.most_common(limit)]
+
+
+def reset():
+    views = cache.get(INDEX_KEY) or []
+    cache.delete_many([_view_key(view) for view in views] + [INDEX_KEY])
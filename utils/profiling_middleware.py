@@ -0,0 +1,75 @@
+import random
+import time
+
+from django.core.exceptions import MiddlewareNotUsed
+
+from utils import profiler
+from utils.admin import ProfilerView
+from utils.logging_utils import Logger
+
+
+class ProfilingMiddleware:
+    """
+    Sample the stacks of a request while its view runs and add them to the
+    view's profile (utils.profiler), shown on the admin profiler page.
+
+    A request is profiled when a staff user sends the PROFILER header or
+    query flag, or when it is picked by PROFILER['SAMPLE_RATE']. Requests
+    that are not profiled cost a header lookup and, with a sample rate set,
+    one random(); with PROFILER['ENABLED'] off the middleware is dropped.
+    """
+
+    def __init__(self, get_response):
+        config = profiler.get_profiler_settings()
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = config['SAMPLE_RATE']
+        self.header = 'HTTP_' + config['HEADER'].upper().replace('-', '_')
+        self.query_flag = config['QUERY_FLAG']
+        self.max_stacks = config['MAX_STACKS']
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            profiled = getattr(request, 'profiled_view', None)
+            if profiled is not None:
+                stacks = self.finish(*profiled)
+        if profiled is not None:
+            response['X-Profiled-Samples'] = str(sum(stacks.values()))
+        return response
+
+    def wants_profile(self, request):
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        if self.header in request.META or self.query_flag in request.GET:
+            user = getattr(request, 'user', None)
+            return bool(user is not None and user.is_authenticated and user.is_staff)
+        return False
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Sampling starts here so URL resolution and the outer middleware are left out"""
+        if not self.wants_profile(request):
+            return None
+        # The profiler page itself would only profile its own rendering
+        if getattr(view_func, 'view_class', None) is ProfilerView:
+            return None
+        # The URL name, as for the /metrics counters: one profile per admin
+        # changelist or class-based view rather than per shared view function
+        view_name = request.resolver_match.view_name
+        if self.query_flag in request.GET:
+            # Views that validate their parameters (admin changelists) must not see it
+            request.GET = request.GET.copy()
+            del request.GET[self.query_flag]
+        request.profiled_view = (view_name, time.perf_counter())
+        profiler.get_sampler().start()
+        return None
+
+    def finish(self, view_name, started):
+        stacks = profiler.get_sampler().stop()
+        try:
+            profiler.record(view_name, stacks, time.perf_counter() - started, self.max_stacks)
+        except Exception as e:
+            Logger.log_system_error('ProfilingMiddleware', str(e))
+        return stacks
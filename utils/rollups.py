@@ -0,0 +1,165 @@
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, router, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+from .models import ActivityLog, LoginLog, SystemLog, HourlyLogRollup, DailyLogRollup
+
+
+# Columns counted for each log table
+ROLLUP_DIMENSIONS = {
+    ActivityLog: ('log_type', 'status', 'module'),
+    LoginLog: ('status',),
+    SystemLog: ('level',),
+}
+
+DEFAULT_ROLLUP_SETTINGS = {
+    # update the rollups from the log writer as rows are written; when off,
+    # run `manage.py rollup_logs` periodically instead
+    'INCREMENTAL': True,
+    # hourly rollups older than this are removed by `rollup_logs --prune`
+    'HOURLY_DAYS': 30,
+}
+
+
+def get_rollup_settings():
+    config = dict(DEFAULT_ROLLUP_SETTINGS)
+    config.update(getattr(settings, 'LOG_ROLLUPS', {}) or {})
+    return config
+
+
+def hour_bucket(created_at):
+    """Start of the local hour a timestamp falls in"""
+    return timezone.localtime(created_at).replace(minute=0, second=0, microsecond=0)
+
+
+def _increment(model, key, amount):
+    """row_count += amount for one rollup key, creating the row if needed"""
+    rows = model.objects.filter(**key)
+    if rows.update(row_count=F('row_count') + amount):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(row_count=amount, **key)
+    except IntegrityError:
+        # Another writer created it in the meantime
+        rows.update(row_count=F('row_count') + amount)
+
+
+def record_log_rows(records):
+    """
+    Log writer hook: fold freshly written log rows into the hourly and daily
+    rollups. Rows are counted in memory first so a buffered batch costs one
+    UPDATE per distinct (bucket, table, dimension, value), not one per row.
+    """
+    hourly = Counter()
+    daily = Counter()
+    for record in records:
+        dimensions = ROLLUP_DIMENSIONS.get(record.__class__)
+        if not dimensions or record.created_at is None:
+            continue
+        hour = hour_bucket(record.created_at)
+        day = hour.date()
+        table = record.__class__.__name__
+        for dimension in dimensions:
+            value = getattr(record, dimension)
+            hourly[(hour, table, dimension, value)] += 1
+            daily[(day, table, dimension, value)] += 1
+
+    if not hourly:
+        return
+
+    with transaction.atomic():
+        for (hour, table, dimension, value), amount in hourly.items():
+            _increment(HourlyLogRollup, {
+                'hour': hour, 'log_table': table, 'dimension': dimension, 'value': value,
+            }, amount)
+        for (day, table, dimension, value), amount in daily.items():
+            _increment(DailyLogRollup, {
+                'day': day, 'log_table': table, 'dimension': dimension, 'value': value,
+            }, amount)
+
+
+def rebuild_rollups(start_day, end_day, models=None):
+    """
+    Recompute the rollups for local days start_day..end_day (inclusive) from
+    the raw log tables. Rows already moved out by archive_logs are no longer
+    in the raw tables, so callers should not rebuild days past the hot window.
+    """
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(start_day, time.min), tz)
+    end = timezone.make_aware(datetime.combine(end_day + timedelta(days=1), time.min), tz)
+    models = models or list(ROLLUP_DIMENSIONS)
+    created = 0
+
+    with transaction.atomic():
+        for model in models:
+            table = model.__name__
+            # _raw_delete: utils.signals' catch-all post_delete receiver would
+            # otherwise make delete() load and signal every rollup row
+            HourlyLogRollup.objects.filter(
+                log_table=table, hour__gte=start, hour__lt=end
+            )._raw_delete(router.db_for_write(HourlyLogRollup))
+            DailyLogRollup.objects.filter(
+                log_table=table, day__gte=start_day, day__lte=end_day
+            )._raw_delete(router.db_for_write(DailyLogRollup))
+
+            rows = model.objects.filter(created_at__gte=start, created_at__lt=end).order_by()
+            for dimension in ROLLUP_DIMENSIONS[model]:
+                hourly = (
+                    rows.annotate(bucket=TruncHour('created_at', tzinfo=tz))
+                    .values('bucket', dimension)
+                    .annotate(total=Count('pk'))
+                )
+                HourlyLogRollup.objects.bulk_create([
+                    HourlyLogRollup(
+                        hour=row['bucket'], log_table=table, dimension=dimension,
+                        value=row[dimension], row_count=row['total'],
+                    )
+                    for row in hourly
+                ])
+                daily = (
+                    rows.annotate(bucket=TruncDate('created_at', tzinfo=tz))
+                    .values('bucket', dimension)
+                    .annotate(total=Count('pk'))
+                )
+                daily_rows = [
+                    DailyLogRollup(
+                        day=row['bucket'], log_table=table, dimension=dimension,
+                        value=row[dimension], row_count=row['total'],
+                    )
+                    for row in daily
+                ]
+                DailyLogRollup.objects.bulk_create(daily_rows)
+                created += len(daily_rows)
+    return created
+
+
+def prune_hourly_rollups(keep_days=None):
+    """Drop hourly rollups older than keep_days; the daily ones stay"""
+    keep_days = keep_days if keep_days is not None else get_rollup_settings()['HOURLY_DAYS']
+    cutoff = timezone.now() - timedelta(days=keep_days)
+    return HourlyLogRollup.objects.filter(hour__lt=cutoff)._raw_delete(router.db_for_write(HourlyLogRollup))
+
+
+def count_for_day(day, table, dimension, value=None):
+    """Number of rows of a log table written on a local day"""
+    rows = DailyLogRollup.objects.filter(day=day, log_table=table, dimension=dimension)
+    if value is not None:
+        rows = rows.filter(value=value)
+    return rows.aggregate(total=Sum('row_count'))['total'] or 0
+
+
+def totals_by_value(table, dimension):
+    """All-time counts per value, as [{dimension: value, 'count': n}, ...]"""
+    rows = (
+        DailyLogRollup.objects.filter(log_table=table, dimension=dimension)
+        .values('value')
+        .annotate(total=Sum('row_count'))
+        .order_by('-total')
+    )
+    return [{dimension: row['value'], 'count': row['total']} for row in rows]
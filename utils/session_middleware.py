@@ -0,0 +1,21 @@
+from django.contrib.sessions.middleware import SessionMiddleware as BaseSessionMiddleware
+
+
+class SessionMiddleware(BaseSessionMiddleware):
+    """
+    Django's SessionMiddleware, except that responses of views marked
+    no_session_save (the metrics endpoint) leave the session alone. With
+    SESSION_SAVE_EVERY_REQUEST the stock middleware reads and writes back
+    the session of every request carrying a session cookie, whether the
+    view used it or not.
+    """
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(view_func, 'no_session_save', False):
+            request.skip_session_save = True
+        return None
+
+    def process_response(self, request, response):
+        if getattr(request, 'skip_session_save', False):
+            return response
+        return super().process_response(request, response)
@@ -8,101 +8,67 @@ import json
 
 from .models import ActivityLog, AuditLog, SystemLog, LoginLog
 
+from .logging_utils import Logger
+from . import log_context
+
 # Activity logging for model changes
-@receiver(post_save)
-def log_model_save(sender, instance, created, **kwargs):
-    # Skip logging for certain models
-    if sender.__name__ in ['ActivityLog', 'AuditLog', 'SystemLog', 'LoginLog']:
+def record_model_change(sender, instance, action):
+    """Attach the change to the current request, or log it directly outside one"""
+    # Only models on the LOG_MODEL_CHANGES allow-list are tracked; this keeps
+    # the per-request Session save and the log tables themselves out
+    if not log_context.is_logged_model(sender):
         return
     
-    # Get request from instance if available
-    request = getattr(instance, '_request', None)
-    
-    action = 'create' if created else 'update'
+    context = log_context.get_current()
+    if context is not None:
+        # Folded into the single request row written by LoggingMiddleware
+        context.add_model_change(action, instance)
+        return
     
-    ActivityLog.objects.create(
-        user=request.user if request and hasattr(request, 'user') else None,
+    Logger.log_activity(
+        user=None,
         log_type=action,
-        module='system',  # You can customize this
+        module='system',
         action=f'{action.capitalize()}d {sender.__name__}: {str(instance)}',
-        ip_address=request.META.get('REMOTE_ADDR') if request else None,
-        user_agent=request.META.get('HTTP_USER_AGENT') if request else None,
         status='success'
     )
 
+@receiver(post_save)
+def log_model_save(sender, instance, created, **kwargs):
+    record_model_change(sender, instance, 'create' if created else 'update')
+
 @receiver(post_delete)
 def log_model_delete(sender, instance, **kwargs):
-    # Skip logging for certain models
-    if sender.__name__ in ['ActivityLog', 'AuditLog', 'SystemLog', 'LoginLog']:
-        return
-    
-    # Get request from instance if available
-    request = getattr(instance, '_request', None)
-    
-    ActivityLog.objects.create(
-        user=request.user if request and hasattr(request, 'user') else None,
-        log_type='delete',
-        module='system',  # You can customize this
-        action=f'Deleted {sender.__name__}: {str(instance)}',
-        ip_address=request.META.get('REMOTE_ADDR') if request else None,
-        user_agent=request.META.get('HTTP_USER_AGENT') if request else None,
-        status='success'
-    )
+    record_model_change(sender, instance, 'delete')
 
-# Login/logout logging
+# Login/logout logging: the attempt goes to LoginLog, the request itself
+# is the consolidated row LoggingMiddleware writes
 @receiver(user_logged_in)
 def log_user_login(sender, request, user, **kwargs):
-    ActivityLog.objects.create(
+    Logger.log_login(user.username, 'success', request=request, user=user)
+
+@receiver(user_logged_out)
+def log_user_logout(sender, request, user, **kwargs):
+    if not user:
+        return
+    context = log_context.get_current()
+    if context is not None:
+        # request.user is anonymous by the time the request row is written
+        context.logged_out_user = user
+        return
+    Logger.log_activity(
         user=user,
-        log_type='login',
+        log_type='logout',
         module='authentication',
-        action=f'User {user.username} logged in',
-        ip_address=request.META.get('REMOTE_ADDR'),
-        user_agent=request.META.get('HTTP_USER_AGENT'),
+        action=f'User {user.username} logged out',
+        request=request,
         status='success'
     )
-    
-    LoginLog.objects.create(
-        username=user.username,
-        user=user,
-        status='success',
-        ip_address=request.META.get('REMOTE_ADDR'),
-        user_agent=request.META.get('HTTP_USER_AGENT')
-    )
-
-@receiver(user_logged_out)
-def log_user_logout(sender, request, user, **kwargs):
-    if user:
-        ActivityLog.objects.create(
-            user=user,
-            log_type='logout',
-            module='authentication',
-            action=f'User {user.username} logged out',
-            ip_address=request.META.get('REMOTE_ADDR'),
-            user_agent=request.META.get('HTTP_USER_AGENT'),
-            status='success'
-        )
 
 @receiver(user_login_failed)
 def log_user_login_failed(sender, credentials, request, **kwargs):
-    username = credentials.get('username', 'unknown')
-    
-    ActivityLog.objects.create(
-        user=None,
-        log_type='login',
-        module='authentication',
-        action=f'Failed login attempt for user: {username}',
-        ip_address=request.META.get('REMOTE_ADDR'),
-        user_agent=request.META.get('HTTP_USER_AGENT'),
-        status='failed'
-    )
-    
-    LoginLog.objects.create(
-        username=username,
-        user=None,
-        status='failed',
-        ip_address=request.META.get('REMOTE_ADDR'),
-        user_agent=request.META.get('HTTP_USER_AGENT'),
+    Logger.log_login(
+        credentials.get('username', 'unknown'), 'failed', request=request,
         failure_reason='Invalid credentials'
     )
 
@@ -118,14 +84,13 @@ def log_system_error(sender, request, **kwargs):
     exc_type, exc_value, exc_traceback = sys.exc_info()
     tb_str = ''.join(traceback.format_exception(exc_type, exc_value, exc_traceback))
     
-    SystemLog.objects.create(
-        level='ERROR',
+    Logger.log_system_error(
         source=sender.__class__.__name__ if hasattr(sender, '__class__') else str(sender),
         message=str(exc_value),
-        traceback=tb_str,
+        traceback_text=tb_str,
         additional_data={
             'path': request.path if request else None,
             'method': request.method if request else None,
-            'user': request.user.username if request and request.user.is_authenticated else None,
+            'user': request.user.username if request and hasattr(request, 'user') and request.user.is_authenticated else None,
         }
     )
\ No newline at end of file
@@ -0,0 +1,70 @@
+"""
+Worker processes of `manage.py benchmark_sqlite_locks`. They talk to
+sqlite3 directly and need no Django setup, so they start quickly under
+spawn.
+"""
+import os
+import sqlite3
+import time
+
+from .db_writer import FileWriteLock
+
+
+def _connect(path, pragmas, busy_timeout):
+    connection = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None)
+    for pragma in pragmas:
+        connection.execute(pragma)
+    return connection
+
+
+def write_worker(path, pragmas, busy_timeout, begin, lock_file, transactions, rows):
+    """
+    Run `transactions` read-then-write transactions like a log flush or an
+    attendance upsert; returns (lock waits in seconds, errors).
+    """
+    connection = _connect(path, pragmas, busy_timeout)
+    lock = FileWriteLock(lock_file) if lock_file else None
+    waits, errors = [], 0
+    payload = 'x' * 200
+    for _ in range(transactions):
+        started = time.perf_counter()
+        gated = False
+        try:
+            if lock is not None:
+                lock.acquire()
+                gated = True
+            connection.execute(begin)
+            connection.execute('SELECT COUNT(*) FROM bench_log WHERE worker = ?', (os.getpid(),)).fetchone()
+            connection.execute('INSERT INTO bench_log (worker, payload) VALUES (?, ?)', (os.getpid(), payload))
+            # The write lock is held from here on: everything up to now was waiting
+            waits.append(time.perf_counter() - started)
+            connection.executemany(
+                'INSERT INTO bench_log (worker, payload) VALUES (?, ?)',
+                [(os.getpid(), payload)] * (rows - 1),
+            )
+            connection.execute('COMMIT')
+        except sqlite3.OperationalError:
+            errors += 1
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+        finally:
+            if gated:
+                lock.release()
+    connection.close()
+    return waits, errors
+
+
+def read_worker(path, pragmas, busy_timeout, duration):
+    """Count rows in a loop for `duration` seconds; returns (latencies, errors)"""
+    connection = _connect(path, pragmas, busy_timeout)
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            connection.execute('SELECT COUNT(*), MAX(id) FROM bench_log').fetchone()
+            latencies.append(time.perf_counter() - started)
+        except sqlite3.OperationalError:
+            errors += 1
+    connection.close()
+    return latencies, errors
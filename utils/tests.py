@@ -1,3 +1,521 @@
-from django.test import TestCase
+import datetime
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models.signals import post_delete
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from emp.models import CustomUser, Department
+
+from . import metrics, profiler
+from .db_routing import PIN_SESSION_KEY, ReplicaRoutingMiddleware, unpinned_tables
+from .db_writer import FileWriteLock, single_writer
+from .generations import Generation
+from .log_archive import LogArchiver
+from .log_writer import BufferedLogWriter, register_write_hook, _write_hooks
+from .logging_utils import Logger
+from .models import ActivityLog, DailyLogRollup, HourlyLogRollup, LoginLog, SystemLog
+from .rollups import (
+    count_for_day, prune_hourly_rollups, rebuild_rollups, record_log_rows, totals_by_value,
+)
+
+
+def system_log(message):
+    return SystemLog(level='INFO', source='tests', message=message)
+
+
+@mock.patch.object(BufferedLogWriter, '_ensure_thread')
+class BufferedLogWriterTests(TestCase):
+    """The flusher thread is not started; flush() is called directly"""
+
+    def setUp(self):
+        self.flushed = []
+        register_write_hook(self.flushed.extend)
+        self.addCleanup(_write_hooks.remove, self.flushed.extend)
+
+    def test_flush_writes_the_queue_in_one_batch(self, ensure_thread):
+        writer = BufferedLogWriter(batch_size=10)
+        for i in range(3):
+            writer.write(system_log(str(i)))
+        self.assertFalse(SystemLog.objects.exists())
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(writer.flush(), 3)
+
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "utils_systemlog"')]
+        self.assertEqual(len(inserts), 1)
+
+        self.assertEqual(sorted(SystemLog.objects.values_list('message', flat=True)), ['0', '1', '2'])
+        self.assertEqual(len(self.flushed), 3)
+        self.assertEqual(writer.stats(), {'mode': 'buffered', 'queued': 0, 'written': 3, 'dropped': 0})
+
+    def test_created_at_is_the_time_of_the_write(self, ensure_thread):
+        writer = BufferedLogWriter()
+        record = system_log('early')
+        logged_at = record.created_at
+        writer.write(record)
+
+        later = logged_at + datetime.timedelta(minutes=5)
+        with mock.patch.object(timezone, 'now', return_value=later):
+            writer.flush()
+
+        self.assertEqual(SystemLog.objects.get().created_at, logged_at)
+
+    def test_drop_newest_counts_what_it_drops(self, ensure_thread):
+        writer = BufferedLogWriter(max_queue_size=2, overflow_policy='drop_newest')
+        for i in range(5):
+            writer.write(system_log(str(i)))
+        writer.flush()
+        self.assertEqual(sorted(SystemLog.objects.values_list('message', flat=True)), ['0', '1'])
+        self.assertEqual((writer.written, writer.dropped), (2, 3))
+
+    def test_drop_oldest_keeps_the_latest_records(self, ensure_thread):
+        writer = BufferedLogWriter(max_queue_size=2, overflow_policy='drop_oldest')
+        for i in range(5):
+            writer.write(system_log(str(i)))
+        writer.flush()
+        self.assertEqual(sorted(SystemLog.objects.values_list('message', flat=True)), ['3', '4'])
+        self.assertEqual(writer.dropped, 3)
+
+    def test_sync_overflow_writes_in_the_caller(self, ensure_thread):
+        writer = BufferedLogWriter(max_queue_size=1, overflow_policy='sync')
+        writer.write(system_log('queued'))
+        writer.write(system_log('overflow'))
+        self.assertEqual(list(SystemLog.objects.values_list('message', flat=True)), ['overflow'])
+        writer.flush()
+        self.assertEqual((writer.written, writer.dropped), (2, 0))
+
+    def test_writes_after_shutdown_are_not_lost(self, ensure_thread):
+        writer = BufferedLogWriter()
+        writer.write(system_log('queued'))
+        writer.shutdown()
+        writer.write(system_log('late'))
+        self.assertEqual(
+            sorted(SystemLog.objects.values_list('message', flat=True)), ['late', 'queued']
+        )
+        self.assertEqual(writer.written, 2)
+
+
+@override_settings(LOG_WRITER={'MODE': 'sync'})
+class RequestLoggingTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('loggedin', 'loggedin@example.com', 'secret-pw')
+        ActivityLog.objects.all().delete()
+
+    def test_a_request_writes_one_activity_row(self):
+        self.client.force_login(self.user)
+        ActivityLog.objects.all().delete()
+
+        self.client.get(reverse('emp:login'))
+
+        row = ActivityLog.objects.get()
+        self.assertEqual((row.user, row.log_type), (self.user, 'view'))
+        self.assertEqual(row.additional_data['path'], reverse('emp:login'))
+        self.assertIn('db_writes', row.additional_data)
+
+    def test_login_writes_a_login_row_and_the_request_row(self):
+        self.client.post(reverse('emp:login'), {'username': 'loggedin', 'password': 'secret-pw'})
+
+        login = LoginLog.objects.get()
+        self.assertEqual((login.username, login.user, login.status), ('loggedin', self.user, 'success'))
+        self.assertEqual(ActivityLog.objects.get().user, self.user)
+
+    def test_failed_login_writes_a_login_row_and_the_request_row(self):
+        self.client.post(reverse('emp:login'), {'username': 'loggedin', 'password': 'wrong'})
+
+        login = LoginLog.objects.get()
+        self.assertEqual((login.username, login.user, login.status), ('loggedin', None, 'failed'))
+        self.assertEqual(ActivityLog.objects.get().log_type, 'update')
+
+    def test_logout_is_recorded_on_the_request_row(self):
+        self.client.force_login(self.user)
+        ActivityLog.objects.all().delete()
+
+        self.client.get(reverse('emp:logout'))
+
+        row = ActivityLog.objects.get()
+        self.assertEqual((row.user, row.log_type), (self.user, 'logout'))
+
+
+# The export reads from the replica, whose test mirror cannot see the test
+# transaction
+@override_settings(LOG_WRITER={'MODE': 'sync'}, DATABASE_REPLICA={'ALIAS': None})
+class StreamingRequestLoggingTests(TestCase):
+
+    def setUp(self):
+        department = Department.objects.create(name='Engineering', code='ENG')
+        self.user = User.objects.create_user('manager', 'manager@example.com', 'pw')
+        CustomUser.objects.create(
+            user=self.user, phone_number=9800000000, address='Kathmandu', department=department, role='manager',
+        )
+        self.client.force_login(self.user)
+        ActivityLog.objects.all().delete()
+
+    def test_the_row_is_written_when_the_stream_is_closed(self):
+        response = self.client.get(reverse('emp:attendance_report'), {'format': 'csv'})
+        self.assertTrue(response.streaming)
+        self.assertFalse(ActivityLog.objects.exists())
+        before_streaming = response.wsgi_request.log_context.db_queries
+
+        content = b''.join(response.streaming_content)
+
+        row = ActivityLog.objects.get()
+        self.assertEqual(row.additional_data['content_length'], len(content))
+        # The export query ran while the body was streamed
+        self.assertGreater(row.additional_data['db_queries'], before_streaming)
+        self.assertEqual(connection.execute_wrappers, [])
+
+
+class LogArchiverTests(TestCase):
+
+    def setUp(self):
+        now = timezone.now()
+        self.old = now - datetime.timedelta(days=100)
+        for i in range(3):
+            ActivityLog.objects.create(
+                log_type='view', module='system', action=f'old {i}', created_at=self.old,
+                additional_data={'i': i},
+            )
+        ActivityLog.objects.create(log_type='view', module='system', action='recent', created_at=now)
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir)
+
+    def archiver(self, mode):
+        return LogArchiver(ActivityLog, hot_days=90, mode=mode, batch_size=2, archive_dir=self.archive_dir)
+
+    def assert_round_trip(self, archiver):
+        self.assertEqual(list(ActivityLog.objects.values_list('action', flat=True)), ['recent'])
+        archived = list(archiver.query())
+        self.assertEqual(sorted(row.action for row in archived), ['old 0', 'old 1', 'old 2'])
+        self.assertTrue(all(row.created_at == self.old for row in archived))
+        self.assertEqual(sorted(row.additional_data['i'] for row in archived), [0, 1, 2])
+        self.assertEqual([row.action for row in archiver.query(action='old 1')], ['old 1'])
+
+    def test_table_round_trip(self):
+        archiver = self.archiver('table')
+        self.assertEqual(archiver.archive(), 3)
+        self.assert_round_trip(archiver)
+
+    def test_file_round_trip(self):
+        archiver = self.archiver('file')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(archiver.archive(), 3)
+        self.assertFalse([name for name in os.listdir(self.archive_dir) if name.endswith('.part')])
+        self.assert_round_trip(archiver)
+
+    def test_archived_rows_are_deleted_without_signals(self):
+        deleted = []
+
+        def receiver(sender, **kwargs):
+            deleted.append(kwargs['instance'])
+
+        post_delete.connect(receiver, sender=ActivityLog)
+        self.addCleanup(post_delete.disconnect, receiver, sender=ActivityLog)
+
+        self.assertEqual(self.archiver('delete').archive(), 3)
+        self.assertEqual(deleted, [])
+        self.assertEqual(ActivityLog.objects.count(), 1)
+
+
+@override_settings(LOG_WRITER={'MODE': 'sync'}, LOG_ROLLUPS={'INCREMENTAL': True})
+class LogRollupTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('auditor', 'auditor@example.com', 'pw')
+        for log_type in ('view', 'view', 'update'):
+            Logger.log_activity(self.user, log_type, 'employee', f'{log_type} employee')
+        Logger.log_system_error('tests', 'Something broke')
+        Logger.log_system_warning('tests', 'Something is odd')
+
+    def raw_counts(self, model, dimension):
+        return Counter(model.objects.values_list(dimension, flat=True))
+
+    def rollup_counts(self, table, dimension):
+        return Counter({row[dimension]: row['count'] for row in totals_by_value(table, dimension)})
+
+    def test_written_rows_are_counted(self):
+        today = timezone.localdate()
+        self.assertEqual(count_for_day(today, 'ActivityLog', 'log_type'), ActivityLog.objects.count())
+        self.assertEqual(count_for_day(today, 'SystemLog', 'level', 'ERROR'), 1)
+        self.assertEqual(
+            self.rollup_counts('ActivityLog', 'log_type'), self.raw_counts(ActivityLog, 'log_type')
+        )
+        self.assertEqual(self.rollup_counts('SystemLog', 'level'), self.raw_counts(SystemLog, 'level'))
+
+    def test_batches_fold_into_one_row_per_value(self):
+        before = count_for_day(timezone.localdate(), 'SystemLog', 'level', 'INFO')
+        records = [SystemLog.objects.create(level='INFO', source='tests', message=str(i)) for i in range(3)]
+        record_log_rows(records)
+        self.assertEqual(count_for_day(timezone.localdate(), 'SystemLog', 'level', 'INFO'), before + 3)
+        self.assertEqual(
+            DailyLogRollup.objects.filter(log_table='SystemLog', dimension='level', value='INFO').count(), 1
+        )
+
+    def test_rebuild_matches_the_raw_tables(self):
+        expected = self.rollup_counts('ActivityLog', 'log_type')
+        DailyLogRollup.objects.all().delete()
+        HourlyLogRollup.objects.all().delete()
+
+        today = timezone.localdate()
+        rebuild_rollups(today, today)
+
+        self.assertEqual(self.rollup_counts('ActivityLog', 'log_type'), expected)
+        self.assertEqual(self.rollup_counts('SystemLog', 'level'), self.raw_counts(SystemLog, 'level'))
+
+    def test_rebuild_corrects_drift(self):
+        DailyLogRollup.objects.filter(log_table='SystemLog').update(row_count=99)
+        call_command('rollup_logs', days=0, stdout=io.StringIO())
+        self.assertEqual(self.rollup_counts('SystemLog', 'level'), self.raw_counts(SystemLog, 'level'))
+
+    def test_prune_keeps_the_daily_rollups(self):
+        old = timezone.now() - datetime.timedelta(days=40)
+        SystemLog.objects.create(level='INFO', source='tests', message='old', created_at=old)
+        rebuild_rollups(timezone.localdate(old), timezone.localdate(old))
+
+        self.assertEqual(prune_hourly_rollups(keep_days=30), 1)
+        self.assertFalse(HourlyLogRollup.objects.filter(hour__lt=old + datetime.timedelta(days=1)).exists())
+        self.assertEqual(count_for_day(timezone.localdate(old), 'SystemLog', 'level', 'INFO'), 1)
+
+
+    def test_dashboard_reads_the_rollups(self):
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+        expected = self.rollup_counts('ActivityLog', 'log_type')
+
+        # The dashboard reads from the replica, whose test mirror cannot see
+        # the test transaction
+        with self.settings(DATABASE_REPLICA={'ALIAS': None}), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('logs-dashboard'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['today_errors'], 1)
+        self.assertEqual(
+            Counter({row['log_type']: row['count'] for row in response.context['activity_stats']}), expected
+        )
+        self.assertFalse([
+            query['sql'] for query in queries.captured_queries
+            if 'GROUP BY' in query['sql'] and '"utils_activitylog"' in query['sql']
+        ])
+
+@override_settings(LOG_WRITER={'MODE': 'sync'})
+class ReplicaPinningTests(TestCase):
+
+    def handle(self, work):
+        request = RequestFactory().get('/')
+        request.session = SessionStore()
+
+        def view(request):
+            work()
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(view)(request)
+        return PIN_SESSION_KEY in request.session
+
+    def test_write_pins_the_session(self):
+        self.assertTrue(self.handle(lambda: User.objects.create_user('writer')))
+
+    def test_get_or_create_of_an_existing_row_does_not_pin(self):
+        User.objects.create_user('reader')
+        self.assertFalse(self.handle(lambda: User.objects.get_or_create(username='reader')))
+
+    def test_log_rows_do_not_pin(self):
+        self.assertFalse(self.handle(lambda: Logger.log_system_warning('tests', 'Something is odd')))
+
+    def test_deleting_log_rows_pins(self):
+        Logger.log_system_warning('tests', 'Something is odd')
+        self.assertTrue(self.handle(lambda: SystemLog.objects.all().delete()))
+
+    def test_unpinned_tables_are_worked_out_once_per_setting(self):
+        unpinned_tables.cache_clear()
+        self.assertIn(SystemLog._meta.db_table, unpinned_tables())
+        self.assertIs(unpinned_tables(), unpinned_tables())
+        with self.settings(DATABASE_REPLICA={'UNPINNED_APPS': ['sessions']}):
+            self.assertNotIn(SystemLog._meta.db_table, unpinned_tables())
+        self.assertIn(SystemLog._meta.db_table, unpinned_tables())
+
+@override_settings(LOG_WRITER={'MODE': 'sync'})
+class MetricsViewTests(TestCase):
+
+    def test_a_scrape_runs_no_queries(self):
+        # A logged-in client would load and, with SESSION_SAVE_EVERY_REQUEST,
+        # write back its session on every other page
+        user = User.objects.create_user('scraper', 'scraper@example.com', 'pw')
+        self.client.force_login(user)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('metrics'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'ems_http_requests_total', response.content)
+
+    def test_only_loopback_may_scrape_by_default(self):
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='::1').status_code, 200)
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.5').status_code, 403)
+
+    @override_settings(METRICS={'ALLOWED_IPS': []})
+    def test_an_empty_allow_list_admits_everyone(self):
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.5').status_code, 200)
+
+
+class MetricShardTests(TestCase):
+
+    def test_finished_threads_are_folded(self):
+        before = metrics.snapshot()['values'].get(('ems_logins_total', ('tests',)), 0)
+
+        def work():
+            metrics.LOGINS.inc('tests')
+
+        for _ in range(5):
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+
+        self.assertEqual(metrics.snapshot()['values'][('ems_logins_total', ('tests',))], before + 5)
+        self.assertFalse(any(not thread.is_alive() for thread, _ in metrics._shards))
+
+class GenerationTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def settings_for(self, interval):
+        return override_settings(CACHE_GENERATIONS={'DIRECTORY': self.directory, 'CHECK_INTERVAL': interval})
+
+    def test_a_bump_reaches_other_processes(self):
+        # Two instances of one generation stand in for two worker processes
+        here, there = Generation('tests'), Generation('tests')
+        with self.settings_for(0):
+            before = there.get()
+            self.assertEqual(here.bump(), before + 1)
+            self.assertEqual(there.get(), before + 1)
+
+    def test_other_processes_reread_after_the_check_interval(self):
+        here, there = Generation('tests'), Generation('tests')
+        with self.settings_for(60):
+            before = there.get()
+            here.bump()
+            self.assertEqual(here.get(), before + 1)
+            self.assertEqual(there.get(), before)
+            with mock.patch('utils.generations.time.monotonic', return_value=time.monotonic() + 61):
+                self.assertEqual(there.get(), before + 1)
+
+    def test_reads_do_not_query_the_database(self):
+        with self.settings_for(0), self.assertNumQueries(0):
+            Generation('tests').get()
+            Generation('tests').bump()
+
+
+# The changelists read from the replica, whose test mirror cannot see the
+# test transaction
+@override_settings(
+    LOG_WRITER={'MODE': 'sync'}, DATABASE_REPLICA={'ALIAS': None}, PROFILER={'ENABLED': True},
+)
+class ProfilerTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(self.admin)
+        profiler.reset()
+        self.addCleanup(profiler.reset)
+
+    def test_staff_can_profile_a_request(self):
+        response = self.client.get(reverse('admin:utils_activitylog_changelist'), {'_profile': '1'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('X-Profiled-Samples', response)
+        profile = profiler.get_profile('admin:utils_activitylog_changelist')
+        self.assertEqual(profile['requests'], 1)
+
+    def test_other_users_cannot_ask_for_a_profile(self):
+        User.objects.create_user('plain', 'plain@example.com', 'pw')
+        self.client.force_login(User.objects.get(username='plain'))
+
+        response = self.client.get(reverse('emp:login'), {'_profile': '1'})
+
+        self.assertNotIn('X-Profiled-Samples', response)
+        self.assertEqual(profiler.get_profiles(), [])
+
+    @override_settings(PROFILER={})
+    def test_off_unless_enabled(self):
+        response = self.client.get(reverse('admin:utils_activitylog_changelist'), {'_profile': '1'})
+
+        self.assertNotIn('X-Profiled-Samples', response)
+        self.assertEqual(profiler.get_profiles(), [])
+
+    def test_profiler_page_lists_and_exports_the_stacks(self):
+        profiler.record('emp:home', Counter({'a;b': 3, 'a;c': 1}), 0.02)
+
+        page = self.client.get(reverse('profiler'))
+        self.assertContains(page, 'emp:home')
+
+        export = self.client.get(reverse('profiler'), {'view': 'emp:home', 'format': 'collapsed'})
+        self.assertEqual(export.content.decode(), 'a;b 3\na;c 1\n')
+        self.assertEqual(
+            self.client.get(reverse('profiler'), {'view': 'emp:nothing', 'format': 'collapsed'}).status_code, 404
+        )
+
+
+class SingleWriterTests(TransactionTestCase):
+
+    def begins(self, queries):
+        return [query['sql'] for query in queries.captured_queries if query['sql'].startswith('BEGIN')]
+
+    def test_only_write_paths_begin_immediate(self):
+        with CaptureQueriesContext(connection) as queries:
+            with single_writer(), transaction.atomic():
+                SystemLog.objects.count()
+                SystemLog.objects.create(level='INFO', source='tests', message='written')
+            with transaction.atomic():
+                SystemLog.objects.count()
+
+        self.assertEqual(self.begins(queries), ['BEGIN IMMEDIATE', 'BEGIN'])
+
+    def test_nested_uses_keep_the_outer_mode(self):
+        with CaptureQueriesContext(connection) as queries:
+            with single_writer():
+                with single_writer(), transaction.atomic():
+                    SystemLog.objects.count()
+                with transaction.atomic():
+                    SystemLog.objects.count()
+
+        self.assertEqual(self.begins(queries), ['BEGIN IMMEDIATE', 'BEGIN IMMEDIATE'])
+        self.assertIsNone(connection.transaction_mode)
+
+    def test_the_write_lock_is_exclusive(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'writer-lock')
+        holder, waiter = FileWriteLock(path), FileWriteLock(path)
+        order = []
+
+        def wait():
+            waiter.acquire()
+            order.append('waiter')
+            waiter.release()
+
+        holder.acquire()
+        thread = threading.Thread(target=wait)
+        thread.start()
+        time.sleep(0.05)
+        order.append('holder')
+        holder.release()
+        thread.join()
+
+        self.assertEqual(order, ['holder', 'waiter'])